@@ -28,7 +28,8 @@ __url__ = 'http://www.metareal.org/p/modipyd/'
 __license__ = 'MIT License'
 __docformat__ = 'restructuredtext'
 
-__all__ = ['LOGGER', 'HAS_RELATIVE_IMPORTS', 'BYTECODE_PROCESSORS']
+__all__ = ['LOGGER', 'HAS_RELATIVE_IMPORTS', 'BYTECODE_PROCESSORS',
+           'SCANNER']
 
 
 import os
@@ -83,3 +84,21 @@ BYTECODE_PROCESSORS = [
     'modipyd.bytecode.ImportProcessor',
     'modipyd.bytecode.ClassDefinitionProcessor',
 ]
+
+
+# ----------------------------------------------------------------
+# Scanner
+# ----------------------------------------------------------------
+# The front end which extracts the context (imports, class
+# definitions) of Python source files:
+#
+# 'bytecode'
+#    Compile source files and scan bytecode with
+#    BYTECODE_PROCESSORS (default)
+# 'lexical'
+#    Extract the context from tokens without compiling.
+#    BYTECODE_PROCESSORS are not applied to source files.
+#
+# See modipyd.lexical module for more details.
+#
+SCANNER = 'bytecode'
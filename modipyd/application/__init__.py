@@ -5,14 +5,19 @@ Generic modipyd application
     :license: MIT, see LICENSE for more details.
 """
 
-from modipyd import LOGGER
+from types import GeneratorType
+
+from modipyd import LOGGER, module
 from modipyd.utils import import_component
-from modipyd.monitor import Event, Monitor
+from modipyd.monitor import Event, ChangeSet, Monitor
+from modipyd.watcher import make_watcher, ShardedWatcher
+from modipyd.background import BackgroundMonitor, EventQueue
+from modipyd.stats import install_signal_handler
 
 
 # Monitor event descriptions
 TYPE_STRINGS = dict(
-    zip(Event.TYPES, ('Modified', 'Created', 'Removed')))
+    zip(Event.TYPES, ('Modified', 'Created', 'Removed', 'Moved')))
 
 
 class Application(object):
@@ -22,6 +27,51 @@ class Application(object):
         self.paths = paths
         self.plugins = []
         self.variables = {}
+        # The name of watcher backend (See ``modipyd.watcher``)
+        self.watcher = None
+        # The number of worker processes of ``sharded`` watcher
+        # (the number of CPUs if ``None``)
+        self.shards = None
+        # Polling interval (seconds) of ``sharded`` watcher workers
+        # (the default of the watcher if ``None``)
+        self.interval = None
+        # Seconds to coalesce events into a ``ChangeSet``
+        self.coalesce = None
+        # Ignore modifications which don't change file content
+        self.fingerprint = False
+        # ``modipyd.scheduler.Scheduler`` instance (optional)
+        self.scheduler = None
+        # ``modipyd.scheduler.TieredPolling`` instance (optional)
+        self.tiers = None
+        # The filepath of warm-start snapshot (optional)
+        self.snapshot = None
+        # ``modipyd.cache.ScanCache`` instance (optional), which stores
+        # analysed contexts of modules across restarts
+        self.scan_cache = None
+        # The number of processes used to analyse modules
+        # (0 means the number of CPUs)
+        self.jobs = 1
+        # Run monitor in a background thread, and pass events
+        # through a bounded queue (See ``modipyd.background``)
+        self.threaded = False
+        self.queue_size = 100
+        self.overflow = 'merge'
+        # Patterns of paths excluded from and included in monitoring,
+        # and ignore files (e.g. ``.gitignore``) to be honoured
+        # (See ``modipyd.utils.matcher``)
+        self.excludes = []
+        self.includes = []
+        self.ignore_files = []
+        # root directory -> module search path of modules in it
+        self.search_paths = {}
+        # Enumerate files from the git index at startup
+        self.git = False
+        # ``modipyd.stats.Stats`` instance (optional), dumped as JSON
+        # to ``stats_file`` (or stderr) on SIGUSR1 and at exit
+        self.stats = None
+        self.stats_file = None
+        # Generators returned by coroutine plugins
+        self.tasks = []
 
     def install_plugin(self, plugin):
         """
@@ -51,25 +101,175 @@ class Application(object):
         self.plugins.append(plugin)
 
     def invoke_plugins(self, event, monitor):
+        """
+        Invoke plugins with *event*. If *event* is a ``ChangeSet``,
+        plugins which don't have ``accepts_changeset`` attribute
+        are invoked with each ``Event`` in it.
+        """
         context = dict(self.variables)
         for plugin in self.plugins:
+            if (isinstance(event, ChangeSet) and
+                    not getattr(plugin, 'accepts_changeset', False)):
+                for e in event:
+                    self.invoke_plugin(plugin, e, monitor, context)
+            else:
+                self.invoke_plugin(plugin, event, monitor, context)
+
+    def invoke_plugin(self, plugin, event, monitor, context):
+        # The plugin object is called with ``monitor.lock`` held,
+        # so it can read the dependency graph safely even if
+        # the monitor is running in a background thread.
+        lock = getattr(monitor, 'lock', None)
+        try:
+            if lock is not None:
+                lock.acquire()
             try:
                 ret = plugin(event, monitor, context)
-                # the plugin object can return (but not required)
-                # a callable object. It is called with no arguments
-                if callable(ret):
-                    ret()
+            finally:
+                if lock is not None:
+                    lock.release()
+            # the plugin object can return (but not required)
+            # a callable object. It is called with no arguments
+            if isinstance(ret, GeneratorType):
+                # coroutine plugin, resumed by ``step()``
+                self.tasks.append(ret)
+            elif callable(ret):
+                ret()
+        except StandardError:
+            LOGGER.warn(
+                "Exception occurred while invoking plugin",
+                exc_info=True)
+
+    def step(self):
+        """
+        Resume each pending coroutine plugin once, and return
+        the number of coroutine plugins still pending.
+        """
+        tasks = []
+        for task in self.tasks:
+            try:
+                task.next()
+            except StopIteration:
+                continue
             except StandardError:
                 LOGGER.warn(
                     "Exception occurred while invoking plugin",
                     exc_info=True)
+                continue
+            tasks.append(task)
+        self.tasks = tasks
+        return len(tasks)
 
     def update_variables(self, variables):
         self.variables.update(variables)
 
+    def make_monitor(self):
+        if self.scan_cache is not None:
+            self.scan_cache.stats = self.stats
+            module.SCAN_CACHE = self.scan_cache
+        monitor = Monitor(self.paths, fingerprint=self.fingerprint,
+            tiers=self.tiers, snapshot=self.snapshot, jobs=self.jobs,
+            stats=self.stats, excludes=self.excludes,
+            includes=self.includes, ignore_files=self.ignore_files,
+            git=self.git, search_paths=self.search_paths)
+        if self.watcher == ShardedWatcher.name:
+            watcher_options = dict(shards=self.shards)
+            if self.interval is not None:
+                watcher_options['interval'] = self.interval
+            watcher = make_watcher(self.watcher, **watcher_options)
+        else:
+            watcher = make_watcher(self.watcher)
+        options = dict(watcher=watcher,
+            coalesce=self.coalesce, scheduler=self.scheduler)
+        return monitor, options
+
+    def dispatch(self, event, monitor):
+        """Log *event*, and invoke plugins with it"""
+        if isinstance(event, ChangeSet):
+            events = event
+        else:
+            events = (event,)
+        for e in events:
+            if e.type == Event.MODULE_MOVED:
+                LOGGER.info("%s: %s -> %s" % (TYPE_STRINGS[e.type],
+                    e.old_name, e.descriptor.describe(indent=4)))
+            else:
+                LOGGER.info("%s: %s" % (TYPE_STRINGS[e.type],
+                    e.descriptor.describe(indent=4)))
+        self.invoke_plugins(event, monitor)
+
     def run(self):
-        monitor = Monitor(self.paths)
-        for event in monitor.start():
-            LOGGER.info("%s: %s" % (TYPE_STRINGS[event.type],
-                event.descriptor.describe(indent=4)))
-            self.invoke_plugins(event, monitor)
+        monitor, options = self.make_monitor()
+        if self.threaded:
+            queue = EventQueue(self.queue_size, self.overflow)
+            events = BackgroundMonitor(monitor, queue, **options)
+        else:
+            events = monitor.start(**options)
+
+        if self.stats is not None:
+            install_signal_handler(self.stats, self.stats_file)
+        try:
+            for event in events:
+                self.dispatch(event, monitor)
+                # Run coroutine plugins to completion
+                while self.step():
+                    pass
+        finally:
+            if self.stats is not None:
+                self.stats.dump(self.stats_file)
+
+    def start(self):
+        """
+        Start monitoring in a background thread, and return
+        ``modipyd.background.BackgroundMonitor`` instance without
+        blocking. This is for applications which have their own
+        event loop: call ``process()`` when ``fileno()`` of the
+        returned object is readable, and call ``step()``
+        periodically while it returns non-zero. Call ``stop()``
+        to terminate monitoring.
+
+        If ``stats`` is set, the handler which dumps it on SIGUSR1
+        is installed when called from the main thread.
+        """
+        monitor, options = self.make_monitor()
+        queue = EventQueue(self.queue_size, self.overflow)
+        background = BackgroundMonitor(monitor, queue, **options)
+        if self.stats is not None:
+            try:
+                install_signal_handler(self.stats, self.stats_file)
+            except ValueError:
+                # signal only works in main thread
+                LOGGER.debug("Couldn't install signal handler",
+                    exc_info=True)
+        background.start()
+        return background
+
+    def stop(self, background):
+        """
+        Stop *background* (returned by ``start()``), wait for
+        the monitor thread, and dump ``stats`` if it is set.
+        """
+        background.stop()
+        background.thread.join()
+        if self.stats is not None:
+            self.stats.dump(self.stats_file)
+
+    def replay(self, filepath, speed=1.0):
+        """
+        Feed events recorded in *filepath* to plugins instead of
+        monitoring modifications, and return the number of events
+        replayed (See ``modipyd.application.recorder``).
+        """
+        from modipyd.application.recorder import replay
+        monitor = self.make_monitor()[0]
+        return replay(self, monitor, filepath, speed)
+
+    def process(self, background):
+        """
+        Dispatch events available in *background* (returned by
+        ``start()``) without blocking, and return ``False`` if
+        the monitor has terminated.
+        """
+        for event in background.poll():
+            self.dispatch(event, background.monitor)
+        return not background.finished
@@ -55,16 +55,36 @@ which encapsulatesthe notification event fired by
 ``modipyd.monitor.Monitor`` instance. An eventobject has two
 properties, ``type`` and ``descriptor``. The ``type``
 propertyrepresents event type which is one of (created,
-modified, removed). The ``descriptor``property is
+modified, removed, moved). The ``descriptor``property is
 ``modipyd.descriptor.ModuleDescriptor`` instance which
 encapsulatesmodified module information (See each class
-documentations for more details).
+documentations for more details). A moved event also has
+``old_name``, ``old_filename`` and ``dependents`` (modules
+which imported the old name) properties.
 
 The ``monitor`` parameter is a ``modipyd.monitor.Monitor``
 instance which managesmonitoring modules and scheduling run
 loop. The plugin can query monitoring modules,or stop run loop
 by using Monitor object.
 
+If ``modipyd.monitor.Monitor`` coalesces events, the ``event``
+parameter is a ``modipyd.monitor.ChangeSet`` instance which gathers
+events for several modules. Only a plugin object which has a true
+``accepts_changeset`` attribute is invoked with a ``ChangeSet``,
+other plugin objects are invoked with each ``Event`` in it.
+
+The runtime invokes the plugin object with ``monitor.lock`` held,
+because the monitor may run in a background thread and update
+module descriptors. The returned callable object is called without
+the lock, so it should not walk the module dependency graph.
+
+If the plugin object returns a generator (e.g. the plugin object is
+a generator function), it is a **coroutine plugin**. The runtime
+resumes the generator at each ``Application.step()`` call until it is
+exhausted, so a long running plugin can give control back to the
+application's event loop by ``yield`` statement. Yielded values are
+ignored.
+
 The ``context`` parameter is a dictionary object, containing
 auxiliary variables.The plugin object is allowed to modify the
 dictionary in any way it desires.
@@ -113,6 +133,7 @@ import unittest
 import modipyd
 from modipyd import LOGGER
 from modipyd.analysis import has_subclass
+from modipyd.monitor import Event, ChangeSet
 
 
 class Autotest(object):
@@ -129,22 +150,50 @@ class Autotest(object):
     # The qualified name of ``unittest.TestRunner`` class
     CONTEXT_TEST_RUNNER = 'autotest.test_runner'
 
+    # Runs tests once for all modules in a ``ChangeSet``
+    accepts_changeset = True
+
     def __init__(self, event, monitor, context):
-        self.descriptor = event.descriptor
+        if isinstance(event, ChangeSet):
+            events = list(event)
+        else:
+            events = [event]
+        self.descriptors = [e.descriptor for e in events]
+        self.descriptor = self.descriptors[0]
+        # Modules imported the old name of moved modules
+        for e in events:
+            self.descriptors.extend(e.dependents)
+        self.removals = set([e.descriptor for e in events
+                            if e.type == Event.MODULE_REMOVED])
         self.test_runner = context.get(Autotest.CONTEXT_TEST_RUNNER)
+        # Walk dependency graph here (not in ``__call__``) because
+        # the runtime holds ``monitor.lock`` only while creating
+        # the plugin instance.
+        self.testables = self.find_testables()
 
-    def __call__(self):
-
+    def find_testables(self):
         # Walking dependency graph in imported module to
         # module imports order.
         testables = []
-        for desc in self.descriptor.walk_dependency_graph(reverse=True):
-            LOGGER.info("-> Affected: %s" % desc.name)
-            if has_subclass(desc, unittest.TestCase):
-                LOGGER.debug("-> unittest.TestCase detected: %s" % desc.name)
-                testables.append(desc)
+        discovered = set()
+        for descriptor in self.descriptors:
+            for desc in descriptor.walk_dependency_graph(reverse=True):
+                if desc in discovered:
+                    continue
+                discovered.add(desc)
+                LOGGER.info("-> Affected: %s" % desc.name)
+                if desc in self.removals:
+                    # removed module
+                    continue
+                if has_subclass(desc, unittest.TestCase):
+                    LOGGER.debug(
+                        "-> unittest.TestCase detected: %s" % desc.name)
+                    testables.append(desc)
+        return testables
 
+    def __call__(self):
         # Runntine tests
+        testables = self.testables
         if testables:
             # We can reload affected modules manually and run
             # all TestCase in same process. Running another process,
@@ -0,0 +1,171 @@
+"""
+Event Recording and Replay
+================================================
+
+This module provides ``EventRecorder`` plugin which writes events
+fired by ``modipyd.monitor.Monitor`` to a log file, and ``replay()``
+which feeds events in the log to plugins of an application at
+original or accelerated speed, without modifying any file. It is
+useful to benchmark plugins (e.g. ``Autotest``) against real
+editing sessions.
+
+The log is a text file, each line represents an event::
+
+    <timestamp> <batch> <type> <module name> <filename> [<old name> <old filename>]
+
+Fields are separated by a tab character. *type* is one of ``M``
+(modified), ``C`` (created), ``R`` (removed) and ``V`` (moved), and
+the old name and filename are recorded only for moved events.
+Consecutive events with the same *batch* number are gathered into
+a ``ChangeSet``. Lines starting with ``#`` are comments.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import time
+
+from modipyd import LOGGER
+from modipyd.monitor import Event, ChangeSet
+
+
+LOG_HEADER = '#modipyd-events 1'
+
+# event type -> type field
+EVENT_CODES = dict(zip(Event.TYPES, 'MCRV'))
+EVENT_TYPES = dict((code, t) for t, code in EVENT_CODES.iteritems())
+
+
+class EventRecorder(object):
+    """
+    Plugin object which writes events to *filepath*. If *append*
+    is ``True``, events are appended to the existing log.
+    """
+
+    # Records events in a ``ChangeSet`` as a batch
+    accepts_changeset = True
+
+    def __init__(self, filepath, append=False):
+        super(EventRecorder, self).__init__()
+        self.filepath = filepath
+        self.batch = 0
+        if append:
+            self.fp = open(filepath, 'a')
+        else:
+            self.fp = open(filepath, 'w')
+        self.fp.write(LOG_HEADER + '\n')
+        self.fp.flush()
+
+    def __call__(self, event, monitor, context):
+        self.record(event)
+
+    def record(self, event, timestamp=None):
+        """Write *event* (or ``ChangeSet``) to the log"""
+        if timestamp is None:
+            timestamp = time.time()
+        if isinstance(event, ChangeSet):
+            events = event
+        else:
+            events = (event,)
+
+        self.batch += 1
+        lines = []
+        for e in events:
+            fields = ['%.3f' % timestamp, str(self.batch),
+                EVENT_CODES[e.type], e.descriptor.name,
+                e.descriptor.filename]
+            if e.type == Event.MODULE_MOVED:
+                fields.extend((e.old_name, e.old_filename))
+            lines.append('\t'.join(fields) + '\n')
+        self.fp.writelines(lines)
+        self.fp.flush()
+
+    def close(self):
+        self.fp.close()
+
+
+def read_log(filepath):
+    """
+    Generates (timestamp, records) pairs of batches in the log
+    *filepath*. Each record is a tuple (event type, module name,
+    filename, old name, old filename).
+    """
+    fp = open(filepath)
+    try:
+        current, timestamp, records = None, None, []
+        for line in fp:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            try:
+                if len(fields) not in (5, 7):
+                    raise ValueError(line)
+                t, batch = float(fields[0]), fields[1]
+                record = (EVENT_TYPES[fields[2]],) + tuple(fields[3:5])
+            except (ValueError, KeyError):
+                LOGGER.warn("Broken event log line: %r" % line)
+                continue
+            if len(fields) == 7:
+                record += tuple(fields[5:7])
+            else:
+                record += (None, None)
+
+            if batch != current and records:
+                yield timestamp, records
+                records = []
+            current, timestamp = batch, t
+            records.append(record)
+        if records:
+            yield timestamp, records
+    finally:
+        fp.close()
+
+def make_event(record, descriptors):
+    """
+    Return ``Event`` of *record* with a descriptor in *descriptors*,
+    or ``None`` if the module is not found.
+    """
+    event_type, name, filename, old_name, old_filename = record
+    descriptor = descriptors.get(name)
+    if descriptor is None and old_name is not None:
+        descriptor = descriptors.get(old_name)
+    if descriptor is None:
+        LOGGER.debug("Module not found, skip replaying %s" % name)
+        return None
+    return Event(event_type, descriptor, old_name, old_filename)
+
+def replay(application, monitor, filepath, speed=1.0, sleep=time.sleep):
+    """
+    Feed events in the log *filepath* to plugins of *application*
+    (See ``Application.invoke_plugins()``) with descriptors of
+    *monitor*. Intervals between events are divided by *speed*, and
+    events are replayed as fast as possible if *speed* is 0.
+    Return the number of events replayed.
+    """
+    count = 0
+    previous = None
+    for timestamp, records in read_log(filepath):
+        if speed > 0 and previous is not None and timestamp > previous:
+            sleep((timestamp - previous) / speed)
+        previous = timestamp
+
+        monitor.lock.acquire()
+        try:
+            descriptors = monitor.descriptors
+            events = [make_event(r, descriptors) for r in records]
+        finally:
+            monitor.lock.release()
+        events = [e for e in events if e is not None]
+        if not events:
+            continue
+        elif len(events) == 1:
+            event = events[0]
+        else:
+            event = ChangeSet(events)
+
+        application.invoke_plugins(event, monitor)
+        while application.step():
+            pass
+        count += len(events)
+    return count
@@ -0,0 +1,294 @@
+"""
+Background Monitor
+================================================
+
+This module provides ``BackgroundMonitor`` which runs
+``modipyd.monitor.Monitor`` in its own thread, so that plugins
+which take long time (e.g. running tests) don't stall detection
+of modifications. Events are passed to the application through
+a bounded ``EventQueue``.
+
+When the queue is full, one of the following overflow
+policies is applied:
+
+``block``
+    The monitor thread waits until the application takes
+    an event from the queue.
+
+``drop-oldest``
+    The oldest event in the queue is dropped.
+
+``merge``
+    All the events in the queue are merged into
+    a ``modipyd.monitor.ChangeSet`` (default).
+
+``BackgroundMonitor`` can also be driven by an external event loop
+(e.g. ``asyncore``, Twisted or Tornado), because compiling and
+analysing modules are done in the monitor thread: register
+``fileno()`` for reading, and take events with non-blocking
+``poll()`` when it is readable.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import os
+import sys
+import threading
+from collections import deque
+
+from modipyd import LOGGER
+from modipyd.monitor import Monitor, ChangeSet
+from modipyd.utils.decorators import require
+
+
+OVERFLOW_POLICIES = ('block', 'drop-oldest', 'merge')
+
+
+class EventQueue(object):
+    """
+    Thread-safe bounded queue of events, holds at most
+    *maxsize* events. *overflow* is a policy applied when
+    the queue is full.
+    """
+
+    # Seconds of each wait of blocking ``get()`` and ``put()``. On
+    # Python 2, ``Condition.wait()`` without timeout can't be
+    # interrupted by signals (e.g. ``KeyboardInterrupt``).
+    WAIT_INTERVAL = 0.5
+
+    # (read, write) file descriptors of the pipe which is readable
+    # while the queue is not empty or is closed. Defined here so
+    # that ``__del__`` works if ``__init__`` failed.
+    __pipe = None
+
+    @require(maxsize=int, overflow=basestring)
+    def __init__(self, maxsize=100, overflow='merge'):
+        super(EventQueue, self).__init__()
+        if maxsize < 1:
+            raise RuntimeError("maxsize must be greater or equal to 1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Unknown overflow policy: %s" % overflow)
+
+        self.maxsize = maxsize
+        self.overflow = overflow
+        # The number of events dropped by ``drop-oldest`` policy
+        self.dropped = 0
+        self.closed = False
+        self.__events = deque()
+        self.__condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.__events)
+
+    def __del__(self):
+        if self.__pipe is not None:
+            for fd in self.__pipe:
+                os.close(fd)
+
+    def fileno(self):
+        """
+        Return the file descriptor which becomes readable when
+        an event is available or the queue is closed, so that
+        the queue can be waited with ``select()``.
+        """
+        condition = self.__condition
+        condition.acquire()
+        try:
+            if self.__pipe is None:
+                self.__pipe = os.pipe()
+                if self.__events or self.closed:
+                    self.__signal()
+            return self.__pipe[0]
+        finally:
+            condition.release()
+
+    def __signal(self):
+        if self.__pipe is not None:
+            os.write(self.__pipe[1], '\0')
+
+    def __unsignal(self):
+        if self.__pipe is not None:
+            os.read(self.__pipe[0], 1)
+
+    def put(self, event):
+        """
+        Put *event* into the queue. Return ``False`` if the queue
+        has been closed.
+        """
+        condition, events = self.__condition, self.__events
+        condition.acquire()
+        try:
+            if self.overflow == 'block':
+                while len(events) >= self.maxsize and not self.closed:
+                    condition.wait(self.WAIT_INTERVAL)
+            if self.closed:
+                return False
+
+            if len(events) >= self.maxsize:
+                if self.overflow == 'drop-oldest':
+                    events.popleft()
+                    self.dropped += 1
+                    LOGGER.warn("Event queue is full, dropped an event")
+                else:
+                    event = self.merge(list(events) + [event])
+                    events.clear()
+            elif not events:
+                self.__signal()
+            events.append(event)
+            condition.notifyAll()
+            return True
+        finally:
+            condition.release()
+
+    def get(self, timeout=None):
+        """
+        Remove and return an event from the queue. Wait at most
+        *timeout* seconds (forever if ``None``, never if 0) until
+        an event is available. Return ``None`` if there is no event,
+        or the queue has been closed and is empty.
+        """
+        condition, events = self.__condition, self.__events
+        condition.acquire()
+        try:
+            if not events and not self.closed:
+                if timeout is None:
+                    while not events and not self.closed:
+                        condition.wait(self.WAIT_INTERVAL)
+                elif timeout > 0:
+                    condition.wait(timeout)
+            if not events:
+                return None
+            event = events.popleft()
+            if not events and not self.closed:
+                self.__unsignal()
+            condition.notifyAll()
+            return event
+        finally:
+            condition.release()
+
+    def close(self):
+        """
+        Close the queue. Events already in the queue are
+        still available.
+        """
+        condition = self.__condition
+        condition.acquire()
+        try:
+            if not self.closed and not self.__events:
+                self.__signal()
+            self.closed = True
+            condition.notifyAll()
+        finally:
+            condition.release()
+
+    def merge(self, events):
+        """Merge *events* (and ``ChangeSet``) into a ``ChangeSet``"""
+        changeset = ChangeSet()
+        for event in events:
+            if isinstance(event, ChangeSet):
+                for e in event:
+                    changeset.add(e)
+            else:
+                changeset.add(event)
+        LOGGER.debug("Event queue is full, merged %d events" %
+            len(changeset))
+        return changeset
+
+
+class BackgroundMonitor(object):
+    """
+    Runs ``Monitor.start()`` in a daemon thread, and generates
+    its events through an ``EventQueue``. Keyword arguments
+    *options* are passed to ``Monitor.start()``.
+
+    Event handlers which walk the module dependency graph
+    should hold ``monitor.lock`` (See ``Monitor``), because
+    the monitor thread updates the graph.
+    """
+
+    @require(monitor=Monitor, queue=(EventQueue, None))
+    def __init__(self, monitor, queue=None, **options):
+        super(BackgroundMonitor, self).__init__()
+        if queue is None:
+            queue = EventQueue()
+        self.monitor = monitor
+        self.queue = queue
+        self.options = options
+        self.thread = None
+        self.exc_info = None
+
+    def __iter__(self):
+        if self.thread is None:
+            self.start()
+        while True:
+            event = self.queue.get()
+            if event is None:
+                break
+            yield event
+
+        self.thread.join()
+        if self.exc_info is not None:
+            # Re-raise exception occurred in the monitor thread
+            exc_info, self.exc_info = self.exc_info, None
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+    def fileno(self):
+        """
+        Return the file descriptor which becomes readable when
+        events are available or the monitor thread has terminated.
+        """
+        return self.queue.fileno()
+
+    def poll(self):
+        """
+        Return a list of events available now without blocking.
+        If the monitor thread has terminated with an exception,
+        the exception is re-raised after all events are taken.
+        """
+        events = []
+        while True:
+            event = self.queue.get(0)
+            if event is None:
+                break
+            events.append(event)
+
+        if not events and self.finished and self.exc_info is not None:
+            exc_info, self.exc_info = self.exc_info, None
+            raise exc_info[0], exc_info[1], exc_info[2]
+        return events
+
+    @property
+    def finished(self):
+        """``True`` if the monitor thread has terminated"""
+        return (self.thread is not None and
+                self.queue.closed and not len(self.queue))
+
+    def start(self):
+        """Start the monitor thread"""
+        if self.thread is not None:
+            raise RuntimeError("Monitor thread has already been started")
+        self.thread = threading.Thread(target=self.run,
+            name="modipyd-monitor")
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            try:
+                for event in self.monitor.start(**self.options):
+                    if not self.queue.put(event):
+                        break
+            except:
+                self.exc_info = sys.exc_info()
+        finally:
+            self.monitor.stop()
+            self.queue.close()
+
+    def stop(self):
+        """
+        Stop the monitor thread. The thread terminates at the end of
+        the current tick.
+        """
+        self.monitor.stop()
+        self.queue.close()
@@ -13,6 +13,8 @@ into ``modipyd.BYTECODE_PROCESSORS`` variable.
 
 import array
 import dis
+import weakref
+from itertools import izip
 from modipyd import HAS_RELATIVE_IMPORTS
 
 
@@ -30,12 +32,15 @@ IMPORT_STAR = dis.opname.index('IMPORT_STAR')
 STORE_NAME = dis.opname.index('STORE_NAME')
 STORE_FAST = dis.opname.index('STORE_FAST')
 STORE_DEREF = dis.opname.index('STORE_DEREF')
+STORE_GLOBAL = dis.opname.index('STORE_GLOBAL')
 
 BUILD_CLASS = dis.opname.index('BUILD_CLASS')
 BUILD_TUPLE = dis.opname.index('BUILD_TUPLE')
 
 POP_TOP = dis.opname.index('POP_TOP')
 
+EXTENDED_ARG = dis.EXTENDED_ARG
+
 
 # ----------------------------------------------------------------
 # Utilities
@@ -52,16 +57,143 @@ def read_argc(op, it):
         argc += (it.next() * 256)
     return argc
 
+class Instructions(object):
+    """
+    Decoded instructions of a code object, parallel arrays of
+    ``offsets``, ``opcodes`` and ``args`` (``0`` for opcodes take
+    no argument). ``EXTENDED_ARG`` prefixes are folded into the
+    argument of the following instruction, whose offset is the
+    offset of the prefix.
+    """
+
+    __slots__ = ('offsets', 'opcodes', 'args')
+
+    def __init__(self, offsets, opcodes, args):
+        super(Instructions, self).__init__()
+        self.offsets = offsets
+        self.opcodes = opcodes
+        self.args = args
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def __iter__(self):
+        """Generates (offset, opcode, argument) tuples"""
+        return izip(self.offsets, self.opcodes, self.args)
+
+
+def _decode(code):
+    # Appending to lists and converting them to arrays at once
+    # is faster than indexing *code* or appending to arrays.
+    offsets, opcodes, args = [], [], []
+    add_offset, add_opcode, add_arg = \
+        offsets.append, opcodes.append, args.append
+
+    have_argument = dis.HAVE_ARGUMENT
+    it = iter(code)
+    next = it.next
+    i = 0
+    for op in it:
+        if op < have_argument:
+            add_offset(i)
+            add_opcode(op)
+            add_arg(0)
+            i += 1
+        elif op != EXTENDED_ARG:
+            add_offset(i)
+            add_opcode(op)
+            add_arg(next() | (next() << 8))
+            i += 3
+        else:
+            start, arg = i, 0
+            while op == EXTENDED_ARG:
+                arg = (arg | next() | (next() << 8)) << 16
+                op = next()
+                i += 3
+            add_offset(start)
+            add_opcode(op)
+            add_arg(arg | next() | (next() << 8))
+            i += 3
+    return Instructions(array.array('L', offsets),
+        array.array('B', opcodes), array.array('L', args))
+
+# id(code) -> (weak reference to code, Instructions)
+_DECODED = {}
+
+def decode(co):
+    """
+    Return ``Instructions`` of code object *co*. Instructions
+    are decoded once and cached while *co* is alive.
+
+    >>> co = compile('import os', '<string>', 'exec')
+    >>> [dis.opname[op] for op in decode(co).opcodes]
+    ['LOAD_CONST', 'LOAD_CONST', 'IMPORT_NAME', 'STORE_NAME', 'LOAD_CONST', 'RETURN_VALUE']
+    >>> decode(co) is decode(co)
+    True
+    """
+    key = id(co)
+    try:
+        ref, instructions = _DECODED[key]
+    except KeyError:
+        pass
+    else:
+        if ref() is co:
+            return instructions
+
+    instructions = _decode(array.array('B', co.co_code))
+    try:
+        ref = weakref.ref(co, lambda r: _DECODED.pop(key, None))
+    except TypeError:
+        # code objects are not weakly referenceable (Python <2.7)
+        return instructions
+    _DECODED[key] = (ref, instructions)
+    return instructions
+
+def triggered(processor, code):
+    """
+    Return ``True`` if *processor* may populate something from
+    bytecode string *code* (See ``BytecodeProcessor.triggers``).
+    Searching opcodes in *code* may find argument bytes, so
+    a processor can be triggered needlessly, but never missed.
+    """
+    triggers = processor.triggers
+    if triggers is None:
+        return True
+    for op in triggers:
+        if chr(op) in code:
+            return True
+    return False
+
+def make_dispatch_table(processors):
+    """
+    Return a list maps each opcode to a tuple of ``process``
+    methods of *processors* subscribing the opcode
+    (See ``BytecodeProcessor.opcodes``).
+    """
+    table = [()] * 256
+    for processor in processors:
+        opcodes = processor.opcodes
+        if opcodes is None:
+            opcodes = range(256)
+        for op in opcodes:
+            table[op] += (processor.process,)
+    return table
+
 def _scan_code(co, processor, context):
     # print "scan_code: %s" % co.co_filename
     assert co and context is not None
-    code_it = code_iter(co)
-    processor.enter(co)
-    for op in code_it:
-        # print dis.opname[op], argc
-        argc = read_argc(op, code_it)
-        processor.process(op, argc, co)
-    processor.exit(co)
+
+    # Code objects no processor is triggered by are not decoded
+    table = processor.dispatch_table(co.co_code)
+    if table is not None:
+        instructions = decode(co)
+        processor.enter(co)
+        for op, argc in izip(instructions.opcodes, instructions.args):
+            # print dis.opname[op], argc
+            # Instructions nobody subscribes cost only decoding
+            for process in table[op]:
+                process(op, argc, co)
+        processor.exit(co)
 
     for c in co.co_consts:
         if isinstance(c, type(co)):
@@ -79,11 +211,33 @@ class BytecodeProcessor(object):
     """
     The ``BytecodeProcessor`` disassembles the bytecode and
     populates properties of the bytecode into context object.
+
+    ``scan_code()`` calls ``process()`` only for instructions
+    whose opcode is in ``opcodes``, or all instructions if
+    ``opcodes`` is ``None``.
+
+    Code objects which contain none of ``triggers`` opcodes are
+    not passed to the processor (nested code objects are still
+    scanned). The processor is given all code objects if
+    ``triggers`` is ``None``.
     """
 
+    opcodes = None
+    triggers = None
+
     def __init__(self):
         super(BytecodeProcessor, self).__init__()
 
+    def dispatch_table(self, code=None):
+        """
+        Return a list maps each opcode to a tuple of ``process``
+        methods (See ``make_dispatch_table()``), or ``None`` if
+        the processor is not triggered by bytecode string *code*.
+        """
+        if code is not None and not triggered(self, code):
+            return None
+        return make_dispatch_table([self])
+
     def enter(self, co):
         pass
 
@@ -109,6 +263,8 @@ class ChainedBytecodeProcessor(BytecodeProcessor):
     def __init__(self, processores):
         super(ChainedBytecodeProcessor, self).__init__()
         self.processores = list(processores)
+        # triggered processors -> dispatch table
+        self.__tables = {}
 
     def enter(self, co):
         for processor in self.processores:
@@ -116,7 +272,23 @@ class ChainedBytecodeProcessor(BytecodeProcessor):
 
     def process(self, op, argc, co):
         for processor in self.processores:
-            processor.process(op, argc, co)
+            if processor.opcodes is None or op in processor.opcodes:
+                processor.process(op, argc, co)
+
+    def dispatch_table(self, code=None):
+        if code is None:
+            processors = tuple(self.processores)
+        else:
+            processors = tuple([p for p in self.processores
+                                if triggered(p, code)])
+            if not processors:
+                return None
+
+        table = self.__tables.get(processors)
+        if table is None:
+            table = self.__tables[processors] = \
+                make_dispatch_table(processors)
+        return table
 
     def exit(self, co):
         for processor in self.processores:
@@ -133,6 +305,11 @@ class ChainedBytecodeProcessor(BytecodeProcessor):
 
 class ImportProcessor(BytecodeProcessor):
 
+    opcodes = frozenset([
+        LOAD_CONST, LOAD_ATTR, IMPORT_NAME, IMPORT_FROM, IMPORT_STAR,
+        STORE_NAME, STORE_FAST, STORE_DEREF, STORE_GLOBAL, POP_TOP])
+    triggers = (IMPORT_NAME,)
+
     def __init__(self):
         super(ImportProcessor, self).__init__()
 
@@ -153,7 +330,8 @@ class ImportProcessor(BytecodeProcessor):
         pass
 
     def exit(self, co):
-        pass
+        # States never continue to another code object
+        self.clear_states()
 
     def process(self, op, argc, co):
         if LOAD_CONST == op:
@@ -211,6 +389,9 @@ class ImportProcessor(BytecodeProcessor):
         elif STORE_DEREF == op:
             #print "STORE_DEREF", co.co_cellvars[argc]
             self.store_name(co.co_cellvars[argc])
+        elif STORE_GLOBAL == op:
+            # global os; import os
+            self.store_name(co.co_names[argc])
 
         elif POP_TOP == op:
             self.clear_states()
@@ -266,6 +447,11 @@ class ImportProcessor(BytecodeProcessor):
 
 class ClassDefinitionProcessor(BytecodeProcessor):
 
+    opcodes = frozenset([
+        LOAD_CONST, LOAD_NAME, LOAD_ATTR, BUILD_TUPLE, BUILD_CLASS,
+        STORE_NAME])
+    triggers = (BUILD_CLASS,)
+
     def __init__(self):
         super(ClassDefinitionProcessor, self).__init__()
         self.classdefs = []
@@ -276,12 +462,21 @@ class ClassDefinitionProcessor(BytecodeProcessor):
         pass
 
     def exit(self, co):
-        pass
+        # Classes defined in functions are not stored by
+        # ``STORE_NAME``, discard them.
+        self.bases = None
+        del self.values[:]
 
     def process(self, op, argc, co):
         values = self.values
 
-        if LOAD_NAME == op:
+        if LOAD_CONST == op:
+            # ``class A:`` loads an empty tuple as bases
+            # (``BUILD_TUPLE 0`` folded by the peephole optimizer)
+            const = co.co_consts[argc]
+            if isinstance(const, tuple) and not const:
+                values.append(const)
+        elif LOAD_NAME == op:
             # print 'LOAD_NAME %s' % co.co_names[argc]
             values.append(co.co_names[argc])
         elif LOAD_ATTR == op:
@@ -293,7 +488,10 @@ class ClassDefinitionProcessor(BytecodeProcessor):
 
             # Because ``scan_code`` does not fully support
             # python bytecode spec, stack can be illegal.
-            if len(values) >= argc:
+            if not argc:
+                # values[-0:] is the whole stack
+                values.append(())
+            elif len(values) >= argc:
                 values[-argc:] = [tuple(values[-argc:])]
                 # print 'BUILD_TUPLE', argc, values[-1]
 
@@ -0,0 +1,254 @@
+"""
+Persistent Scan Cache
+================================================
+
+This module provides ``ScanCache`` which stores the results of
+module analysis (``ModuleCode.context``) in a sqlite database file.
+Entries are keyed by the digest of the module file content, the
+magic number of the interpreter, the scanner (``modipyd.SCANNER``)
+and the bytecode processors (``modipyd.BYTECODE_PROCESSORS``), so
+that a module whose content has been analysed before (e.g. switching
+branches, ``git stash`` or bisecting) is not compiled again, even
+across restarts.
+
+The total size of cached contexts is limited to *max_size* bytes,
+least recently used entries are evicted. The database can be shared
+by concurrent processes: writers are serialized by sqlite, and an
+operation which failed (e.g. the database is locked for too long)
+is regarded as a cache miss.
+
+Counters (``ScanCache.counters``, and ``cache.*`` counters of
+``modipyd.stats.Stats`` if ``stats`` is set):
+
+``hits``, ``misses``
+    The number of lookups found and not found.
+``stores``
+    The number of contexts stored.
+``evictions``
+    The number of entries evicted.
+``errors``
+    The number of database errors.
+
+Counters are recorded per process, lookups in worker processes
+(See ``modipyd.module.scan_module_files()``) are not counted.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import os
+import sys
+import imp
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    from hashlib import sha1
+except ImportError:   # Python <2.5
+    from sha import new as sha1
+
+try:
+    import sqlite3
+except ImportError:   # Python <2.5
+    sqlite3 = None
+
+import modipyd
+from modipyd import LOGGER
+
+
+# Incremented when the format of cached contexts is changed
+CACHE_VERSION = 1
+
+# The default maximum size of cached contexts (bytes)
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS contexts (
+        key TEXT PRIMARY KEY,
+        context BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        used REAL NOT NULL)""",
+    "CREATE INDEX IF NOT EXISTS contexts_used ON contexts (used)",
+]
+
+
+def scan_key(data):
+    """
+    Return the cache key of the module file content *data* scanned
+    with the current interpreter, scanner and bytecode processors.
+    """
+    digest = sha1('%d\0%s\0%s\0%s\0' % (CACHE_VERSION, imp.get_magic(),
+        modipyd.SCANNER, ','.join(modipyd.BYTECODE_PROCESSORS)))
+    digest.update(data)
+    return digest.hexdigest()
+
+def file_key(filepath):
+    """Return the cache key of the module file at *filepath*"""
+    fp = open(filepath, 'rb')
+    try:
+        return scan_key(fp.read())
+    finally:
+        fp.close()
+
+
+class ScanCache(object):
+    """
+    Contexts of scanned module files stored in the sqlite database
+    at *filepath* (created if not exists). *timeout* is seconds to
+    wait for the database locked by other processes.
+    """
+
+    COUNTERS = ('hits', 'misses', 'stores', 'evictions', 'errors')
+
+    def __init__(self, filepath, max_size=DEFAULT_MAX_SIZE, timeout=5.0):
+        if sqlite3 is None:
+            raise ImportError("sqlite3 module is required")
+        super(ScanCache, self).__init__()
+        self.filepath = filepath
+        self.max_size = max_size
+        self.timeout = timeout
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        # ``modipyd.stats.Stats`` instance (optional)
+        self.stats = None
+        self.__connection = None
+        self.__abandoned = []
+        self.__pid = None
+        # Approximate total size of cached contexts
+        self.__size = 0
+
+    def count(self, name, count=1):
+        self.counters[name] += count
+        if self.stats is not None:
+            self.stats.incr('cache.' + name, count)
+
+    def connection(self):
+        """
+        Return the connection to the database of this process.
+        A connection inherited from the parent process is not used
+        (nor closed) in a forked process.
+        """
+        pid = os.getpid()
+        if self.__connection is not None and self.__pid != pid:
+            self.__abandoned.append(self.__connection)
+            self.__connection = None
+        if self.__connection is None:
+            conn = sqlite3.connect(self.filepath, timeout=self.timeout,
+                isolation_level=None)
+            # Losing recent entries on a system crash is harmless
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for sql in _SCHEMA:
+                conn.execute(sql)
+            self.__size = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM contexts").fetchone()[0]
+            self.__connection, self.__pid = conn, pid
+        return self.__connection
+
+    def get(self, key):
+        """
+        Return the context cached with *key* (See ``scan_key()``),
+        or ``None`` if not found.
+        """
+        try:
+            conn = self.connection()
+            row = conn.execute("SELECT context FROM contexts WHERE key = ?",
+                (key,)).fetchone()
+            if row is not None:
+                context = pickle.loads(str(row[0]))
+                conn.execute("UPDATE contexts SET used = ? WHERE key = ?",
+                    (time.time(), key))
+        except (sqlite3.Error, pickle.UnpicklingError, EOFError):
+            LOGGER.debug("Couldn't read scan cache %s" % self.filepath,
+                exc_info=True)
+            self.count('errors')
+            row = None
+
+        if row is None:
+            self.count('misses')
+            return None
+        self.count('hits')
+        return context
+
+    def put(self, key, context):
+        """
+        Store *context* with *key*, and evict least recently used
+        entries if the cache is full.
+        """
+        try:
+            data = pickle.dumps(context, pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError):
+            LOGGER.debug("Couldn't pickle context", exc_info=True)
+            return False
+        try:
+            conn = self.connection()
+            # the size of the entry to be replaced
+            row = conn.execute("SELECT size FROM contexts WHERE key = ?",
+                (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO contexts VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), len(data), time.time()))
+            self.__size += len(data)
+            if row is not None:
+                self.__size -= row[0]
+            if self.__size > self.max_size:
+                self.evict()
+        except sqlite3.Error:
+            LOGGER.debug("Couldn't write scan cache %s" % self.filepath,
+                exc_info=True)
+            self.count('errors')
+            return False
+        self.count('stores')
+        return True
+
+    def evict(self):
+        """
+        Evict least recently used entries until the total size of
+        cached contexts is not greater than ``max_size``. Return the
+        number of evicted entries.
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM contexts").fetchone()[0]
+            keys = []
+            if total > self.max_size:
+                for key, size in conn.execute("SELECT key, size "
+                        "FROM contexts ORDER BY used").fetchall():
+                    keys.append((key,))
+                    total -= size
+                    if total <= self.max_size:
+                        break
+                conn.executemany("DELETE FROM contexts WHERE key = ?", keys)
+            conn.execute("COMMIT")
+        except Exception:
+            # Don't let a failed rollback hide the original error
+            exc_info = sys.exc_info()
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                LOGGER.debug("Couldn't roll back scan cache %s" %
+                    self.filepath, exc_info=True)
+            raise exc_info[0], exc_info[1], exc_info[2]
+        self.__size = total
+        if keys:
+            LOGGER.debug("Evicted %d entries from scan cache" % len(keys))
+            self.count('evictions', len(keys))
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries"""
+        self.connection().execute("DELETE FROM contexts")
+        self.__size = 0
+
+    def __len__(self):
+        return self.connection().execute(
+            "SELECT COUNT(*) FROM contexts").fetchone()[0]
+
+    def close(self):
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
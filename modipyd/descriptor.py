@@ -14,9 +14,21 @@ from modipyd.resolve import resolve_relative_modulename
 
 
 def _update_module_dependencies(module_descriptor, descriptors):
+    """
+    Update dependencies of *module_descriptor*, and return a set of
+    module names which were looked up but not found in *descriptors*.
+    Adding a module named one of them may change the dependencies.
+    """
+    unresolved = set()
+
+    def _exists(name):
+        if name in descriptors:
+            return True
+        unresolved.add(name)
+        return False
 
     def _modulename(name):
-        if name not in descriptors and '.' in name:
+        if not _exists(name) and '.' in name:
             # The qualified name maybe refere a property
             # of the module, so it depends that module.
             module_name = utils.split_module_name(name)[0]
@@ -44,11 +56,11 @@ def _update_module_dependencies(module_descriptor, descriptors):
                 # Implicit relative import
                 if descriptor.package_name:
                     modulename = '.'.join((descriptor.package_name, name))
-                    if modulename not in descriptors and '.' in name:
+                    if not _exists(modulename) and '.' in name:
                         modulename = _modulename(modulename)
 
                 # Implicit relative import failed
-                if modulename not in descriptors:
+                if not _exists(modulename):
                     modulename = _modulename(name)
 
             else:
@@ -59,7 +71,7 @@ def _update_module_dependencies(module_descriptor, descriptors):
                     name, descriptor.package_name, level)
                 modulename = _modulename(modulename)
 
-            if modulename in descriptors:
+            if _exists(modulename):
                 yield modulename
 
     # Dependency Analysis
@@ -68,7 +80,28 @@ def _update_module_dependencies(module_descriptor, descriptors):
         #print "  -> dependent: ", name
         module_descriptor.add_dependency(
                 descriptors[dependent_name])
-
+    return unresolved
+
+
+def file_fingerprint(filepath):
+    """
+    Return the fingerprint ``(size, checksum)`` of the file content.
+    """
+    from zlib import adler32
+
+    fp = open(filepath, 'rb')
+    try:
+        size = os.fstat(fp.fileno()).st_size
+        # Adler-32 is much faster than compiling source code
+        checksum = 1
+        while True:
+            data = fp.read(64 * 1024)
+            if not data:
+                break
+            checksum = adler32(data, checksum)
+        return (size, checksum)
+    finally:
+        fp.close()
 
 def build_module_dependencies(descriptors):
     # Dependency Analysis
@@ -87,14 +120,23 @@ def build_module_descriptors(module_codes):
 
 class ModuleDescriptor(object):
 
-    def __init__(self, module_code):
+    def __init__(self, module_code, fingerprint=False):
+        """
+        If *fingerprint* is ``True``, the file content is also
+        compared when its modification time is changed, so that
+        rewriting identical content is not regarded as modification.
+        """
         super(ModuleDescriptor, self).__init__()
         self.__module_code = module_code
-        self.__mtime = None
+        # (mtime, size, device, inode) of the module file
+        self.__stamp = None
+        self.__fingerprint = None
+        self.fingerprint = fingerprint
         self.modified()
 
         self.__dependencies = OrderedSet()
         self.__reverse_dependencies = OrderedSet()
+        self.__unresolved_names = frozenset()
 
     def __str__(self):
         return "<ModuleDescriptor '%s' (%s)>" % (self.name, self.filename)
@@ -138,6 +180,13 @@ class ModuleDescriptor(object):
     def reverse_dependencies(self):
         return tuple(self.__reverse_dependencies)
 
+    @property
+    def unresolved_names(self):
+        """
+        Names looked up but not resolved at the last dependency update
+        """
+        return self.__unresolved_names
+
     @property
     def module_code(self):
         return self.__module_code
@@ -158,9 +207,18 @@ class ModuleDescriptor(object):
     def context(self):
         return self.module_code.context
 
+    @property
+    def mtime(self):
+        """The modification time at the last ``modified()`` call"""
+        if self.__stamp is None:
+            return None
+        return self.__stamp[0]
+
     def reload(self, descriptors, co=None):
         """
-        Reload module code, update dependency graph
+        Reload module code, update dependency graph (unless
+        *descriptors* is ``None``). Return ``False`` if the module
+        code couldn't be reloaded.
         """
         LOGGER.info(
             "Reload module descriptor '%s' at %s" % \
@@ -172,17 +230,70 @@ class ModuleDescriptor(object):
             # SyntaxError is OK
             LOGGER.warn("SyntaxError found in %s" % self.filename,
                 exc_info=True)
+            return False
         else:
-            self.update_dependencies(descriptors)
+            if descriptors is not None:
+                self.update_dependencies(descriptors)
+            return True
 
     def modified(self):
-        """Update modification time and return ``True`` if modified"""
-        mtime = self.__mtime
+        """
+        Update the stamp of the module file (See
+        ``modipyd.utils.file_stamp()``) and return ``True`` if modified.
+        """
+        stamp = utils.file_stamp(self.filename)
+        modified = stamp != self.__stamp
+        self.__stamp = stamp
+
+        if modified and self.fingerprint:
+            return self.__update_fingerprint()
+        return modified
+
+    def __update_fingerprint(self):
+        # Return ``True`` if the file content is changed
+        fingerprint = self.__fingerprint
+        self.__fingerprint = file_fingerprint(self.filename)
+        if self.__fingerprint == fingerprint:
+            LOGGER.debug("Content not changed: %s" % self.name)
+            return False
+        return True
+
+    def moved_to(self, filepath):
+        """
+        Return ``True`` if *filepath* seems to be the module file
+        moved (renamed): the file has the same inode and modification
+        time, or the same content if ``fingerprint`` is enabled.
+        """
+        if os.path.splitext(filepath)[1] != \
+                os.path.splitext(self.filename)[1]:
+            return False
         try:
-            mtime = os.path.getmtime(self.filename)
-            return self.__mtime is None or mtime > self.__mtime
-        finally:
-            self.__mtime = mtime
+            st = os.stat(filepath)
+        except os.error:
+            return False
+
+        stamp = self.__stamp
+        if stamp is not None and (st.st_dev, st.st_ino) == stamp[2:] and \
+                st.st_mtime == stamp[0]:
+            return True
+        fingerprint = self.__fingerprint
+        if (self.fingerprint and fingerprint is not None and
+                st.st_size == fingerprint[0]):
+            return file_fingerprint(filepath) == fingerprint
+        return False
+
+    def move(self, name, package_name, filename):
+        """
+        Rebind the descriptor to the module *name* at *filename*.
+        Since descriptors are hashed by name, the descriptor must be
+        detached from the dependency graph before calling this.
+        """
+        assert not self.__dependencies and not self.__reverse_dependencies
+        code = self.module_code
+        code.name = name
+        code.package_name = package_name
+        code.filename = filename
+        self.modified()
 
     def add_dependency(self, descriptor):
         self.__dependencies.append(descriptor)
@@ -196,7 +307,8 @@ class ModuleDescriptor(object):
 
     def update_dependencies(self, descriptors):
         LOGGER.debug("Update dependencies of '%s'" % self.name)
-        _update_module_dependencies(self, descriptors)
+        self.__unresolved_names = frozenset(
+            _update_module_dependencies(self, descriptors))
 
     def clear_dependencies(self):
         for d in self.__dependencies:
@@ -230,6 +342,45 @@ class ModuleDescriptor(object):
                     yield v
 
 
+class ImportIndex(object):
+    """
+    Index maps module names which are not resolved in dependency
+    analysis (See ``ModuleDescriptor.unresolved_names``), and module
+    descriptors which looked them up. When a module is added, only
+    descriptors waiting on its name need to update dependencies.
+    """
+
+    def __init__(self):
+        super(ImportIndex, self).__init__()
+        # name -> set of descriptors
+        self.__waiting = {}
+        # descriptor -> indexed names
+        self.__indexed = {}
+
+    def __len__(self):
+        return len(self.__waiting)
+
+    def update(self, descriptor):
+        """Index ``unresolved_names`` of *descriptor*"""
+        self.discard(descriptor)
+        names = descriptor.unresolved_names
+        self.__indexed[descriptor] = names
+        for name in names:
+            self.__waiting.setdefault(name, set()).add(descriptor)
+
+    def discard(self, descriptor):
+        waiting = self.__waiting
+        for name in self.__indexed.pop(descriptor, ()):
+            descriptors = waiting[name]
+            descriptors.discard(descriptor)
+            if not descriptors:
+                del waiting[name]
+
+    def waiting(self, name):
+        """Return a set of descriptors waiting on *name*"""
+        return set(self.__waiting.get(name, ()))
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,417 @@
+"""
+Lexical Module Scanner
+================================================
+
+This module provides an alternative front end to
+``modipyd.bytecode.scan_code()``. It extracts ``imports`` and
+``classdefs`` context of a Python source file without compiling
+it: logical lines are found by a regular expression, and only lines
+which may contain ``import`` or ``class`` statements are tokenized
+(``tokenize`` module). Select it by setting ``modipyd.SCANNER`` to
+``'lexical'``.
+
+The context is compatible with the standard bytecode processors:
+
+``imports``
+    (name, fully qualified name, level) tuples of ``import``
+    statements in any scope, including conditional imports.
+``classdefs``
+    (name, bases) tuples of classes defined in module or
+    class bodies. Each base is a dotted name, or the leading
+    dotted name of a base expression.
+
+Only ``import`` and ``class`` statements are parsed, syntax errors
+elsewhere in the module are not detected. Custom bytecode processors
+(``modipyd.BYTECODE_PROCESSORS``) are not applied. Statements the
+compiler eliminates as dead code (e.g. in ``if 0:`` block) are
+scanned, and bases which are not dotted names (e.g. a call) may
+differ from the bytecode processors.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import re
+import tokenize
+from cStringIO import StringIO
+
+from modipyd import HAS_RELATIVE_IMPORTS
+
+
+# Keywords start a compound statement whose header ends with ':'
+COMPOUND_KEYWORDS = frozenset([
+    'if', 'elif', 'else', 'while', 'for', 'try', 'except', 'finally',
+    'with', 'def', 'class'])
+
+# Tokens significant in a logical line
+_TOKENS = frozenset([tokenize.NAME, tokenize.OP, tokenize.NUMBER,
+                     tokenize.STRING, tokenize.ERRORTOKEN])
+
+# Blank lines and comment lines, and the indentation of
+# the next line
+_BLANK = r'(?:[ \t\f]*(?:#[^\n]*)?\n)*([ \t\f]*)'
+
+# Newlines (1) followed by the indentation (2) of the next line,
+# opening (3) and closing (4) brackets. Other characters, strings,
+# comments and line continuations are skipped. Logical lines are
+# found by these lexemes without tokenizing.
+_LEXEMES = re.compile(r'[^\n\'"#\\()\[\]{}]*(?:' + '|'.join([
+    r'((?:#[^\n]*)?\n' + _BLANK + ')',
+    r'([(\[{])',
+    r'([)\]}])',
+    r"'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*(?:'''|\Z)",
+    r'"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*(?:"""|\Z)',
+    r"'[^'\\\n]*(?:\\.[^'\\\n]*)*(?:'|$)",
+    r'"[^"\\\n]*(?:\\.[^"\\\n]*)*(?:"|$)',
+    r'#[^\n]*',
+    r'\\.',
+]) + ')', re.DOTALL | re.MULTILINE)
+_BLANK_LINES = re.compile(_BLANK)
+
+# Logical lines which may contain ``import`` or ``class`` statements
+_STATEMENTS = re.compile(r'\b(?:import|class)\b')
+_DEF = re.compile(r'def\b')
+
+
+def _logical_lines(source):
+    """
+    Generates (indentation, start, end) of each logical line in
+    *source*, blank lines and comments are not included.
+    """
+    m = _BLANK_LINES.match(source)
+    indent, start = m.group(1), m.end()
+    nesting = 0
+    for m in _LEXEMES.finditer(source, start):
+        kind = m.lastindex
+        if kind == 1:
+            if not nesting:
+                yield indent, start, m.start(1)
+                indent, start = m.group(2), m.end()
+        elif kind == 3:
+            nesting += 1
+        elif kind == 4 and nesting:
+            nesting -= 1
+    if start < len(source):
+        yield indent, start, len(source)
+
+def _tokenize(line):
+    # Return a list of (type, string) of significant tokens
+    return [(tok[0], tok[1])
+            for tok in tokenize.generate_tokens(StringIO(line).readline)
+            if tok[0] in _TOKENS]
+
+def _split_statements(tokens):
+    """
+    Split tokens of a logical line into simple statements and
+    compound statement headers (e.g. ``if x: import os; import sys``
+    is splitted into ``if x``, ``import os`` and ``import sys``).
+    Return a list of (tokens, has_body) pairs, *has_body* is
+    ``True`` for headers.
+    """
+    statements = []
+    start = 0
+    nesting = lambdas = 0
+    header = tokens[0][1] in COMPOUND_KEYWORDS
+    for i, (typ, s) in enumerate(tokens):
+        if typ != tokenize.OP and typ != tokenize.NAME:
+            continue
+        if s in '([{':
+            nesting += 1
+        elif s in ')]}':
+            nesting -= 1
+        elif nesting:
+            continue
+        elif s == 'lambda':
+            lambdas += 1
+        elif s == ':' and lambdas:
+            lambdas -= 1
+        elif s == ':' and header:
+            statements.append((tokens[start:i], True))
+            start = i + 1
+            header = (start < len(tokens) and
+                      tokens[start][1] in COMPOUND_KEYWORDS)
+        elif s == ';':
+            statements.append((tokens[start:i], False))
+            start = i + 1
+            header = (start < len(tokens) and
+                      tokens[start][1] in COMPOUND_KEYWORDS)
+    if start < len(tokens):
+        statements.append((tokens[start:], False))
+    return statements
+
+def _dotted_name(tokens, i):
+    """
+    Read a dotted name at *tokens[i]*, and return (name, index
+    of the next token). The name is an empty string if
+    *tokens[i]* is not a name.
+    """
+    names = []
+    n = len(tokens)
+    while i < n and tokens[i][0] == tokenize.NAME:
+        names.append(tokens[i][1])
+        i += 1
+        if i + 1 < n and tokens[i][1] == '.' and \
+                tokens[i+1][0] == tokenize.NAME:
+            i += 1
+        else:
+            break
+    return '.'.join(names), i
+
+def mangle(private, name):
+    """
+    Mangle private *name* in a class whose name is *private*,
+    same as the compiler does for names in the bytecode
+
+    >>> mangle('A', '__spam')
+    '_A__spam'
+    >>> mangle('_A', '__spam__')
+    '__spam__'
+    """
+    if (not private or not name.startswith('__') or
+            name.endswith('__') or '.' in name):
+        return name
+    private = private.lstrip('_')
+    if not private:
+        return name
+    return '_%s%s' % (private, name)
+
+def _split_commas(tokens):
+    # Split *tokens* at commas not enclosed by brackets
+    items, start, nesting = [], 0, 0
+    for i, (typ, s) in enumerate(tokens):
+        if typ != tokenize.OP:
+            continue
+        if s in '([{':
+            nesting += 1
+        elif s in ')]}':
+            nesting -= 1
+        elif s == ',' and not nesting:
+            items.append(tokens[start:i])
+            start = i + 1
+    items.append(tokens[start:])
+    return [item for item in items if item]
+
+
+class Scope(object):
+    """
+    Module, class or function body (a code object). *keyword* is
+    ``'class'``, ``'def'`` or ``None`` for the module. Private names
+    in the scope are mangled with the class name *private*.
+    """
+
+    def __init__(self, keyword=None, private=None):
+        super(Scope, self).__init__()
+        self.keyword = keyword
+        self.private = private
+        self.imports = []
+        self.classdefs = []
+        self.children = []
+
+    def child(self, keyword, name):
+        if keyword == 'class':
+            scope = Scope(keyword, name)
+        else:
+            scope = Scope(keyword, self.private)
+        self.children.append(scope)
+        return scope
+
+    def mangle(self, name):
+        return mangle(self.private, name)
+
+    def walk(self):
+        """
+        Generates this scope and nested scopes in the order
+        ``modipyd.bytecode.scan_code()`` visits code objects
+        """
+        stack = [self]
+        while stack:
+            scope = stack.pop()
+            yield scope
+            stack.extend(reversed(scope.children))
+
+
+class LexicalScanner(object):
+    """
+    Extracts ``imports`` and ``classdefs`` from tokens of
+    a module (See ``scan_source()``).
+    """
+
+    def __init__(self):
+        super(LexicalScanner, self).__init__()
+        self.module = Scope()
+        # ``from __future__ import absolute_import``
+        self.absolute_import = False
+
+    def scan(self, source):
+        # (indentation of the header, Scope). Lines indented
+        # deeper than the header are in the body.
+        scopes = [(-1, self.module)]
+        for indent, start, end in _logical_lines(source):
+            if '\t' in indent:
+                indent = len(indent.expandtabs())
+            else:
+                indent = len(indent)
+            while scopes[-1][0] >= indent:
+                scopes.pop()
+
+            scope = scopes[-1][1]
+            if not _STATEMENTS.search(source, start, end):
+                # Only functions nest scopes
+                if _DEF.match(source, start):
+                    scopes.append((indent, scope.child('def', None)))
+                continue
+
+            tokens = _tokenize(source[start:end] + '\n')
+            if not tokens:
+                continue
+            # Statements after the header of a compound statement
+            # on the same line are in its body.
+            statements = _split_statements(tokens)
+            for stmt, has_body in statements:
+                if not stmt:
+                    continue
+                keyword = stmt[0][1]
+                if keyword == 'import':
+                    self.import_statement(scope, stmt)
+                elif keyword == 'from':
+                    self.from_statement(scope, stmt)
+                elif keyword == 'class':
+                    # Only names stored in module and class
+                    # namespaces (``STORE_NAME``) are classes
+                    if scope.keyword != 'def':
+                        self.class_statement(scope, stmt)
+
+                if keyword in ('def', 'class') and len(stmt) > 1:
+                    scope = scope.child(keyword, stmt[1][1])
+                    scopes.append((indent, scope))
+
+    def level(self, dots):
+        """
+        Return the level of an import with *dots* leading dots
+        (See ``ImportProcessor``). ``__future__`` imports take
+        effect in the whole module.
+        """
+        if dots:
+            return dots
+        elif HAS_RELATIVE_IMPORTS and self.absolute_import:
+            return 0
+        else:
+            return -1
+
+    def import_statement(self, scope, tokens):
+        # 'import' dotted_name ['as' NAME] (',' ...)*
+        for item in _split_commas(tokens[1:]):
+            fqn, i = _dotted_name(item, 0)
+            if not fqn:
+                continue
+            fqn = scope.mangle(fqn)
+            if i + 1 < len(item) and item[i][1] == 'as':
+                name = scope.mangle(item[i+1][1])
+            else:
+                # the top level package is bound
+                names = fqn.split('.')
+                names[0] = scope.mangle(names[0])
+                name = '.'.join(names)
+            scope.imports.append((name, fqn, 0))
+
+    def from_statement(self, scope, tokens):
+        # 'from' ('.'* dotted_name | '.'+) 'import' ...
+        i, n = 1, len(tokens)
+        dots = 0
+        while i < n and tokens[i][1] == '.':
+            dots += 1
+            i += 1
+        module = ''
+        if i < n and tokens[i][1] != 'import':
+            module, i = _dotted_name(tokens, i)
+        if i >= n or tokens[i][1] != 'import':
+            return
+
+        if module == '__future__':
+            names = [t[1] for t in tokens[i+1:] if t[0] == tokenize.NAME]
+            if 'absolute_import' in names:
+                self.absolute_import = True
+        module = scope.mangle(module)
+
+        names = tokens[i+1:]
+        if names and names[0][1] == '(':
+            names = names[1:-1]
+        for item in _split_commas(names):
+            if item[0][1] == '*':
+                name = fromname = '*'
+            else:
+                fromname = name = scope.mangle(item[0][1])
+                if len(item) >= 3 and item[1][1] == 'as':
+                    name = scope.mangle(item[2][1])
+            if module:
+                fqn = '%s.%s' % (module, fromname)
+            else:
+                fqn = fromname
+            scope.imports.append((name, fqn, dots))
+
+    def class_statement(self, scope, tokens):
+        # 'class' NAME ['(' [bases] ')']
+        if len(tokens) < 2 or tokens[1][0] != tokenize.NAME:
+            return
+        name = scope.mangle(tokens[1][1])
+        bases = []
+        if len(tokens) > 3 and tokens[2][1] == '(':
+            for item in _split_commas(tokens[3:-1]):
+                base = _dotted_name(item, 0)[0]
+                if base:
+                    bases.append('.'.join([scope.mangle(s)
+                                           for s in base.split('.')]))
+        scope.classdefs.append((name, tuple(bases)))
+
+    def populate(self, context):
+        imports = context.setdefault('imports', [])
+        classdefs = context.setdefault('classdefs', [])
+        for scope in self.module.walk():
+            imports.extend([(name, fqn, self.level(dots))
+                            for name, fqn, dots in scope.imports])
+            classdefs.extend(scope.classdefs)
+
+
+def scan_source(source, context):
+    """
+    Extract ``imports`` and ``classdefs`` from Python *source*
+    string into *context* dictionary. Raise ``SyntaxError`` if
+    *source* can't be tokenized.
+
+    >>> context = {}
+    >>> scan_source('''
+    ... try:
+    ...     from os import path as p
+    ... except ImportError: import posixpath as p
+    ... class A(p.B): pass
+    ... ''', context)
+    >>> context['imports']
+    [('p', 'os.path', -1), ('p', 'posixpath', -1)]
+    >>> context['classdefs']
+    [('A', ('p.B',))]
+    """
+    if '\r' in source:
+        source = source.replace('\r\n', '\n').replace('\r', '\n')
+    scanner = LexicalScanner()
+    try:
+        scanner.scan(source)
+    except tokenize.TokenError, e:
+        raise SyntaxError(e.args[0])
+    scanner.populate(context)
+
+def scan_file(filepath, context):
+    """Same as ``scan_source()``, but reads source from *filepath*"""
+    fp = open(filepath, 'U')
+    try:
+        source = fp.read()
+    finally:
+        fp.close()
+    try:
+        scan_source(source, context)
+    except SyntaxError, e:
+        raise SyntaxError(e.args[0], (filepath, None, None, None))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -5,11 +5,14 @@ Python module code representation.
     :license: MIT, see LICENSE for more details.
 """
 
+import modipyd
 from modipyd import utils, LOGGER, BYTECODE_PROCESSORS
 from modipyd.resolve import ModuleNameResolver
 from modipyd.utils import filepath_to_identifier
 from modipyd.utils.decorators import require
 from modipyd import bytecode as bc
+from modipyd import lexical
+from modipyd.cache import file_key
 
 
 # ----------------------------------------------------------------
@@ -61,6 +64,9 @@ PYTHON_FILE_TYPES = {
     '.pyo': PYTHON_OPTIMIZED_MASK,
 }
 
+# Filename patterns (fnmatch) never be monitored
+IGNORE_PATTERNS = ['.?*', 'CVS']
+
 
 @require(filename=basestring)
 def module_file_typebits(filename):
@@ -69,10 +75,22 @@ def module_file_typebits(filename):
     typebits = PYTHON_FILE_TYPES.get(ext, 0)
     return (path, ext, typebits)
 
-def collect_python_module_file(filepath_or_list):
-    """Generates (filepath without extention, bitmask)"""
+def python_module_typebits(filename):
+    """
+    Return typebits of existing python module files named *filename*
+    (filepath without file extention).
+    """
+    from os.path import isfile
+    typebits = 0
+    for ext, mask in PYTHON_FILE_TYPES.iteritems():
+        if isfile(filename + ext):
+            typebits |= mask
+    return typebits
+
+def python_module_files(filepaths):
+    """Generates (filepath without extention, bitmask) in *filepaths*"""
     modules = {}
-    for filepath in utils.collect_files(filepath_or_list, ['.?*', 'CVS']):
+    for filepath in filepaths:
         # For performance gain, use bitmask value
         # instead of filepath string.
         path, _, typebits = module_file_typebits(filepath)
@@ -80,29 +98,142 @@ def collect_python_module_file(filepath_or_list):
         modules[path] |= typebits
     return (item for item in modules.iteritems() if item[1] > 0)
 
-def collect_module_code(filepath_or_list, search_path=None):
+def make_path_filter(filepath_or_list, excludes=(), includes=None,
+        ignore_files=()):
+    """
+    Return ``modipyd.utils.matcher.PathFilter`` which excludes
+    ``IGNORE_PATTERNS`` and *excludes* patterns. See ``PathFilter``
+    for *includes* and *ignore_files*.
+    """
+    return utils.PathFilter(filepath_or_list,
+        IGNORE_PATTERNS + list(excludes), includes, ignore_files)
+
+def collect_python_module_file(filepath_or_list, path_filter=None,
+        git=False):
+    """
+    Generates (filepath without extention, bitmask). *path_filter*
+    is a ``PathFilter`` (See ``make_path_filter()``). If *git* is
+    ``True``, files are enumerated from the git index if possible
+    (See ``modipyd.utils.gitindex``).
+    """
+    if path_filter is None:
+        path_filter = make_path_filter(filepath_or_list)
+    return python_module_files(
+        utils.collect_files(filepath_or_list, path_filter, git))
+
+def collect_module_code(filepath_or_list, search_path=None, jobs=1):
+    """
+    Generates ``ModuleCode`` instances of modules in
+    *filepath_or_list*. If *jobs* is not 1, modules are compiled
+    and analysed in parallel (See ``scan_module_files()``).
+    """
     resolver = ModuleNameResolver(search_path)
-    for filename, typebits in collect_python_module_file(filepath_or_list):
+    module_files = list(collect_python_module_file(filepath_or_list))
+    contexts = {}
+    if jobs != 1:
+        contexts = scan_module_files(module_files, jobs)
+
+    for filename, typebits in module_files:
         try:
             yield read_module_code(filename,
                 search_path=search_path, typebits=typebits,
-                resolver=resolver, allow_compilation_failure=True)
+                resolver=resolver, allow_compilation_failure=True,
+                context=contexts.get(filename))
         except ImportError:
             LOGGER.debug("Couldn't import file", exc_info=True)
 
 
+def module_source_path(filename, typebits):
+    """
+    Return the filepath of the module file to be loaded.
+    *filename* is filepath without file extention.
+    """
+    # Since editing .py files will not affect .pyc and .pyo files soon,
+    # give priority to .py files.
+    if typebits & PYTHON_SOURCE_MASK:
+        return filename + '.py'
+    elif typebits & PYTHON_OPTIMIZED_MASK:
+        return filename + '.pyo'
+    elif typebits & PYTHON_COMPILED_MASK:
+        return filename + '.pyc'
+    else:
+        assert False, "illegal typebits: %d" % typebits
+
+# Available values of ``modipyd.SCANNER``
+SCANNERS = ('bytecode', 'lexical')
+
+def lexical_scan(sourcepath):
+    """
+    Return the context of the source file at *sourcepath* extracted
+    by the lexical scanner (See ``modipyd.lexical``), or ``None`` if
+    ``modipyd.SCANNER`` is not ``'lexical'`` or *sourcepath* is not
+    a *.py* file. Then the module code must be compiled or loaded.
+    """
+    if modipyd.SCANNER != 'lexical' or not sourcepath.endswith('.py'):
+        return None
+    context = {}
+    lexical.scan_file(sourcepath, context)
+    return context
+
+# ``modipyd.cache.ScanCache`` instance which stores contexts
+# of scanned module files (optional)
+SCAN_CACHE = None
+
+def cached_scan(sourcepath):
+    """
+    Return (key, context) of the module file at *sourcepath*.
+    The context is found in ``SCAN_CACHE``, or extracted by
+    ``lexical_scan()``. If the context is ``None``, the module code
+    must be compiled or loaded, then the result should be stored
+    by ``store_context()`` with *key* (``None`` if the cache is
+    disabled).
+    """
+    key = None
+    if SCAN_CACHE is not None:
+        key = file_key(sourcepath)
+        context = SCAN_CACHE.get(key)
+        if context is not None:
+            return key, context
+
+    context = lexical_scan(sourcepath)
+    if context is not None:
+        store_context(key, context)
+    return key, context
+
+def store_context(key, context):
+    """Store *context* in ``SCAN_CACHE`` with *key*"""
+    if key is not None and SCAN_CACHE is not None:
+        SCAN_CACHE.put(key, context)
+
+def load_module_code(sourcepath):
+    """
+    Compile or load the module file at *sourcepath*, and return
+    its ``code`` object (``None`` for *.pyo* files).
+    """
+    if sourcepath.endswith('.py'):
+        return compile_source(sourcepath)
+    elif sourcepath.endswith('.pyc'):
+        return load_compiled(sourcepath)
+    else:
+        return None
+
+
 @require(filename=basestring,
          typebits=(int, None),
-         resolver=(ModuleNameResolver, None))
+         resolver=(ModuleNameResolver, None),
+         context=(dict, None))
 def read_module_code(filename, typebits=None, search_path=None,
         resolver=None,
         allow_compilation_failure=False,
-        allow_standalone=False):
+        allow_standalone=False,
+        context=None):
     """
     Read python module file, and return ``ModuleCode`` instance.
     If *typebits* argument is not ``None``, *filename* must be
     filepath without file extention.
     If *typebits* argument is ``None``, it is detected by filename.
+    If *context* argument is not ``None``, it is used as the result
+    of bytecode analysis instead of compiling the module file.
     """
 
     if typebits is None:
@@ -110,29 +241,19 @@ def read_module_code(filename, typebits=None, search_path=None,
     if resolver is None:
         resolver = ModuleNameResolver(search_path)
 
-    code = None
-    try:
-        # Since editing .py files will not affect .pyc and .pyo files soon,
-        # give priority to .py files.
-        if typebits & PYTHON_SOURCE_MASK:
-            # .py
-            sourcepath = filename + '.py'
-            code = compile_source(sourcepath)
-        elif typebits & (PYTHON_OPTIMIZED_MASK | PYTHON_COMPILED_MASK):
-            # .pyc, .pyo
-            if typebits & PYTHON_OPTIMIZED_MASK:
-                sourcepath = filename + '.pyo'
-            else:
-                sourcepath = filename + '.pyc'
-                code = load_compiled(sourcepath)
-        else:
-            assert False, "illegal typebits: %d" % typebits
-    except (SyntaxError, ImportError):
-        LOGGER.warn(
-            "Exception occurred while loading compiled bytecode",
-            exc_info=True)
-        if not allow_compilation_failure:
-            raise
+    sourcepath = module_source_path(filename, typebits)
+    code = key = None
+    if context is None:
+        try:
+            key, context = cached_scan(sourcepath)
+            if context is None:
+                code = load_module_code(sourcepath)
+        except (SyntaxError, ImportError):
+            LOGGER.warn(
+                "Exception occurred while loading compiled bytecode",
+                exc_info=True)
+            if not allow_compilation_failure:
+                raise
 
     try:
         module_name, package_name = resolver.resolve(sourcepath)
@@ -142,7 +263,84 @@ def read_module_code(filename, typebits=None, search_path=None,
         module_name = filepath_to_identifier(sourcepath)
         package_name = None
 
-    return ModuleCode(module_name, package_name, sourcepath, code)
+    module_code = ModuleCode(module_name, package_name, sourcepath, code)
+    if context is not None:
+        module_code.context.update(context)
+    elif code is not None:
+        store_context(key, module_code.context)
+    return module_code
+
+
+# ----------------------------------------------------------------
+# Parallel scan
+# ----------------------------------------------------------------
+# The minimum number of modules to be scanned in parallel, because
+# starting worker processes is not free.
+PARALLEL_SCAN_THRESHOLD = 16
+
+def scan_module_file(module_file):
+    """
+    Compile and analyse the module file *module_file*
+    (``(filename, typebits)`` pair) in a worker process, and return
+    ``(filename, context)``. The context is ``None`` if failed.
+    """
+    filename, typebits = module_file
+    sourcepath = module_source_path(filename, typebits)
+    try:
+        key, context = cached_scan(sourcepath)
+        if context is not None:
+            return (filename, context)
+        code = load_module_code(sourcepath)
+    except (SyntaxError, ImportError, EnvironmentError):
+        # Leave error handling to ``read_module_code()``
+        return (filename, None)
+    if code is None:
+        return (filename, None)
+
+    context = {}
+    bc.scan_code(code, load_bytecode_processors(), context)
+    store_context(key, context)
+    return (filename, context)
+
+def scan_module_files(module_files, jobs=None):
+    """
+    Compile and analyse module files in *module_files* in parallel
+    with *jobs* worker processes (the number of CPUs if *jobs* is
+    ``None`` or 0), and return a dictionary maps filename and
+    context. Failed modules are not contained in the dictionary.
+    Return an empty dictionary if parallel processing is not
+    available or not worth it.
+    """
+    module_files = list(module_files)
+    try:
+        import multiprocessing
+    except ImportError:   # Python <2.6
+        return {}
+
+    if not jobs:
+        try:
+            jobs = multiprocessing.cpu_count()
+        except NotImplementedError:
+            jobs = 1
+    if jobs <= 1 or len(module_files) < PARALLEL_SCAN_THRESHOLD:
+        return {}
+
+    LOGGER.info("Scanning %d modules with %d processes" %
+        (len(module_files), jobs))
+    pool = multiprocessing.Pool(jobs)
+    try:
+        chunksize = max(1, len(module_files) // (jobs * 4))
+        contexts = {}
+        for filename, context in pool.imap_unordered(
+                scan_module_file, module_files, chunksize):
+            if context is not None:
+                contexts[filename] = context
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    pool.join()
+    return contexts
 
 
 # ----------------------------------------------------------------
@@ -221,10 +419,21 @@ class ModuleCode(object):
         bc.scan_code(co, processor, self.context)
 
     def reload(self, co=None):
+        """
+        Update the context with code object *co*, or the module
+        file. Return the code object (``None`` if the context was
+        found in the scan cache or extracted by the lexical scanner).
+        """
+        key = None
         if co is None:
             f = self.filename
 
-            if utils.python_source_file(f):
+            key, context = cached_scan(f)
+            if context is not None:
+                self.context.clear()
+                self.context.update(context)
+                return None
+            elif utils.python_source_file(f):
                 co = compile_source(f)
             elif utils.python_compiled_file(f):
                 co = load_compiled(f)
@@ -232,6 +441,7 @@ class ModuleCode(object):
                 raise ImportError("No module named %s at %s" % (self.name, f))
 
         self.update_code(co)
+        store_context(key, self.context)
         return co
 
     def __str__(self):
@@ -11,15 +11,25 @@ used to monitor Python module file modifications.
 import os
 from errno import ENOENT
 import logging
-import time
-from os.path import splitext
+import threading
+from os.path import splitext, join, dirname
 
 from modipyd import LOGGER
 from modipyd import utils
+from modipyd import snapshot
 from modipyd.module import read_module_code, \
-                           collect_python_module_file
-from modipyd.resolve import ModuleNameResolver
-from modipyd.descriptor import ModuleDescriptor
+                           scan_module_files, \
+                           module_source_path, \
+                           module_file_typebits, \
+                           python_module_typebits, \
+                           python_module_files, \
+                           make_path_filter
+from modipyd.resolve import ResolverPool, normalize_path
+from modipyd.descriptor import ModuleDescriptor, ImportIndex
+from modipyd.watcher import Watcher, PollingWatcher
+from modipyd.scheduler import Scheduler, FixedScheduler, TieredPolling
+from modipyd.stats import Stats
+from modipyd.utils import filepath_to_identifier
 from modipyd.utils.decorators import require
 
 
@@ -29,15 +39,103 @@ class Event(object):
     """
 
     # Enumeration that represents event types
-    TYPES = range(3)
-    MODULE_MODIFIED, MODULE_CREATED, MODULE_REMOVED = TYPES
+    TYPES = range(4)
+    MODULE_MODIFIED, MODULE_CREATED, MODULE_REMOVED, MODULE_MOVED = TYPES
 
-    @require(type=int, descriptor=ModuleDescriptor)
-    def __init__(self, event_type, descriptor):
+    @require(type=int, descriptor=ModuleDescriptor,
+             old_name=(basestring, None), old_filename=(basestring, None))
+    def __init__(self, event_type, descriptor,
+            old_name=None, old_filename=None, dependents=()):
+        """
+        For ``MODULE_MOVED`` event, *old_name* and *old_filename* are
+        the name and filepath of the module before moved, and
+        *dependents* are descriptors which imported the old name.
+        """
         if event_type not in Event.TYPES:
             raise RuntimeError("illegal event type: %d" % event_type)
         self.type = event_type
         self.descriptor = descriptor
+        self.old_name = old_name
+        self.old_filename = old_filename
+        self.dependents = tuple(dependents)
+
+
+# Counter names of events (See ``modipyd.stats``)
+EVENT_COUNTERS = dict(zip(Event.TYPES, (
+    'events.modified', 'events.created', 'events.removed', 'events.moved')))
+
+
+class ChangeSet(object):
+    """
+    The ``ChangeSet`` gathers ``Event`` instances occurred
+    in a coalescing window. Iterating a ``ChangeSet`` generates
+    per-module ``Event`` instances. Events for the same module
+    are merged into one event.
+    """
+
+    def __init__(self, events=()):
+        super(ChangeSet, self).__init__()
+        self.__events = []
+        # module name -> index of self.__events
+        self.__indexes = {}
+        for event in events:
+            self.add(event)
+
+    def __iter__(self):
+        return (e for e in self.__events if e is not None)
+
+    def __len__(self):
+        return len(self.__indexes)
+
+    @property
+    def descriptors(self):
+        """Descriptors of all affected modules"""
+        return tuple(e.descriptor for e in self)
+
+    def add(self, event):
+        """Add *event*, and merge it with prior event for the module"""
+        name = event.descriptor.name
+        if (event.type == Event.MODULE_MOVED and
+                event.old_name in self.__indexes):
+            # Prior event was added with the old name
+            self.__indexes[name] = self.__indexes.pop(event.old_name)
+        i = self.__indexes.get(name)
+        if i is None:
+            self.__indexes[name] = len(self.__events)
+            self.__events.append(event)
+            return
+
+        prior = self.__events[i]
+        if event.type == Event.MODULE_MOVED:
+            if prior.type == Event.MODULE_CREATED:
+                self.__events[i] = Event(Event.MODULE_CREATED,
+                                         event.descriptor)
+            elif prior.type == Event.MODULE_MOVED:
+                # moved twice
+                self.__events[i] = Event(Event.MODULE_MOVED,
+                    event.descriptor, prior.old_name, prior.old_filename,
+                    prior.dependents + event.dependents)
+            else:
+                self.__events[i] = event
+        elif (prior.type == Event.MODULE_MOVED and
+                event.type == Event.MODULE_MODIFIED):
+            # still moved
+            pass
+        elif prior.type == Event.MODULE_CREATED:
+            if event.type == Event.MODULE_REMOVED:
+                # created and removed in a window
+                self.__events[i] = None
+                del self.__indexes[name]
+            else:
+                self.__events[i] = Event(Event.MODULE_CREATED,
+                                         event.descriptor)
+        elif (prior.type == Event.MODULE_REMOVED and
+                event.type == Event.MODULE_CREATED):
+            # removed and created again
+            self.__events[i] = Event(Event.MODULE_MODIFIED,
+                                     event.descriptor)
+        else:
+            self.__events[i] = event
 
 
 class Monitor(object):
@@ -49,22 +147,85 @@ class Monitor(object):
     these generater yields ``Event`` instance.
     """
 
-    def __init__(self, filepath_or_list, search_path=None):
-        from modipyd.resolve import normalize_path
-
+    @require(tiers=(TieredPolling, None), snapshot=(basestring, None),
+             jobs=int, stats=(Stats, None), search_paths=(dict, None))
+    def __init__(self, filepath_or_list, search_path=None,
+            fingerprint=False, tiers=None, snapshot=None, jobs=1,
+            stats=None, excludes=(), includes=None, ignore_files=(),
+            git=False, search_paths=None):
+        """
+        Monitor modules in *filepath_or_list*, and resolve their names
+        on *search_path*. If *fingerprint* is ``True``, modules whose
+        content is not changed are not regarded as modified (See
+        ``ModuleDescriptor``). If *tiers* (``TieredPolling``) is
+        specified, ``monitor()`` checks only recently modified
+        modules and a part of other modules at each tick.
+
+        If *snapshot* filepath is specified, the state of monitor is
+        restored from the file at startup, and saved to the file
+        (See ``modipyd.snapshot``).
+
+        If *jobs* is not 1, new modules are compiled and analysed
+        with *jobs* worker processes (the number of CPUs if 0).
+        See ``modipyd.module.scan_module_files()``.
+
+        If *stats* (``modipyd.stats.Stats``) is specified, activities
+        of monitor are recorded in it.
+
+        Files and directories matching *excludes* patterns are not
+        monitored, and if *includes* patterns are specified, only
+        matching files are monitored. Patterns in *ignore_files*
+        (e.g. ``.gitignore``) in directories are also honoured
+        (See ``modipyd.utils.matcher``).
+
+        If *git* is ``True``, directories in git work trees are
+        enumerated from the git index at startup, instead of
+        listing them (See ``modipyd.utils.gitindex``).
+
+        *search_paths* is a dictionary which maps a root directory
+        (one of *filepath_or_list*) to the module search path for
+        modules in it, so that several projects are monitored by
+        one monitor and share one dependency graph. *search_path*
+        is used for modules not in these roots. A module whose name
+        is already monitored (e.g. the same package in several roots)
+        is not monitored, and a warning is logged.
+        """
         super(Monitor, self).__init__()
         self.search_path = search_path
+        self.fingerprint = fingerprint
+        self.tiers = tiers
+        self.snapshot = snapshot
+        self.jobs = jobs
+        self.stats = stats
 
         # paths will be used as dictionary key,
         # so make it normalized.
         paths = utils.sequence(filepath_or_list)
         self.paths = [normalize_path(i) for i in paths]
         assert not isinstance(self.paths, basestring)
+        self.path_filter = make_path_filter(self.paths,
+            excludes, includes, ignore_files)
+        # (root directory, search path) pairs, longer root first
+        self.search_paths = sorted(
+            [(normalize_path(root), path)
+                for root, path in (search_paths or {}).iteritems()],
+            key=lambda item: len(item[0]), reverse=True)
 
         self.monitoring = False
+        # Held while ``start()`` updates descriptors and
+        # the dependency graph.
+        self.lock = threading.RLock()
+        self.__index = utils.DirectoryIndex(self.paths,
+            self.path_filter, git)
         self.__descriptors = None
+        # ``True`` after the initial ``refresh()``
+        self.__populated = False
         self.__filenames = {}
         self.__failures = set()
+        # unresolved imports of descriptors
+        self.__imports = ImportIndex()
+        # Resolvers for each root share caches across refreshes
+        self.__resolvers = ResolverPool()
 
     @property
     def descriptors(self):
@@ -74,10 +235,23 @@ class Monitor(object):
         """
         if self.__descriptors is None:
             self.__descriptors = {}
+            if self.snapshot:
+                snapshot.load(self, self.snapshot)
             entries = list(self.refresh())
+            self.__populated = True
             LOGGER.debug("%d descriptoes" % len(entries))
+            if self.snapshot:
+                self.save_snapshot()
         return self.__descriptors
 
+    def save_snapshot(self):
+        """Save the state of monitor to ``snapshot`` file"""
+        try:
+            snapshot.save(self, self.snapshot)
+        except (IOError, OSError):
+            LOGGER.warn("Couldn't save snapshot to %s" % self.snapshot,
+                exc_info=True)
+
     @require(descriptor=ModuleDescriptor)
     def remove(self, descriptor):
         """Remove *descriptor*, and clear dependencies"""
@@ -91,10 +265,22 @@ class Monitor(object):
                 descriptor.name)
 
         LOGGER.debug("Removed: %s" % descriptor.describe())
+        if self.tiers is not None:
+            self.tiers.discard(descriptor)
+        self.__imports.discard(descriptor)
         descriptor.clear_dependencies()
         del descriptors[descriptor.name]
         del filenames[filename]
 
+        # Modules imported the removed module no longer resolve it.
+        # The removed descriptor keeps its reverse dependencies, so
+        # that event handlers can find modules affected by removal.
+        dependents = descriptor.reverse_dependencies
+        for desc in dependents:
+            self.link(desc)
+        for desc in dependents:
+            descriptor.add_reverse_dependency(desc)
+
     @require(descriptor=ModuleDescriptor)
     def add(self, descriptor):
         """Add *descriptor*, but doesn't update dependencies"""
@@ -104,9 +290,55 @@ class Monitor(object):
         descriptors[descriptor.name] = descriptor
         filenames[filename] = descriptor
 
+    @require(descriptor=ModuleDescriptor)
+    def link(self, descriptor):
+        """Update dependencies of *descriptor*"""
+        stats = self.stats
+        if stats is not None:
+            start = stats.clock()
+        descriptor.update_dependencies(self.descriptors)
+        self.__imports.update(descriptor)
+        if stats is not None:
+            stats.observe('link', stats.clock() - start)
+
+    def module_search_path(self, filepath):
+        """Return the module search path for *filepath*"""
+        for root, path in self.search_paths:
+            if filepath == root or filepath.startswith(join(root, '')):
+                return path
+        return self.search_path
+
+    def scan(self):
+        """
+        Return module files (filepath without extention and typebits
+        pairs) in directories modified since the last scan.
+        """
+        module_files = list(python_module_files(self.__index.scan()))
+        if self.stats is not None:
+            self.stats.incr('stats', len(self.__index))
+        return module_files
+
     def refresh(self):
         assert isinstance(self.paths, (tuple, list))
         assert isinstance(self.__descriptors, dict)
+
+        # ``monitor()`` updates all entries and
+        # removes deleted entries.
+        for modified in self.monitor():
+            yield modified
+
+        # For now, only need to check new entries.
+        # Only directories modified since the last refresh are listed.
+        for created in self.discover(self.scan()):
+            yield created
+
+    def discover(self, module_files):
+        """
+        Add new modules in *module_files* (generates filepath without
+        extention and typebits), and yield ``MODULE_CREATED`` events.
+        Modules already monitored are ignored.
+        """
+        assert isinstance(self.__descriptors, dict)
         assert isinstance(self.__filenames, dict)
         assert isinstance(self.__failures, set)
 
@@ -115,53 +347,112 @@ class Monitor(object):
         descriptors = self.__descriptors
         filenames = self.__filenames
         failures = self.__failures
-
-        # ``monitor()`` updates all entries and
-        # removes deleted entries.
-        for modified in self.monitor():
-            yield modified
-
-        # For now, only need to check new entries.
-        resolver = ModuleNameResolver(self.search_path)
+        stats = self.stats
+        if stats is not None:
+            started = stats.clock()
+
+        module_files = [(filename, typebits)
+            for filename, typebits in module_files
+            if filename not in filenames and filename not in failures]
+        contexts = {}
+        if self.jobs != 1:
+            # Compile and analyse new modules in parallel
+            contexts = scan_module_files(module_files, self.jobs)
+
+        # Directories of new modules may have become packages
+        resolvers = self.__resolvers
+        resolvers.invalidate(set(dirname(filename)
+            for filename, typebits in module_files))
         newcomers = []
-        for filename, typebits in collect_python_module_file(self.paths):
-            if filename in filenames or filename in failures:
-                continue
+        for filename, typebits in module_files:
+            if stats is not None:
+                start = stats.clock()
+            search_path = self.module_search_path(filename)
             try:
                 mc = read_module_code(filename, typebits=typebits,
-                        search_path=self.search_path,
-                        resolver=resolver,
+                        search_path=search_path,
+                        resolver=resolvers.resolver(search_path),
                         allow_compilation_failure=True,
-                        allow_standalone=True)
+                        allow_standalone=True,
+                        context=contexts.get(filename))
+                if stats is not None:
+                    stats.observe('compile', stats.clock() - start)
             except ImportError:
                 LOGGER.debug("Couldn't import file", exc_info=True)
                 failures.add(filename)
                 continue
-            else:
-                desc = ModuleDescriptor(mc)
-                self.add(desc)
-                # modifieds += new entries
-                newcomers.append(desc)
-                LOGGER.debug("Added: %s" % desc.describe())
+            existing = descriptors.get(mc.name)
+            if existing is not None:
+                # e.g. the same package in different roots
+                LOGGER.warn("Module '%s' at %s is not monitored, "
+                    "its name conflicts with %s" %
+                    (mc.name, mc.filename, existing.filename))
+                failures.add(filename)
+                continue
+
+            desc = ModuleDescriptor(mc, self.fingerprint)
+            self.add(desc)
+            # modifieds += new entries
+            newcomers.append(desc)
+            LOGGER.debug("Added: %s" % desc.describe())
 
         if newcomers:
             # Since there are some entries already refer new entry,
-            # we need to update dependencies of all entries
-            for desc in descriptors.itervalues():
-                desc.update_dependencies(descriptors)
+            # we need to update dependencies of entries which
+            # looked up the name of new entry but not found.
+            imports = self.__imports
+            affected = set()
+            for desc in newcomers:
+                affected.update(imports.waiting(desc.name))
+            for desc in newcomers:
+                affected.discard(desc)
+                self.link(desc)
+            for desc in affected:
+                self.link(desc)
+            if stats is not None:
+                stats.observe('discover', stats.clock() - started)
 
             # Notify caller what entries are appended
             for desc in newcomers:
+                if self.tiers is not None and self.__populated:
+                    self.tiers.promote(desc)
                 yield Event(Event.MODULE_CREATED, desc)
 
     def monitor(self):
-        descriptors = self.descriptors
+        if self.tiers is None:
+            return self.check(self.descriptors.itervalues())
+        else:
+            return self.check(self.tiers.select(self.descriptors))
+
+    def check(self, targets, module_files=None):
+        """
+        Check modifications of descriptors in *targets*, and
+        yield ``MODULE_MODIFIED`` and ``MODULE_REMOVED`` events.
+
+        If some modules were removed, new modules in *module_files*
+        (filepath without extention and typebits pairs, or modules
+        in modified directories if ``None``) are examined whether
+        they are removed modules moved, and ``MODULE_MOVED`` and
+        ``MODULE_CREATED`` events are also yielded.
+        """
+        stats = self.stats
         removals = []
 
-        for desc in descriptors.itervalues():
+        for desc in targets:
+            if stats is not None:
+                stats.incr('stats')
             try:
                 if desc.modified():
-                    desc.reload(descriptors)
+                    if stats is None:
+                        reloaded = desc.reload(None)
+                    else:
+                        start = stats.clock()
+                        reloaded = desc.reload(None)
+                        stats.observe('reload', stats.clock() - start)
+                    if reloaded:
+                        self.link(desc)
+                    if self.tiers is not None:
+                        self.tiers.promote(desc)
                     yield Event(Event.MODULE_MODIFIED, desc)
             except os.error, e:
                 if e.errno == ENOENT:
@@ -170,6 +461,15 @@ class Monitor(object):
                 else:
                     raise
 
+        if removals:
+            # Removed modules may be moved to new files
+            if module_files is None:
+                module_files = self.scan()
+            module_files = list(module_files)
+            for event in self.relocate(removals, module_files):
+                removals.remove(event.descriptor)
+                yield event
+
         # Remove removal entries
         for desc in removals:
             try:
@@ -181,47 +481,263 @@ class Monitor(object):
                     "No monitoring descriptor '%s' for removal" % desc.name,
                     exc_info=True)
 
-    @require(interval=(int, float), refresh_factor=int)
-    def start(self, interval=1.0, refresh_factor=5):
-        if refresh_factor < 1:
-            raise RuntimeError("refresh_factor must be greater or eqaul to 1")
-        if interval <= 0:
-            raise RuntimeError("interval must not be negative or 0")
+        if module_files:
+            for event in self.discover(module_files):
+                yield event
 
+    def relocate(self, removals, module_files):
+        """
+        Find files where descriptors in *removals* were moved from
+        *module_files*, move descriptors, and yield ``MODULE_MOVED``
+        events.
+        """
+        filenames = self.__filenames
+        removals = list(removals)
+        for filename, typebits in module_files:
+            if not removals:
+                break
+            if filename in filenames:
+                continue
+            filepath = module_source_path(filename, typebits)
+            for desc in removals:
+                if desc.moved_to(filepath):
+                    removals.remove(desc)
+                    yield self.move(desc, filepath)
+                    break
+
+    @require(descriptor=ModuleDescriptor, filepath=basestring)
+    def move(self, descriptor, filepath):
+        """
+        Move *descriptor* to the module file *filepath* without
+        reloading it, update dependencies, and return
+        ``MODULE_MOVED`` event.
+        """
+        resolvers = self.__resolvers
+        resolvers.invalidate([dirname(filepath)])
+        try:
+            name, package_name = resolvers.resolver(
+                self.module_search_path(filepath)).resolve(filepath)
+        except ImportError:
+            name = filepath_to_identifier(filepath)
+            package_name = None
+        old_name, old_filename = descriptor.name, descriptor.filename
+        LOGGER.debug("Moved: %s -> %s" % (old_name, name))
+
+        # Descriptors are hashed by name, so detach descriptor
+        # from all containers before renaming.
+        dependents = descriptor.reverse_dependencies
+        for desc in dependents:
+            desc.clear_dependencies()
+        descriptor.clear_dependencies()
+        self.__imports.discard(descriptor)
+        if self.tiers is not None:
+            self.tiers.discard(descriptor)
+        del self.__descriptors[old_name]
+        del self.__filenames[splitext(old_filename)[0]]
+
+        descriptor.move(name, package_name, filepath)
+        self.add(descriptor)
+
+        # Relink the moved module, modules imported the old name,
+        # and modules waiting on the new name.
+        affected = set(dependents)
+        affected.update(self.__imports.waiting(name))
+        self.link(descriptor)
+        for desc in affected:
+            if desc is not descriptor:
+                self.link(desc)
+        if self.tiers is not None:
+            self.tiers.promote(descriptor)
+        return Event(Event.MODULE_MOVED, descriptor,
+            old_name, old_filename, dependents)
+
+    def update(self, filepaths):
+        """
+        Check only files in *filepaths* (e.g. reported by
+        a watcher backend), and yield events.
+        """
         descriptors = self.descriptors
 
+        targets = []
+        newcomers = {}
+        for filepath in filepaths:
+            filepath = normalize_path(filepath)
+            filename, _, typebits = module_file_typebits(filepath)
+            if not typebits or self.path_filter.excluded(filepath):
+                continue
+
+            desc = self.__filenames.get(filename)
+            if desc is None:
+                if filename not in newcomers:
+                    newcomers[filename] = python_module_typebits(filename)
+            elif desc not in targets:
+                targets.append(desc)
+
+        newcomers = [item for item in newcomers.iteritems() if item[1] > 0]
+        for event in self.check(targets, newcomers):
+            yield event
+
+        assert descriptors is self.__descriptors
+
+    @require(interval=(int, float), refresh_factor=int,
+             watcher=(Watcher, None), coalesce=(int, float, None),
+             scheduler=(Scheduler, None))
+    def start(self, interval=1.0, refresh_factor=5, watcher=None,
+            coalesce=None, scheduler=None):
+        """
+        Start monitoring, and generate events. *interval* is
+        a maximum seconds to wait for modifications at each tick.
+        Newly created modules are discovered every *refresh_factor*
+        ticks. *watcher* is a ``modipyd.watcher.Watcher`` backend
+        (default is ``PollingWatcher``).
+
+        If *coalesce* seconds is specified, events are gathered until
+        no modification is detected in *coalesce* seconds, and
+        generated as a ``ChangeSet`` instance.
+
+        If *scheduler* (``modipyd.scheduler.Scheduler`` instance)
+        is specified, *interval* and *refresh_factor* are ignored,
+        and the scheduler decides intervals between ticks.
+
+        Events of each tick are collected with ``lock`` held,
+        so that other threads can read the dependency graph safely.
+        """
+        if scheduler is None:
+            scheduler = FixedScheduler(interval, refresh_factor)
+        if coalesce is not None and coalesce <= 0:
+            raise RuntimeError("coalesce must not be negative or 0")
+
+        self.lock.acquire()
+        try:
+            descriptors = self.descriptors
+        finally:
+            self.lock.release()
+
         if LOGGER.isEnabledFor(logging.INFO):
             desc = "\n".join([
                 desc.describe(indent=4)
                 for desc in descriptors.itervalues()])
             LOGGER.info("Monitoring:\n%s" % desc)
 
+        watcher = self.open_watcher(watcher)
+
         # Prior to Python 2.5, the ``yield`` statement is not
         # allowed in the ``try`` clause of a ``try ... finally``
         # construct.
         try:
             self.monitoring = True
 
-            times = 0
             while descriptors and self.monitoring:
 
-                time.sleep(interval)
-                times += 1
-
-                if times % refresh_factor == 0:
-                    monitor = self.refresh()
-                else:
-                    monitor = self.monitor()
+                changes = watcher.wait(scheduler.next_interval())
+                monitor = self.locked_tick(watcher, changes,
+                    scheduler.refresh_due())
+                if coalesce:
+                    monitor = self.coalesce(monitor, watcher, coalesce)
 
+                count = 0
                 for modified in monitor:
                     if not self.monitoring:
                         break
+                    count += 1
                     yield modified
+                scheduler.notify(count)
             else:
                 LOGGER.info("Terminating monitor %s" % str(self))
         except:
             self.monitoring = False
+            self.terminate(watcher)
             raise
+        self.terminate(watcher)
+
+    def terminate(self, watcher):
+        watcher.close()
+        if self.snapshot:
+            self.save_snapshot()
+
+    def tick(self, watcher, changes, refresh=False):
+        """
+        Return generator yields events for *changes* reported by
+        *watcher*. If *refresh* is ``True``, or *watcher* lost track
+        of changes, new modules are also discovered.
+        """
+        if changes is not None:
+            return self.update(changes)
+        elif refresh or watcher.notifies:
+            return self.refresh()
+        else:
+            return self.monitor()
+
+    def locked_tick(self, watcher, changes, refresh=False):
+        """
+        Same as ``tick()``, but return a list of events
+        collected with ``lock`` held.
+        """
+        stats = self.stats
+        self.lock.acquire()
+        try:
+            if stats is None:
+                return list(self.tick(watcher, changes, refresh))
+
+            start = stats.clock()
+            events = list(self.tick(watcher, changes, refresh))
+            stats.observe('tick', stats.clock() - start)
+            stats.incr('ticks')
+            for event in events:
+                stats.incr(EVENT_COUNTERS[event.type])
+            return events
+        finally:
+            self.lock.release()
+
+    # Maximum number of windows to gather events in a ``ChangeSet``,
+    # so that continuous modifications don't block events forever.
+    COALESCE_LIMIT = 20
+
+    def coalesce(self, events, watcher, window):
+        """
+        Gather *events*, and events detected until *watcher* reports
+        no modification in *window* seconds, into a ``ChangeSet``.
+        """
+        changeset = ChangeSet()
+        count = 0
+        for event in events:
+            changeset.add(event)
+            count += 1
+
+        times = 0
+        while count and self.monitoring and times < self.COALESCE_LIMIT:
+            count = 0
+            changes = watcher.wait(window)
+            for event in self.locked_tick(watcher, changes, True):
+                changeset.add(event)
+                count += 1
+            times += 1
+
+        if changeset:
+            LOGGER.debug("Coalesced %d events" % len(changeset))
+            yield changeset
+
+    def open_watcher(self, watcher=None):
+        """
+        Open *watcher* backend for monitoring paths. If the backend
+        could not be opened, falls back to ``PollingWatcher``.
+        """
+        if watcher is None:
+            watcher = PollingWatcher()
+
+        try:
+            watcher.open(self.paths, self.path_filter)
+        except (OSError, IOError):
+            if isinstance(watcher, PollingWatcher):
+                raise
+            LOGGER.warn(
+                "Couldn't open watcher '%s', falls back to polling" %
+                watcher.name, exc_info=True)
+            watcher = PollingWatcher()
+            watcher.open(self.paths, self.path_filter)
+        else:
+            LOGGER.info("Watcher: %s" % watcher.name)
+        return watcher
 
     def stop(self):
         self.monitoring = False
@@ -34,10 +34,12 @@ class ModuleNameResolver(object):
     from a its source filepath.
     """
 
-    def __init__(self, path=None):
+    def __init__(self, path=None, package_cache=None):
         """
         The ``path`` argument is module search path,
         if *path* is omitted or ``None``, ``sys.path`` is used.
+        *package_cache* is a dictionary shared with other resolvers
+        (See ``ResolverPool``).
         """
         super(ModuleNameResolver, self).__init__()
 
@@ -47,10 +49,23 @@ class ModuleNameResolver(object):
         self.path = [normalize_path(d) for d in syspaths if os.path.isdir(d)]
 
         # caches
-        self._cache_package     = {}
+        if package_cache is None:
+            package_cache = {}
+        # directory -> package or not, independent of search path
+        self._cache_package     = package_cache
         self._cache_find_module = {}
         self._cache_resolve     = {}
 
+    def forget_failures(self):
+        """
+        Forget modules and files which couldn't be found or resolved,
+        because they may be created since then.
+        """
+        for cache in (self._cache_find_module, self._cache_resolve):
+            for key, value in cache.items():
+                if value == (None, None):
+                    del cache[key]
+
     def _resolve_package(self, directory):
         try:
             return self._cache_package[directory]
@@ -207,6 +222,54 @@ class ModuleNameResolver(object):
             raise ImportError("No module name found: %s" % filepath)
 
 
+class ResolverPool(object):
+    """
+    ``ResolverPool`` provides a ``ModuleNameResolver`` for each
+    module search path. Resolvers share caches which don't depend
+    on search path, and resolvers for the same search path are
+    reused.
+
+    >>> pool = ResolverPool()
+    >>> pool.resolver(['.']) is pool.resolver(['.'])
+    True
+    >>> pool.resolver(['.']) is pool.resolver(None)
+    False
+    """
+
+    def __init__(self):
+        super(ResolverPool, self).__init__()
+        self.__package_cache = {}
+        # tuple of search path (or ``None``) -> resolver
+        self.__resolvers = {}
+
+    def __len__(self):
+        return len(self.__resolvers)
+
+    def invalidate(self, directories):
+        """
+        Forget whether each of *directories* is a package or not,
+        and failures of all resolvers, so that modules created since
+        the last resolution are resolved.
+        """
+        for directory in directories:
+            self.__package_cache.pop(directory, None)
+        for resolver in self.__resolvers.itervalues():
+            resolver.forget_failures()
+
+    def resolver(self, path=None):
+        """Return ``ModuleNameResolver`` for search path *path*"""
+        if path is not None:
+            key = tuple(utils.sequence(path))
+        else:
+            key = None
+        try:
+            return self.__resolvers[key]
+        except KeyError:
+            resolver = ModuleNameResolver(path, self.__package_cache)
+            self.__resolvers[key] = resolver
+            return resolver
+
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,204 @@
+"""
+Monitor Scheduling Policies
+================================================
+
+This module provides the interface of scheduling policies which
+decide how long ``modipyd.monitor.Monitor`` waits for modifications
+at each tick, and when it discovers newly created modules.
+
+``FixedScheduler``
+    Waits fixed interval, and discovers new modules every
+    *refresh_factor* ticks (default).
+
+``AdaptiveScheduler``
+    Polls quickly right after modifications are detected, and backs
+    off exponentially toward the maximum interval while idle.
+    New modules are discovered at its own independent cadence.
+
+And ``TieredPolling`` which decides modules to be checked at
+each tick.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import time
+from modipyd import LOGGER
+from modipyd.utils import OrderedSet
+from modipyd.utils.decorators import require
+
+
+class Scheduler(object):
+    """
+    The ``Scheduler`` decides intervals between ticks
+    of ``Monitor``.
+    """
+
+    def __init__(self):
+        super(Scheduler, self).__init__()
+
+    def next_interval(self):
+        """Return maximum seconds to wait for the next tick"""
+        raise NotImplementedError
+
+    def refresh_due(self):
+        """
+        Called once per tick, return ``True`` if newly created
+        modules should be discovered at the tick.
+        """
+        return False
+
+    def notify(self, count):
+        """Called after each tick with the number of events detected"""
+        pass
+
+
+class FixedScheduler(Scheduler):
+    """Fixed interval scheduler"""
+
+    @require(interval=(int, float), refresh_factor=int)
+    def __init__(self, interval=1.0, refresh_factor=5):
+        super(FixedScheduler, self).__init__()
+        if refresh_factor < 1:
+            raise RuntimeError("refresh_factor must be greater or eqaul to 1")
+        if interval <= 0:
+            raise RuntimeError("interval must not be negative or 0")
+        self.interval = interval
+        self.refresh_factor = refresh_factor
+        self.times = 0
+
+    def next_interval(self):
+        return self.interval
+
+    def refresh_due(self):
+        self.times += 1
+        return self.times % self.refresh_factor == 0
+
+
+class AdaptiveScheduler(Scheduler):
+    """
+    Adaptive interval scheduler.
+
+    After modifications are detected, the scheduler keeps *minimum*
+    interval for *burst* ticks, then the interval is multiplied by
+    *backoff* at each idle tick up to *maximum*. New modules are
+    discovered every *refresh_interval* seconds regardless of
+    the polling interval.
+    """
+
+    @require(minimum=(int, float), maximum=(int, float),
+             backoff=(int, float), burst=int,
+             refresh_interval=(int, float))
+    def __init__(self, minimum=0.2, maximum=5.0, backoff=2.0, burst=5,
+            refresh_interval=5.0):
+        super(AdaptiveScheduler, self).__init__()
+        if minimum <= 0:
+            raise RuntimeError("minimum must not be negative or 0")
+        if maximum < minimum:
+            raise RuntimeError("maximum must be greater or equal to minimum")
+        if backoff < 1:
+            raise RuntimeError("backoff must be greater or equal to 1")
+        if refresh_interval <= 0:
+            raise RuntimeError("refresh_interval must not be negative or 0")
+
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.burst = burst
+        self.refresh_interval = refresh_interval
+
+        self.interval = minimum
+        self.idle = 0
+        self.refreshed = self.time()
+
+    def time(self):
+        return time.time()
+
+    def next_interval(self):
+        return self.interval
+
+    def refresh_due(self):
+        now = self.time()
+        if now - self.refreshed >= self.refresh_interval:
+            self.refreshed = now
+            return True
+        return False
+
+    def notify(self, count):
+        if count:
+            # Burst mode
+            self.idle = 0
+            self.interval = self.minimum
+        else:
+            self.idle += 1
+            if self.idle > self.burst and self.interval < self.maximum:
+                self.interval = min(self.maximum,
+                                    self.interval * self.backoff)
+                LOGGER.debug("Backing off interval: %.2f" % self.interval)
+
+
+class TieredPolling(object):
+    """
+    Tiered hot/cold polling policy.
+
+    Recently modified (or created) modules are *hot*, and checked
+    every tick. The other *cold* modules are checked on a slower
+    rotation: each tick checks ``1 / rotation`` of all modules, so
+    every module is checked at least once every ``2 * rotation``
+    ticks (a module demoted from hot tier in the middle of the
+    rotation waits for the next rotation). At most *hot_size*
+    modules are hot, the least recently modified module is demoted
+    first.
+    """
+
+    @require(hot_size=int, rotation=int)
+    def __init__(self, hot_size=64, rotation=10):
+        super(TieredPolling, self).__init__()
+        if hot_size < 0:
+            raise RuntimeError("hot_size must not be negative")
+        if rotation < 1:
+            raise RuntimeError("rotation must be greater or equal to 1")
+
+        self.hot_size = hot_size
+        self.rotation = rotation
+        # names of hot modules (least recently modified first)
+        self.hot = OrderedSet()
+        # names of modules in the current rotation
+        self.__cold = []
+        self.__position = 0
+        self.__chunk = 0
+
+    def promote(self, descriptor):
+        """Make *descriptor* hot"""
+        name = descriptor.name
+        hot = self.hot
+        if name in hot:
+            hot.remove(name)
+        hot.add(name)
+        while len(hot) > self.hot_size:
+            hot.remove(hot[0])
+
+    def discard(self, descriptor):
+        if descriptor.name in self.hot:
+            self.hot.remove(descriptor.name)
+
+    def select(self, descriptors):
+        """
+        Return descriptors to be checked at this tick. *descriptors*
+        is a dictionary maps name and module descriptors.
+        """
+        if self.__position >= len(self.__cold):
+            # Start next rotation
+            self.__cold = descriptors.keys()
+            self.__position = 0
+            self.__chunk = -(-len(self.__cold) // self.rotation)
+
+        hot = self.hot
+        selected = [descriptors[name] for name in hot if name in descriptors]
+
+        i = self.__position
+        self.__position += self.__chunk
+        for name in self.__cold[i:self.__position]:
+            if name not in hot and name in descriptors:
+                selected.append(descriptors[name])
+        return selected
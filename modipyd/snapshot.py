@@ -0,0 +1,179 @@
+"""
+Warm-start snapshot of monitor state
+================================================
+
+This module provides functions to save the state of
+``modipyd.monitor.Monitor`` (module descriptors, the results of
+bytecode analysis and the dependency graph) to a file, and to
+restore it at the next startup. Only modules modified since
+the snapshot was saved need to be compiled and analysed again.
+
+A snapshot is validated on loading: modules whose modification time
+or size are changed, and modules not in the monitored paths or
+excluded by the path filter are not restored. The snapshot is
+discarded entirely if it was saved by another version of Python,
+with other bytecode processors or scanner (``modipyd.SCANNER``), or
+the package structure has changed.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import os
+import imp
+from os.path import dirname
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import modipyd
+from modipyd import LOGGER, utils
+from modipyd.module import ModuleCode
+from modipyd.resolve import ModuleNameResolver
+from modipyd.descriptor import ModuleDescriptor
+
+
+# Incremented when the snapshot format is changed
+SNAPSHOT_VERSION = 2
+
+
+def _header(monitor):
+    return {
+        'version': SNAPSHOT_VERSION,
+        'magic': imp.get_magic(),
+        'processors': tuple(modipyd.BYTECODE_PROCESSORS),
+        'scanner': modipyd.SCANNER,
+        'search_path': tuple(ModuleNameResolver(monitor.search_path).path),
+        'search_paths': tuple((root, tuple(ModuleNameResolver(path).path))
+                              for root, path in monitor.search_paths),
+    }
+
+def save(monitor, filepath):
+    """
+    Save the state of *monitor* to *filepath*. The snapshot
+    is written atomically.
+    """
+    modules = []
+    packages = {}
+    for desc in monitor.descriptors.itervalues():
+        try:
+            st = os.stat(desc.filename)
+        except os.error:
+            continue
+        if st.st_mtime != desc.mtime:
+            # modified after the last check
+            continue
+
+        modules.append((
+            desc.filename, desc.name, desc.package_name,
+            st.st_mtime, st.st_size, desc.context))
+
+        directory = dirname(desc.filename)
+        if directory not in packages:
+            packages[directory] = utils.python_package(directory)
+
+    snapshot = _header(monitor)
+    snapshot['modules'] = modules
+    snapshot['packages'] = packages
+
+    tmppath = '%s.%d.tmp' % (filepath, os.getpid())
+    fp = open(tmppath, 'wb')
+    try:
+        pickle.dump(snapshot, fp, pickle.HIGHEST_PROTOCOL)
+    finally:
+        fp.close()
+    os.rename(tmppath, filepath)
+    LOGGER.debug("Saved snapshot of %d modules to %s" %
+        (len(modules), filepath))
+
+def read(filepath):
+    """
+    Read a snapshot from *filepath*, and return it.
+    Return ``None`` if the snapshot is broken.
+    """
+    try:
+        fp = open(filepath, 'rb')
+    except IOError:
+        return None
+    try:
+        try:
+            return pickle.load(fp)
+        except (StandardError, pickle.UnpicklingError):
+            LOGGER.warn("Couldn't read snapshot %s" % filepath,
+                exc_info=True)
+            return None
+    finally:
+        fp.close()
+
+def monitored(monitor, filepath):
+    """
+    Return ``True`` if the module file *filepath* is in paths of
+    *monitor* and neither the file nor its directories are excluded
+    by ``monitor.path_filter``.
+    """
+    excluded = monitor.path_filter.excluded
+    for path in monitor.paths:
+        if filepath == path:
+            return not excluded(filepath)
+        prefix = path.rstrip(os.sep) + os.sep
+        if not filepath.startswith(prefix):
+            continue
+
+        dirpath = path
+        for name in filepath[len(prefix):].split(os.sep)[:-1]:
+            dirpath = os.path.join(dirpath, name)
+            if excluded(dirpath, True):
+                return False
+        return not excluded(filepath)
+    return False
+
+def load(monitor, filepath):
+    """
+    Restore module descriptors and their dependencies saved in
+    *filepath* into *monitor*, and return restored descriptors.
+    Modules modified since the snapshot was saved, and modules
+    which are not monitored (See ``monitored()``) are not restored.
+    """
+    snapshot = read(filepath)
+    if snapshot is None:
+        return []
+
+    header = _header(monitor)
+    for key, value in header.iteritems():
+        if snapshot.get(key) != value:
+            LOGGER.info("Snapshot %s is obsolete (%s)" % (filepath, key))
+            return []
+
+    for directory, package in snapshot['packages'].iteritems():
+        if utils.python_package(directory) != package:
+            LOGGER.info("Snapshot %s is obsolete (package %s)" %
+                (filepath, directory))
+            return []
+
+    restored = []
+    for (filename, name, package_name, mtime, size,
+            context) in snapshot['modules']:
+        if not monitored(monitor, filename):
+            continue
+        try:
+            st = os.stat(filename)
+        except os.error:
+            continue
+        if st.st_mtime != mtime or st.st_size != size:
+            continue
+
+        code = ModuleCode(name, package_name, filename, None)
+        code.context.update(context)
+        desc = ModuleDescriptor(code, monitor.fingerprint)
+        monitor.add(desc)
+        restored.append(desc)
+
+    # Rebuild the dependency graph from the restored contexts
+    for desc in restored:
+        monitor.link(desc)
+
+    LOGGER.info("Restored %d modules from snapshot %s" %
+        (len(restored), filepath))
+    return restored
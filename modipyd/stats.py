@@ -0,0 +1,166 @@
+"""
+Monitor Instrumentation
+================================================
+
+This module provides ``Stats`` which records counters and
+histograms of ``modipyd.monitor.Monitor`` activities. Instrumentation
+is disabled unless a ``Stats`` instance is given to ``Monitor``,
+plugins and external tools can read it via ``monitor.stats``.
+
+Counters:
+
+``ticks``
+    The number of ticks.
+``stats``
+    The number of files and directories ``stat``\ ed.
+``events.modified``, ``events.created``, ...
+    The number of events emitted for each event type.
+``cache.hits``, ``cache.misses``, ...
+    Scan cache counters (See ``modipyd.cache``).
+
+Histograms (in seconds):
+
+``tick``
+    Duration of each tick (excluding waiting for modifications).
+``compile``
+    Time to compile and scan a new module.
+``reload``
+    Time to compile and scan a modified module.
+``link``
+    Time to update dependencies of a module.
+``discover``
+    Time to discover new modules in a refresh.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import sys
+import time
+
+try:
+    import json
+except ImportError:   # Python <2.6
+    try:
+        import simplejson as json
+    except ImportError:
+        json = None
+
+from modipyd import LOGGER
+
+
+class Histogram(object):
+    """
+    Histogram of durations (seconds). Values are counted in buckets
+    whose upper bounds are ``BUCKETS`` (the last bucket is unbounded).
+    """
+
+    BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+               0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+    def __init__(self):
+        super(Histogram, self).__init__()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(self.BUCKETS) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        bounds = self.BUCKETS
+        i = 0
+        while i < len(bounds) and value > bounds[i]:
+            i += 1
+        self.buckets[i] += 1
+
+    @property
+    def mean(self):
+        if self.count:
+            return self.total / self.count
+        return None
+
+    def as_dict(self):
+        bounds = [str(b) for b in self.BUCKETS] + ['inf']
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            'buckets': dict(zip(bounds, self.buckets)),
+        }
+
+
+class Stats(object):
+    """Counters and histograms of monitor activities"""
+
+    def __init__(self):
+        super(Stats, self).__init__()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def incr(self, name, count=1):
+        """Increment counter *name* by *count*"""
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def observe(self, name, value):
+        """Add *value* to histogram *name*"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(value)
+
+    def clock(self):
+        return time.time()
+
+    def as_dict(self):
+        return {
+            'uptime': time.time() - self.started,
+            'counters': dict(self.counters),
+            'histograms': dict((name, h.as_dict())
+                for name, h in self.histograms.items()),
+        }
+
+    def dumps(self):
+        """Return JSON representation"""
+        if json is None:
+            raise ImportError("json or simplejson module is required")
+        return json.dumps(self.as_dict(), sort_keys=True, indent=2)
+
+    def dump(self, filepath=None):
+        """Write JSON representation to *filepath* (or stderr)"""
+        data = self.dumps()
+        if filepath is None:
+            sys.stderr.write(data + "\n")
+            return
+        fp = open(filepath, 'w')
+        try:
+            fp.write(data)
+        finally:
+            fp.close()
+
+
+def install_signal_handler(stats, filepath=None, signum=None):
+    """
+    Dump *stats* to *filepath* (or stderr) when the process receives
+    signal *signum* (``SIGUSR1`` by default). This must be called
+    from the main thread.
+    """
+    import signal
+    if signum is None:
+        signum = signal.SIGUSR1
+
+    def handler(signum, frame):
+        try:
+            stats.dump(filepath)
+        except (IOError, ImportError):
+            LOGGER.warn("Couldn't dump stats", exc_info=True)
+    signal.signal(signum, handler)
@@ -45,9 +45,11 @@ def make_option_parser():
 def run():
     parser = make_option_parser()
     options, args = parser.parse_args()
+    generic.check_options(parser, options)
 
     try:
-        make_application(options, args or '.').run()
+        generic.start(make_application(options,
+            generic.default_paths(options, args)), options)
     except KeyboardInterrupt:
         LOGGER.debug('Keyboard Interrupt', exc_info=True)
 
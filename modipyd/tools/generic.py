@@ -45,8 +45,17 @@ import sys
 import logging
 from optparse import OptionParser, OptionGroup
 
-from modipyd import LOGGER, __version__
+import modipyd
+from modipyd import LOGGER, __version__, utils
 from modipyd.application import Application
+from modipyd.watcher import WATCHERS, ShardedWatcher
+from modipyd.background import OVERFLOW_POLICIES
+from modipyd.stats import Stats
+from modipyd.module import SCANNERS
+from modipyd.cache import ScanCache
+from modipyd.application.recorder import EventRecorder
+from modipyd.scheduler import FixedScheduler, AdaptiveScheduler, \
+                              TieredPolling
 
 
 # ----------------------------------------------------------------
@@ -80,10 +89,57 @@ def make_application(options, filepath):
     # in ``sys.path`` module search path variable for convenience.
     sys.path.insert(0, os.getcwd())
 
+    # Roots with their own module search path
+    search_paths = {}
+    for root in options.roots:
+        path = ''
+        if '=' in root:
+            root, path = root.split('=', 1)
+        # modules in DIR are resolved on DIR by default
+        search_paths[root] = [p for p in path.split(os.pathsep) if p] \
+                             or [root]
+    if search_paths:
+        filepath = utils.sequence(filepath, copy=list)
+        filepath.extend(r for r in search_paths if r not in filepath)
+
+    if options.scanner:
+        modipyd.SCANNER = options.scanner
+
     # Create Application instance, Install plugins
     application = Application(filepath)
+    application.search_paths = search_paths
+    application.watcher = options.watcher
+    if options.shards:
+        application.watcher = ShardedWatcher.name
+        application.shards = options.shards
+    application.coalesce = options.coalesce
+    application.fingerprint = options.fingerprint
+    application.scheduler = make_scheduler(options)
+    # shard workers poll at the base interval of the scheduler
+    application.interval = options.interval
+    if options.rotation:
+        application.tiers = TieredPolling(rotation=options.rotation)
+    application.snapshot = options.snapshot
+    if options.scan_cache:
+        application.scan_cache = ScanCache(options.scan_cache,
+            options.scan_cache_size * 1024 * 1024)
+    application.excludes = options.excludes
+    application.includes = options.includes
+    if options.gitignore:
+        application.ignore_files = ['.gitignore']
+    application.git = options.git
+    application.jobs = options.jobs
+    application.threaded = options.threaded
+    application.queue_size = options.queue_size
+    application.overflow = options.overflow
+    if options.stats:
+        application.stats = Stats()
+        if options.stats != '-':
+            application.stats_file = options.stats
     for plugin in options.plugins:
         application.install_plugin(plugin)
+    if options.record:
+        application.install_plugin(EventRecorder(options.record))
 
     # Predefine variables
     variables = {}
@@ -107,6 +163,23 @@ def make_application(options, filepath):
 
     return application
 
+def check_options(parser, options):
+    """Exit with an error message by *parser* if *options* are invalid"""
+    if options.interval <= 0:
+        parser.error("--interval must not be negative or 0")
+    if options.max_interval is not None and \
+            options.max_interval <= options.interval:
+        parser.error("--max-interval must be greater than --interval")
+
+def make_scheduler(options):
+    if options.interval <= 0:
+        raise RuntimeError("interval must not be negative or 0")
+    if options.max_interval is None:
+        return FixedScheduler(options.interval)
+    if options.max_interval <= options.interval:
+        raise RuntimeError("max interval must be greater than interval")
+    return AdaptiveScheduler(options.interval, options.max_interval)
+
 def make_option_parser():
     parser = OptionParser(
         usage="usage: %prog [options] [files or directories]",
@@ -132,6 +205,110 @@ def make_option_parser():
              "with specified value string (or empty string if omitted).")
     parser.add_option_group(group)
 
+    group = OptionGroup(parser, 'Monitor')
+    group.add_option("--watcher", default='auto',
+        action="store", dest="watcher", metavar='NAME',
+        type="choice", choices=['auto'] + sorted(WATCHERS.keys()),
+        help="watcher backend used to detect modifications: "
+             "%s (default: auto, the best backend available on "
+             "this platform)" % ', '.join(sorted(WATCHERS.keys())))
+    group.add_option("--exclude", default=[],
+        action="append", dest="excludes", metavar='PATTERN',
+        help="don't monitor files and directories matching PATTERN "
+             "(.gitignore syntax, e.g. 'build/', 'docs/**/*.py'). "
+             "Excluded directories are never visited")
+    group.add_option("--include", default=[],
+        action="append", dest="includes", metavar='PATTERN',
+        help="monitor only files matching PATTERN (.gitignore syntax)")
+    group.add_option("--gitignore", default=False,
+        action="store_true", dest="gitignore",
+        help="don't monitor files and directories ignored by "
+             ".gitignore files in monitoring directories")
+    group.add_option("--git-index", default=False,
+        action="store_true", dest="git",
+        help="enumerate files in git checkouts from .git/index at "
+             "startup, only directories modified since the index was "
+             "written are listed (untracked files in other "
+             "directories are not found)")
+    group.add_option("--root", default=[],
+        action="append", dest="roots", metavar='DIR=PATH',
+        help="monitor DIR, and resolve names of modules in DIR on "
+             "the module search path PATH (separated by '%s', "
+             "default: DIR). This "
+             "option can be given several times to monitor several "
+             "projects with one dependency graph" % os.pathsep)
+    group.add_option("--shards", default=None,
+        action="store", type="int", dest="shards", metavar='N',
+        help="partition monitoring directories across N worker "
+             "processes, each polls its own shard (implies "
+             "--watcher=%s)" % ShardedWatcher.name)
+    group.add_option("--interval", default=1.0,
+        action="store", type="float", dest="interval", metavar='SECONDS',
+        help="polling interval (default: 1.0)")
+    group.add_option("--max-interval", default=None,
+        action="store", type="float", dest="max_interval", metavar='SECONDS',
+        help="enable adaptive polling: the interval backs off "
+             "toward SECONDS while idle, and is reset to --interval "
+             "when modifications are detected")
+    group.add_option("--cold-rotation", default=None,
+        action="store", type="int", dest="rotation", metavar='TICKS',
+        help="enable tiered polling: recently modified modules are "
+             "checked every tick, and other modules are checked "
+             "at least once every 2 * TICKS ticks")
+    group.add_option("--snapshot", default=None,
+        action="store", dest="snapshot", metavar='FILE',
+        help="save the analysed modules and their dependencies to FILE, "
+             "and restore them at the next startup so that only "
+             "modified modules are analysed again")
+    group.add_option("--scanner", default=None,
+        action="store", dest="scanner", metavar='NAME',
+        type="choice", choices=list(SCANNERS),
+        help="front end which extracts imports and classes from "
+             "source files: %s (default: bytecode, or modipyd.SCANNER "
+             "set by startup script). lexical doesn't compile modules"
+             % ', '.join(SCANNERS))
+    group.add_option("--scan-cache", default=None,
+        action="store", dest="scan_cache", metavar='FILE',
+        help="store analysed modules in the sqlite database FILE keyed "
+             "by their content, so that a module whose content was "
+             "analysed before is not compiled again")
+    group.add_option("--scan-cache-size", default=32,
+        action="store", type="int", dest="scan_cache_size", metavar='MB',
+        help="the maximum size of --scan-cache, least recently used "
+             "modules are evicted (default: 32)")
+    group.add_option("-j", "--jobs", default=0,
+        action="store", type="int", dest="jobs", metavar='N',
+        help="analyse modules with N processes at startup "
+             "(default: 0, the number of CPUs)")
+    group.add_option("--threaded", default=False,
+        action="store_true", dest="threaded",
+        help="monitor modifications in a background thread, so that "
+             "running plugins doesn't delay detection")
+    group.add_option("--queue-size", default=100,
+        action="store", type="int", dest="queue_size", metavar='N',
+        help="maximum number of events queued in threaded mode "
+             "(default: 100)")
+    group.add_option("--overflow", default='merge',
+        action="store", dest="overflow", metavar='POLICY',
+        type="choice", choices=list(OVERFLOW_POLICIES),
+        help="policy applied when the event queue is full in threaded "
+             "mode: %s (default: merge, merge queued events into one)" %
+             ', '.join(OVERFLOW_POLICIES))
+    group.add_option("--stats", default=None,
+        action="store", dest="stats", metavar='FILE',
+        help="record monitor statistics (tick duration, compile time, "
+             "events, ...) and dump them as JSON to FILE ('-' for "
+             "stderr) on SIGUSR1 and at exit")
+    group.add_option("--coalesce", default=None,
+        action="store", type="float", dest="coalesce", metavar='SECONDS',
+        help="gather modifications until no modification is detected "
+             "in SECONDS, and notify plugins of them at once")
+    group.add_option("--fingerprint", default=False,
+        action="store_true", dest="fingerprint",
+        help="compare file content when modification time is changed, "
+             "and ignore modifications which don't change content")
+    parser.add_option_group(group)
+
     group = OptionGroup(parser, 'Plugin')
     group.add_option("-x", "--plugin", default=[],
         action="append", dest="plugins", metavar='PLUGIN_NAME',
@@ -139,16 +316,48 @@ def make_option_parser():
              "the plugin must be callable object (e.g. function, class).")
     parser.add_option_group(group)
 
+    group = OptionGroup(parser, 'Recording')
+    group.add_option("--record", default=None,
+        action="store", dest="record", metavar='FILE',
+        help="record events to FILE")
+    group.add_option("--replay", default=None,
+        action="store", dest="replay", metavar='FILE',
+        help="feed events recorded in FILE to plugins instead of "
+             "monitoring modifications")
+    group.add_option("--speed", default=1.0,
+        action="store", type="float", dest="speed", metavar='FACTOR',
+        help="replay events FACTOR times faster than recorded "
+             "(default: 1.0, 0 means as fast as possible)")
+    parser.add_option_group(group)
+
     return parser
 
+def default_paths(options, args):
+    """
+    Return paths to be monitored, current directory if neither
+    paths nor ``--root`` are given.
+    """
+    if args or options.roots:
+        return args
+    return '.'
+
+def start(application, options):
+    """Run *application*, or replay events if ``--replay`` is given"""
+    if options.replay:
+        count = application.replay(options.replay, options.speed)
+        LOGGER.info("Replayed %d events" % count)
+    else:
+        application.run()
+
 def run():
     """Standalone program interface"""
     parser = make_option_parser()
     (options, args) = parser.parse_args()
+    check_options(parser, options)
 
-    application = make_application(options, args or '.')
+    application = make_application(options, default_paths(options, args))
     try:
-        application.run()
+        start(application, options)
     except KeyboardInterrupt:
         LOGGER.debug('Keyboard Interrupt', exc_info=True)
 
@@ -15,6 +15,8 @@ import stat
 from modipyd.utils.ordered_set import *
 from modipyd.utils.core import *
 from modipyd.utils.decorators import require
+from modipyd.utils.matcher import PathFilter
+from modipyd.utils import gitindex
 
 
 def filepath_to_identifier(filepath):
@@ -74,47 +76,165 @@ def compile_python_source(filepath, optimization=False):
 # ----------------------------------------------------------------
 # File browser
 # ----------------------------------------------------------------
-def collect_files(filepath_or_list, ignore_list=None):
+def path_filter(filepath_or_list, ignore_list=None):
+    """
+    Return ``PathFilter`` for *filepath_or_list*. *ignore_list*
+    is a ``PathFilter`` instance or exclude patterns
+    (See ``modipyd.utils.matcher``).
+    """
+    if isinstance(ignore_list, PathFilter):
+        return ignore_list
+    return PathFilter(filepath_or_list, ignore_list or ())
+
+def collect_files(filepath_or_list, ignore_list=None, git=False):
     """
     ``collect_files()`` generates the file names in a directory tree.
     Note: ``collect_files()`` will not visit symbolic links to
-    subdirectories. *ignore_list* argument is ignore filename patterns
-    (using fnmatch).
+    subdirectories. *ignore_list* argument is ignore patterns
+    or a ``PathFilter`` (See ``path_filter()``), excluded
+    directories are not visited. If *git* is ``True``, directories
+    in git work trees are enumerated from the git index
+    (See ``modipyd.utils.gitindex``).
     """
-    import fnmatch
-
-    def ignore(filename):
-        if ignore_list:
-            for pattern in ignore_list:
-                if fnmatch.fnmatch(filename, pattern):
-                    return True
-        return False
+    pf = path_filter(filepath_or_list, ignore_list)
+    if git:
+        walk = lambda top: gitindex.walk(top, pf)
+    else:
+        walk = pf.walk
 
     for filepath in sequence(filepath_or_list):
 
-        if ignore(os.path.basename(filepath)):
-            continue
-
         if not os.path.exists(filepath):
+            if pf.excluded(filepath):
+                continue
             from errno import ENOENT
             raise IOError(ENOENT, "No such file or directory", filepath)
         elif not os.path.isdir(filepath):
-            yield filepath
-        else:
+            if not pf.excluded(filepath):
+                yield filepath
+        elif not pf.excluded(filepath, True):
             # pylint: disable-msg=W0612
-            for dirpath, dirnames, filenames in os.walk(filepath):
-                # For in-place deletion (avoids copying the list),
-                # Don't delete anything earlier in the list than
-                # the current element through.
-                count = len(dirnames)
-                for i, dirname in enumerate(reversed(dirnames)):
-                    if ignore(dirname):
-                        # don't visit ignore directory
-                        del dirnames[count-1-i]
+            for dirpath, dirnames, filenames in walk(filepath):
                 for filename in filenames:
-                    if not ignore(filename):
+                    yield os.path.join(dirpath, filename)
+
+def collect_directories(filepath_or_list, ignore_list=None):
+    """
+    ``collect_directories()`` generates the directory names in
+    a directory tree, including top level directories. File paths in
+    *filepath_or_list* are ignored. *ignore_list* argument is
+    the same as ``collect_files()``.
+    """
+    pf = path_filter(filepath_or_list, ignore_list)
+
+    for filepath in sequence(filepath_or_list):
+        if not os.path.isdir(filepath) or pf.excluded(filepath, True):
+            continue
+        # pylint: disable-msg=W0612
+        for dirpath, dirnames, filenames in pf.walk(filepath):
+            yield dirpath
+
+
+class DirectoryIndex(object):
+    """
+    ``DirectoryIndex`` keeps modification times and children of
+    directories in a directory tree, so that only directories
+    modified since the last scan are listed again.
+
+    >>> index = DirectoryIndex([])
+    >>> list(index.scan())
+    []
+    """
+
+    # Directories modified within this seconds are listed again
+    # at the next scan, because a file may be created in the same
+    # timestamp granularity after listing.
+    RACY_WINDOW = 1.0
+
+    def __init__(self, filepath_or_list, ignore_list=None, git=False):
+        super(DirectoryIndex, self).__init__()
+        self.paths = sequence(filepath_or_list, copy=list)
+        self.ignore_list = ignore_list
+        self.path_filter = path_filter(self.paths, ignore_list)
+        # If ``True``, directories are listed from the git index
+        # at the first scan (See ``modipyd.utils.gitindex``)
+        self.git = git
+        # directory path -> (mtime, subdirectories, filenames)
+        self.__directories = {}
+
+    def __len__(self):
+        return len(self.__directories)
+
+    def __contains__(self, dirpath):
+        return dirpath in self.__directories
+
+    def scan(self):
+        """
+        Generates the file names in directories which are created or
+        modified since the last scan (all files at the first scan),
+        and file paths given directly. Unmodified directories are
+        only ``stat``ed.
+        """
+        from time import time
+        from errno import ENOENT
+
+        pf = self.path_filter
+        directories = self.__directories
+        visited = set()
+        racy = time() - self.RACY_WINDOW
+
+        for filepath in self.paths:
+
+            if not os.path.exists(filepath):
+                if pf.excluded(filepath):
+                    continue
+                raise IOError(ENOENT, "No such file or directory", filepath)
+            elif not os.path.isdir(filepath):
+                if not pf.excluded(filepath):
+                    yield filepath
+                continue
+            elif pf.excluded(filepath, True):
+                continue
+
+            tree = None
+            if self.git and filepath not in directories:
+                tree = gitindex.TrackedTree.read(filepath, pf)
+
+            stack = [filepath]
+            while stack:
+                dirpath = stack.pop()
+                visited.add(dirpath)
+                try:
+                    mtime = os.stat(dirpath).st_mtime
+                except os.error:
+                    # removed
+                    continue
+
+                entry = directories.get(dirpath)
+                if entry is None or entry[0] is None or entry[0] != mtime:
+                    try:
+                        entry = None
+                        if tree is not None:
+                            entry = tree.listdir(dirpath, mtime)
+                        if entry is None:
+                            entry = pf.listdir(dirpath)
+                    except os.error:
+                        continue
+                    if mtime >= racy:
+                        mtime = None
+                    entry = directories[dirpath] = \
+                        (mtime, tuple(entry[0]), tuple(entry[1]))
+                    for filename in entry[2]:
                         yield os.path.join(dirpath, filename)
 
+                for dirname in entry[1]:
+                    stack.append(os.path.join(dirpath, dirname))
+
+        # Forget removed directories
+        for dirpath in directories.keys():
+            if dirpath not in visited:
+                del directories[dirpath]
+
 
 # ----------------------------------------------------------------
 # Path utilities
@@ -173,6 +293,19 @@ def python_module_exists(dirpath, modulename):
                  isfile(join(dirpath, '%s.pyc' % modulename)) or
                  isfile(join(dirpath, '%s.pyo' % modulename)))
 
+def file_stamp(filepath):
+    """
+    Return the stamp of *filepath*: (modification time, size,
+    device, inode) taken by one ``stat`` call. Raises ``os.error``
+    if *filepath* doesn't exist.
+
+    Sub-second modification time detects successive saves within a
+    timestamp granularity, and inode detects saves by renaming a new
+    file (which may preserve modification time and size).
+    """
+    st = os.stat(filepath)
+    return (st.st_mtime, st.st_size, st.st_dev, st.st_ino)
+
 # Please use only for debugging.
 def relativepath(path, base=None):
     """
@@ -0,0 +1,291 @@
+"""
+Git index reader
+
+This module reads the list of tracked files from ``.git/index``
+(index format version 2, 3 and 4) without running ``git``, so that
+directories of a git checkout can be enumerated without listing
+them and ``stat``\ ing their entries. Only directories are
+``stat``\ ed, cached stat data of files in the index is not read
+because modules are ``stat``\ ed by the monitor anyway.
+
+Only directories whose modification time is older than the index
+file are taken from the index, other directories (modified since
+the index was written, or not containing tracked files) are listed
+as usual. Note that untracked files in directories not modified
+since the index was written are not found.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import os
+import struct
+
+__all__ = ['IndexEntry', 'read_index', 'find_index',
+           'TrackedTree', 'walk']
+
+
+# entry mode (object type)
+S_IFGITLINK = 0160000
+S_IFDIR = 0040000
+
+# flags
+CE_STAGEMASK = 0x3000
+CE_EXTENDED = 0x4000
+CE_NAMEMASK = 0x0fff
+# extended flags
+CE_SKIP_WORKTREE = 0x4000
+
+# Extensions which make entries incomplete (split index)
+UNSUPPORTED_EXTENSIONS = ('link',)
+
+_HEADER = struct.Struct('>4sLL')
+_ENTRY = struct.Struct('>24xL12x20xH')
+_EXTENDED = struct.Struct('>H')
+_EXTENSION = struct.Struct('>4sL')
+
+
+class IndexEntry(tuple):
+    """Tracked file in the index: (path, mode)"""
+    __slots__ = ()
+
+    path = property(lambda self: self[0])
+    mode = property(lambda self: self[1])
+
+
+def _varint(data, offset):
+    # Offset encoding used by index format version 4
+    c = ord(data[offset])
+    offset += 1
+    value = c & 0x7f
+    while c & 0x80:
+        c = ord(data[offset])
+        offset += 1
+        value = ((value + 1) << 7) | (c & 0x7f)
+    return value, offset
+
+def read_index(filepath):
+    """
+    Read index file *filepath*, and return a list of ``IndexEntry``
+    ('/' separated path relative to the work tree) sorted by path.
+    Raise ``ValueError`` if the index is broken or not supported.
+    """
+    fp = open(filepath, 'rb')
+    try:
+        data = fp.read()
+    finally:
+        fp.close()
+
+    if len(data) < _HEADER.size + 20:
+        raise ValueError("Index is too short: %s" % filepath)
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != 'DIRC':
+        raise ValueError("Not an index file: %s" % filepath)
+    if version not in (2, 3, 4):
+        raise ValueError("Unsupported index version %d: %s" %
+            (version, filepath))
+
+    entries = []
+    offset = _HEADER.size
+    previous = ''
+    try:
+        for _ in xrange(count):
+            start = offset
+            # stat data, mode, uid, gid, size, object name and flags
+            mode, flags = _ENTRY.unpack_from(data, offset)
+            offset += _ENTRY.size
+            extended = 0
+            if flags & CE_EXTENDED and version >= 3:
+                extended = _EXTENDED.unpack_from(data, offset)[0]
+                offset += _EXTENDED.size
+
+            if version == 4:
+                strip, offset = _varint(data, offset)
+                end = data.index('\0', offset)
+                path = previous[:len(previous) - strip] + data[offset:end]
+                offset = end + 1
+            else:
+                namelen = flags & CE_NAMEMASK
+                if namelen == CE_NAMEMASK:
+                    end = data.index('\0', offset)
+                else:
+                    end = offset + namelen
+                path = data[offset:end]
+                # 1-8 NUL bytes padding
+                offset = start + ((end - start + 8) & ~7)
+            previous = path
+
+            if mode & 0170000 == S_IFDIR:
+                raise ValueError("Sparse index is not supported: %s" %
+                    filepath)
+            if flags & CE_STAGEMASK and entries and entries[-1][0] == path:
+                # unmerged entries (stage 1-3) of the same path
+                continue
+            if extended & CE_SKIP_WORKTREE:
+                continue
+            entries.append(IndexEntry((path, mode)))
+
+        # extensions
+        while offset + _EXTENSION.size <= len(data) - 20:
+            name, size = _EXTENSION.unpack_from(data, offset)
+            if name in UNSUPPORTED_EXTENSIONS:
+                raise ValueError("Index extension '%s' is not supported: "
+                    "%s" % (name, filepath))
+            offset += _EXTENSION.size + size
+    except (struct.error, IndexError):
+        raise ValueError("Index is broken: %s" % filepath)
+    return entries
+
+def find_index(dirpath):
+    """
+    Return (work tree, index file) pair of the git repository
+    containing *dirpath*, or ``None`` if *dirpath* is not in
+    a git work tree.
+    """
+    path = os.path.abspath(dirpath)
+    while True:
+        gitdir = os.path.join(path, '.git')
+        if os.path.isdir(gitdir):
+            break
+        elif os.path.isfile(gitdir):
+            # 'gitdir: <path>' (worktrees and submodules)
+            fp = open(gitdir)
+            try:
+                line = fp.readline().strip()
+            finally:
+                fp.close()
+            if not line.startswith('gitdir:'):
+                return None
+            gitdir = os.path.join(path, line[7:].strip())
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+    index = os.path.join(gitdir, 'index')
+    if not os.path.isfile(index):
+        return None
+    return path, index
+
+
+class TrackedTree(object):
+    """
+    Directories in *top* and their tracked *entries* read from
+    the git index whose modification time is *mtime*. *skip* is
+    the length of the path of *top* relative to the work tree.
+    Entries excluded by *path_filter*
+    (``modipyd.utils.matcher.PathFilter``) are not listed.
+    """
+
+    @classmethod
+    def read(cls, top, path_filter=None):
+        """
+        Return ``TrackedTree`` of *top* directory, or ``None`` if
+        *top* is not in a git work tree or the index is not readable.
+        """
+        found = find_index(top)
+        if found is None:
+            return None
+        worktree, index = found
+        try:
+            mtime = os.stat(index).st_mtime
+            entries = read_index(index)
+        except (IOError, OSError, ValueError):
+            from modipyd import LOGGER
+            LOGGER.debug("Couldn't read git index %s" % index,
+                exc_info=True)
+            return None
+
+        prefix = os.path.abspath(top)[len(worktree):].strip(os.sep)
+        if os.sep != '/':
+            prefix = prefix.replace(os.sep, '/')
+        if prefix:
+            prefix += '/'
+            entries = [e for e in entries if e[0].startswith(prefix)]
+        return cls(top, entries, mtime, len(prefix), path_filter)
+
+    def __init__(self, top, entries, mtime, skip=0, path_filter=None):
+        super(TrackedTree, self).__init__()
+        self.top = top
+        # Modification time of the index file
+        self.mtime = mtime
+        self.path_filter = path_filter
+        # directory path -> (subdirectories, filenames)
+        self.directories = {}
+
+        directories = self.directories
+        directories[top] = ([], [])
+        keys = {'': top}
+        for entry in entries:
+            path, mode = entry[0][skip:], entry[1]
+            i = path.rfind('/')
+            parent = path[:i+1]
+            dirpath = keys.get(parent)
+            if dirpath is None:
+                dirpath = self._add_directory(keys, parent)
+            if mode & 0170000 == S_IFGITLINK:
+                # submodule, listed as usual
+                directories[dirpath][0].append(path[i+1:])
+            else:
+                directories[dirpath][1].append(path[i+1:])
+
+    def _add_directory(self, keys, reldir):
+        # *reldir* ends with '/'
+        i = reldir.rfind('/', 0, -1)
+        parent = reldir[:i+1]
+        parentpath = keys.get(parent)
+        if parentpath is None:
+            parentpath = self._add_directory(keys, parent)
+        name = reldir[i+1:-1]
+        dirpath = keys[reldir] = os.path.join(parentpath, name)
+        self.directories[parentpath][0].append(name)
+        self.directories[dirpath] = ([], [])
+        return dirpath
+
+    def listdir(self, dirpath, mtime):
+        """
+        Return (subdirectories, filenames) of *dirpath* whose
+        modification time is *mtime* if it is not modified since
+        the index was written, or ``None``.
+        """
+        if mtime >= self.mtime:
+            return None
+        entry = self.directories.get(dirpath)
+        if entry is None:
+            return None
+
+        dirnames, filenames = entry
+        if self.path_filter is not None:
+            excluded = self.path_filter.matchers(dirpath)
+            dirnames = [d for d in dirnames if not excluded(d, True)]
+            filenames = [f for f in filenames if not excluded(f)]
+        return dirnames, filenames
+
+
+def walk(top, path_filter):
+    """
+    Same as ``PathFilter.walk()``, but directories not modified
+    since the git index was written are taken from the index.
+    Falls back to ``PathFilter.walk()`` if *top* is not in
+    a git work tree.
+    """
+    tree = TrackedTree.read(top, path_filter)
+    if tree is None:
+        for item in path_filter.walk(top):
+            yield item
+        return
+
+    stack = [top]
+    while stack:
+        dirpath = stack.pop()
+        try:
+            listing = tree.listdir(dirpath, os.stat(dirpath).st_mtime)
+            if listing is None:
+                listing = path_filter.listdir(dirpath)
+        except os.error:
+            continue
+        dirnames, filenames = listing
+        yield dirpath, dirnames, filenames
+        for dirname in reversed(dirnames):
+            stack.append(os.path.join(dirpath, dirname))
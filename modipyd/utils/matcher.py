@@ -0,0 +1,354 @@
+"""
+Include/exclude path matcher
+
+``PathMatcher`` compiles ``.gitignore`` style patterns into
+a few regular expressions, and ``PathFilter`` decides which files
+and directories under monitoring paths are visited. Excluded
+directories are pruned, so their subtrees are never listed.
+
+Patterns are matched against paths relative to the monitoring
+path (or the directory containing the ignore file):
+
+- A pattern without a slash (e.g. ``*.pyc``, ``build``) matches
+  the name of a file or directory at any depth.
+- A pattern containing a slash (e.g. ``docs/_build``, ``/setup.py``)
+  matches the relative path.
+- A pattern ending with a slash (e.g. ``build/``) matches only
+  directories.
+- ``*`` and ``?`` don't match a slash, ``**`` matches any number
+  of directories.
+- A pattern starting with ``!`` re-includes paths excluded by
+  preceding patterns. The last matching pattern wins.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import os
+import re
+
+from modipyd.utils.core import sequence
+
+__all__ = ['PathMatcher', 'PathFilter', 'read_patterns']
+
+
+# The maximum number of patterns compiled into one regular
+# expression (``sre`` supports at most 100 groups)
+_MAX_GROUPS = 99
+
+
+def _translate(glob):
+    """Translate *glob* into a regular expression (without anchors)"""
+    i, n = 0, len(glob)
+    res = []
+    while i < n:
+        c = glob[i]
+        i += 1
+        if c == '*':
+            if glob[i:i+2] == '*/':
+                res.append('(?:.*/)?')
+                i += 2
+            elif glob[i:i+1] == '*':
+                res.append('.*')
+                i += 1
+            else:
+                res.append('[^/]*')
+        elif c == '?':
+            res.append('[^/]')
+        elif c == '[':
+            j = i
+            if j < n and glob[j] in '!^':
+                j += 1
+            if j < n and glob[j] == ']':
+                j += 1
+            while j < n and glob[j] != ']':
+                j += 1
+            if j >= n:
+                res.append('\\[')
+            else:
+                stuff = glob[i:j].replace('\\', '\\\\')
+                i = j + 1
+                if stuff[0] in '!^':
+                    stuff = '^' + stuff[1:]
+                res.append('[%s]' % stuff)
+        elif c == '\\' and i < n:
+            res.append(re.escape(glob[i]))
+            i += 1
+        else:
+            res.append(re.escape(c))
+    return ''.join(res)
+
+def _compile_pattern(pattern):
+    """
+    Return (negated, regex) pair of *pattern*, or ``None``
+    if *pattern* is blank or a comment.
+    """
+    pattern = pattern.rstrip()
+    if not pattern or pattern.startswith('#'):
+        return None
+
+    negated = pattern.startswith('!')
+    if negated:
+        pattern = pattern[1:]
+    elif pattern[:2] in ('\\!', '\\#'):
+        pattern = pattern[1:]
+
+    # Relative paths of directories end with a slash
+    if pattern.endswith('/'):
+        pattern = pattern.rstrip('/')
+        suffix = '/'
+    else:
+        suffix = '/?'
+    if not pattern:
+        return None
+
+    if '/' in pattern:
+        regex = _translate(pattern.lstrip('/'))
+    else:
+        regex = '(?:.*/)?' + _translate(pattern)
+    return negated, regex + suffix
+
+def read_patterns(filepath):
+    """Return a list of patterns in ignore file *filepath*"""
+    fp = open(filepath, 'rU')
+    try:
+        return [line.rstrip('\n') for line in fp]
+    finally:
+        fp.close()
+
+
+class PathMatcher(object):
+    """
+    ``PathMatcher`` matches relative paths against *patterns*
+    compiled once into regular expressions, each of which holds
+    at most ``_MAX_GROUPS`` patterns.
+
+    >>> matcher = PathMatcher(['*.pyc', 'build/', '!keep.pyc'])
+    >>> matcher.match('a/b.pyc')
+    True
+    >>> matcher.match('keep.pyc')
+    False
+    >>> matcher.match('build') is None
+    True
+    >>> matcher.match('build', isdir=True)
+    True
+    """
+
+    def __init__(self, patterns=()):
+        super(PathMatcher, self).__init__()
+        self.patterns = list(patterns)
+
+        # Alternatives are tried in reverse order, so the first
+        # matching alternative is the last matching pattern.
+        negated = []
+        alternatives = []
+        for pattern in reversed(self.patterns):
+            compiled = _compile_pattern(pattern)
+            if compiled is not None:
+                negated.append(compiled[0])
+                alternatives.append('(%s)' % compiled[1])
+
+        # [(regex, negated flags of its groups)]
+        self.__regexes = []
+        for i in xrange(0, len(alternatives), _MAX_GROUPS):
+            regex = re.compile('(?:%s)\\Z' %
+                '|'.join(alternatives[i:i+_MAX_GROUPS]), re.S)
+            self.__regexes.append((regex, negated[i:i+_MAX_GROUPS]))
+
+    def __len__(self):
+        return sum([len(negated) for _, negated in self.__regexes])
+
+    def match(self, relpath, isdir=False):
+        """
+        Return ``True`` if *relpath* ('/' separated) is excluded,
+        ``False`` if it is re-included by a negated pattern, and
+        ``None`` if no pattern matches.
+        """
+        if isdir:
+            relpath += '/'
+        for regex, negated in self.__regexes:
+            m = regex.match(relpath)
+            if m is not None:
+                return not negated[m.lastindex - 1]
+        return None
+
+
+class PathFilter(object):
+    """
+    ``PathFilter`` decides which files and directories under
+    monitoring *paths* are visited.
+
+    *excludes* are patterns of paths never visited, and *includes*
+    (optional) are patterns of files to be visited. Patterns in
+    *ignore_files* (e.g. ``.gitignore``) found in directories are
+    also honoured, these take effect when the directory is listed.
+    *excludes* take precedence over ignore files, and ignore files
+    in deeper directories take precedence over shallower ones.
+
+    Paths outside monitoring paths (including monitoring paths
+    themselves) are matched by their names.
+    """
+
+    def __init__(self, paths=(), excludes=(), includes=None,
+            ignore_files=()):
+        super(PathFilter, self).__init__()
+        self.excludes = PathMatcher(excludes)
+        self.includes = None
+        if includes:
+            self.includes = PathMatcher(includes)
+        self.ignore_files = tuple(ignore_files)
+
+        # Longer path first to find the innermost monitoring path
+        roots = [os.path.join(p, '') for p in sequence(paths)]
+        roots.sort(key=len, reverse=True)
+        self.__roots = roots
+        # directory path -> (monitoring path, relative path)
+        self.__relatives = {}
+        # directory path -> (mtimes of ignore files, PathMatcher)
+        self.__ignores = {}
+
+    def relative(self, dirpath):
+        """
+        Return (monitoring path, '/' separated relative path) pair
+        of *dirpath*, or (``None``, ``None``) if *dirpath* is
+        not in monitoring paths.
+        """
+        try:
+            return self.__relatives[dirpath]
+        except KeyError:
+            pass
+
+        result = (None, None)
+        prefix = os.path.join(dirpath, '')
+        for root in self.__roots:
+            if prefix.startswith(root):
+                relpath = prefix[len(root):-1]
+                if os.sep != '/':
+                    relpath = relpath.replace(os.sep, '/')
+                result = (root, relpath)
+                break
+        self.__relatives[dirpath] = result
+        return result
+
+    def ignore_matcher(self, dirpath, names=None):
+        """
+        Return ``PathMatcher`` of ignore files in *dirpath*, or
+        ``None`` if there is no ignore file. *names* is the list
+        of entries in *dirpath* if it was just listed, then ignore
+        files are read again if modified.
+        """
+        if not self.ignore_files:
+            return None
+        cached = self.__ignores.get(dirpath)
+        if cached is not None and names is None:
+            return cached[1]
+
+        mtimes = []
+        for filename in self.ignore_files:
+            if names is not None and filename not in names:
+                continue
+            try:
+                mtime = os.stat(os.path.join(dirpath, filename)).st_mtime
+            except os.error:
+                continue
+            mtimes.append((filename, mtime))
+        mtimes = tuple(mtimes)
+
+        if cached is None or cached[0] != mtimes:
+            patterns = []
+            for filename, _ in mtimes:
+                try:
+                    patterns.extend(
+                        read_patterns(os.path.join(dirpath, filename)))
+                except IOError:
+                    continue
+            matcher = None
+            if patterns:
+                matcher = PathMatcher(patterns)
+            cached = self.__ignores[dirpath] = (mtimes, matcher)
+        return cached[1]
+
+    def matchers(self, dirpath, names=None):
+        """
+        Return a function which returns ``True`` if an entry
+        *name* in *dirpath* is excluded.
+        """
+        root, reldir = self.relative(dirpath)
+        if root is None:
+            # Not in monitoring paths, use names
+            chain = [(self.excludes, '')]
+        else:
+            prefix = reldir and reldir + '/'
+            chain = [(self.excludes, prefix)]
+
+            if self.ignore_files:
+                # deeper directory first
+                parts = reldir and reldir.split('/') or []
+                for i in range(len(parts), -1, -1):
+                    if i == len(parts):
+                        matcher = self.ignore_matcher(dirpath, names)
+                    else:
+                        d = os.path.join(root[:-1] or root, *parts[:i])
+                        matcher = self.ignore_matcher(d)
+                    if matcher is not None:
+                        rel = '/'.join(parts[i:])
+                        chain.append((matcher, rel and rel + '/'))
+        includes = self.includes
+        includes_prefix = chain[0][1]
+
+        def excluded(name, isdir=False):
+            for matcher, prefix in chain:
+                matched = matcher.match(prefix + name, isdir)
+                if matched is not None:
+                    return matched
+            if includes is not None and not isdir:
+                return not includes.match(includes_prefix + name)
+            return False
+        return excluded
+
+    def excluded(self, filepath, isdir=False):
+        """Return ``True`` if *filepath* is excluded"""
+        dirpath, name = os.path.split(filepath)
+        if not name:
+            dirpath, name = os.path.split(dirpath)
+        return self.matchers(dirpath)(name, isdir)
+
+    def listdir(self, dirpath):
+        """
+        Return (subdirectories, filenames) in *dirpath* not
+        excluded. Same as ``os.walk()``, symbolic links to
+        directories are not included.
+        """
+        names = os.listdir(dirpath)
+        excluded = self.matchers(dirpath, names)
+
+        dirnames, filenames = [], []
+        for name in names:
+            path = os.path.join(dirpath, name)
+            if os.path.isdir(path):
+                if not os.path.islink(path) and not excluded(name, True):
+                    dirnames.append(name)
+            elif not excluded(name):
+                filenames.append(name)
+        return dirnames, filenames
+
+    def walk(self, top):
+        """
+        Same as ``os.walk()``, but excluded directories are pruned
+        and excluded files are not included.
+        """
+        stack = [top]
+        while stack:
+            dirpath = stack.pop()
+            try:
+                dirnames, filenames = self.listdir(dirpath)
+            except os.error:
+                continue
+            yield dirpath, dirnames, filenames
+            for dirname in reversed(dirnames):
+                stack.append(os.path.join(dirpath, dirname))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,618 @@
+"""
+Modipyd Watcher Backends
+================================================
+
+This module provides the interface of watcher backends used by
+``modipyd.monitor.Monitor`` to wait for file modifications, and
+standard backends:
+
+``PollingWatcher``
+    Sleeps for a while, and asks ``Monitor`` to check all monitoring
+    modules (portable, default).
+
+``InotifyWatcher``
+    Blocks until the Linux kernel reports file system changes via
+    the inotify API (accessed by ``ctypes``, no extra dependency).
+
+``ShardedWatcher``
+    Partitions directories across worker processes, each worker
+    polls its own shard and reports changed files (for very large
+    source trees, requires ``multiprocessing``).
+
+A watcher's ``wait()`` method returns ``None`` if the watcher cannot
+tell which files were changed (``Monitor`` checks all modules), or
+a list of changed file paths.
+
+    :copyright: 2008 by Takanori Ishikawa
+    :license: MIT, see LICENSE for more details.
+"""
+
+import os
+import sys
+import time
+import errno
+import struct
+import select
+from os.path import join
+
+from modipyd import LOGGER, utils
+
+
+# ----------------------------------------------------------------
+# Watcher Interface
+# ----------------------------------------------------------------
+class Watcher(object):
+    """
+    The ``Watcher`` waits for modifications of files
+    under the monitoring paths.
+    """
+
+    # The name used to select a backend (e.g. command line option)
+    name = None
+
+    # ``True`` if the backend reports individual changed files.
+    # For such backends, ``None`` returned by ``wait()`` means
+    # the backend lost track of changes, so ``Monitor`` rescans
+    # all the monitoring paths.
+    notifies = False
+
+    def __init__(self):
+        super(Watcher, self).__init__()
+
+    def open(self, paths, ignore_list=None):
+        """
+        Start watching files and directories in *paths*.
+        Directories matching *ignore_list* patterns are not watched.
+        """
+        pass
+
+    def wait(self, timeout):
+        """
+        Wait for modifications at most *timeout* seconds. Return
+        ``None`` if changed files are unknown, otherwise return
+        a list of changed file paths (may be empty).
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PollingWatcher(Watcher):
+    """Sleep-and-stat polling watcher"""
+
+    name = 'polling'
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return None
+
+
+# ----------------------------------------------------------------
+# Linux inotify
+# ----------------------------------------------------------------
+# Constants from <sys/inotify.h>
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ONLYDIR     = 0x01000000
+IN_ISDIR       = 0x40000000
+
+IN_CLOEXEC     = 0x00080000
+IN_NONBLOCK    = 0x00000800
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+INOTIFY_EVENT_FORMAT = 'iIII'
+INOTIFY_EVENT_SIZE = struct.calcsize(INOTIFY_EVENT_FORMAT)
+
+# Events reported for files in watched directories.
+INOTIFY_WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE |
+                      IN_MOVED_FROM | IN_MOVED_TO |
+                      IN_CREATE | IN_DELETE |
+                      IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+    except ImportError:
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+            use_errno=True)
+        for name in ('inotify_init', 'inotify_add_watch', 'inotify_rm_watch'):
+            getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+    else:
+        return libc
+
+# libc is loaded lazily
+_LIBC = []
+
+def inotify_libc():
+    """Return the libc ``ctypes`` library, or ``None`` if inotify
+    is not available on this platform"""
+    if not _LIBC:
+        _LIBC.append(_load_libc())
+    return _LIBC[0]
+
+def _inotify_error(filename=None):
+    import ctypes
+    code = ctypes.get_errno()
+    return OSError(code, os.strerror(code), filename)
+
+
+class InotifyWatcher(Watcher):
+    """Linux inotify watcher"""
+
+    name = 'inotify'
+    notifies = True
+
+    # read(2) buffer size
+    BUFFER_SIZE = 64 * 1024
+
+    def __init__(self):
+        super(InotifyWatcher, self).__init__()
+        self.fd = None
+        self.ignore_list = None
+        # watch descriptor -> directory path and vice versa
+        self.__directories = {}
+        self.__descriptors = {}
+
+    @staticmethod
+    def available():
+        return inotify_libc() is not None
+
+    def open(self, paths, ignore_list=None):
+        libc = inotify_libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        if self.fd is not None:
+            self.close()
+
+        try:
+            fd = libc.inotify_init1(IN_CLOEXEC | IN_NONBLOCK)
+        except AttributeError:
+            # glibc < 2.9
+            fd = libc.inotify_init()
+        if fd < 0:
+            raise _inotify_error()
+
+        self.fd = fd
+        self.ignore_list = ignore_list
+        try:
+            for dirpath in utils.collect_directories(paths, ignore_list):
+                self.add_watch(dirpath)
+            for filepath in utils.sequence(paths):
+                if os.path.isfile(filepath):
+                    # watch parent directory of the individual file
+                    self.add_watch(os.path.dirname(filepath))
+        except:
+            self.close()
+            raise
+
+        LOGGER.debug("inotify: watching %d directories" %
+            len(self.__directories))
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, dirpath):
+        if dirpath in self.__descriptors:
+            return
+        wd = inotify_libc().inotify_add_watch(
+            self.fd, dirpath, INOTIFY_WATCH_MASK)
+        if wd < 0:
+            e = _inotify_error(dirpath)
+            if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                # removed before watching
+                return
+            raise e
+        self.__directories[wd] = dirpath
+        self.__descriptors[dirpath] = wd
+
+    def discard_watch(self, wd):
+        dirpath = self.__directories.pop(wd, None)
+        if dirpath is not None:
+            del self.__descriptors[dirpath]
+
+    def wait(self, timeout):
+        assert self.fd is not None, "watcher is not opened"
+
+        try:
+            readable = select.select([self.fd], [], [], timeout)[0]
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+        if not readable:
+            return []
+
+        try:
+            data = os.read(self.fd, self.BUFFER_SIZE)
+        except OSError, e:
+            if e.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+        return self.read_events(data)
+
+    def read_events(self, data):
+        """
+        Parse inotify events in *data*, and return changed file paths
+        (or ``None`` if the event queue was overflowed).
+        """
+        changes = []
+        overflow = False
+        i = 0
+        while i + INOTIFY_EVENT_SIZE <= len(data):
+            wd, mask, _, length = struct.unpack_from(
+                INOTIFY_EVENT_FORMAT, data, i)
+            i += INOTIFY_EVENT_SIZE
+            name = data[i:i+length].rstrip('\0')
+            i += length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                self.discard_watch(wd)
+                continue
+
+            dirpath = self.__directories.get(wd)
+            if dirpath is None or not name:
+                continue
+
+            path = join(dirpath, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    changes.extend(self.watch_directory(path))
+                elif mask & IN_MOVED_FROM:
+                    # Files in the moved directory are not reported
+                    self.unwatch_directory(path)
+                    overflow = True
+            else:
+                changes.append(path)
+
+        if overflow:
+            LOGGER.info("inotify: lost track of changes, rescan all")
+            return None
+        return changes
+
+    def watch_directory(self, dirpath):
+        """
+        Watch a newly created directory *dirpath*, and return files
+        already in it (these may be created before watching).
+        """
+        files = []
+        try:
+            for d in utils.collect_directories(dirpath, self.ignore_list):
+                self.add_watch(d)
+            files.extend(utils.collect_files(dirpath, self.ignore_list))
+        except (OSError, IOError):
+            LOGGER.debug("Couldn't watch directory %s" % dirpath,
+                exc_info=True)
+        return files
+
+    def unwatch_directory(self, dirpath):
+        """Stop watching *dirpath* and its subdirectories"""
+        prefix = join(dirpath, '')
+        for path, wd in self.__descriptors.items():
+            if path == dirpath or path.startswith(prefix):
+                inotify_libc().inotify_rm_watch(self.fd, wd)
+                self.discard_watch(wd)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.__directories.clear()
+            self.__descriptors.clear()
+
+
+# ----------------------------------------------------------------
+# Sharded polling
+# ----------------------------------------------------------------
+def _module_file(filepath):
+    return (filepath.endswith('.py') or
+            filepath.endswith('.pyc') or
+            filepath.endswith('.pyo'))
+
+
+class ShardScanner(object):
+    """
+    Polls Python module files in *directories* (not recursive) and
+    *files* of a shard, and reports changed files. Subdirectories
+    created in the shard's directories later join the shard
+    (existing subdirectories belong to other shards).
+    """
+
+    def __init__(self, directories, files=(), ignore_list=None):
+        super(ShardScanner, self).__init__()
+        self.ignore_list = ignore_list
+        self.path_filter = utils.path_filter(directories, ignore_list)
+        # directory path -> (mtime, dirnames, filenames),
+        # dirnames is ``None`` until the first listing.
+        self.directories = dict((d, (None, None, ())) for d in directories)
+        # individual file paths
+        self.filepaths = list(files)
+        # file path -> (mtime, size)
+        self.files = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def scan(self):
+        """Return a list of module files changed since the last scan"""
+        directories = self.directories
+        changes = []
+        racy = time.time() - utils.DirectoryIndex.RACY_WINDOW
+        stack = directories.keys()
+        while stack:
+            dirpath = stack.pop()
+            mtime, dirnames, filenames = directories[dirpath]
+            try:
+                st = os.stat(dirpath)
+            except os.error:
+                # removed
+                del directories[dirpath]
+                changes.extend(self.forget(dirpath, filenames))
+                continue
+
+            if mtime is None or mtime != st.st_mtime:
+                try:
+                    listed = self.list(dirpath)
+                except os.error:
+                    continue
+                removed = set(filenames) - set(listed[1])
+                changes.extend(self.forget(dirpath, removed))
+                filenames = listed[1]
+                mtime = st.st_mtime
+                if mtime >= racy:
+                    # list again at the next scan
+                    mtime = None
+                directories[dirpath] = (mtime, listed[0], filenames)
+                if dirnames is not None:
+                    # Adopt created subdirectories
+                    for dirname in set(listed[0]) - set(dirnames):
+                        path = join(dirpath, dirname)
+                        if path not in directories:
+                            directories[path] = (None, (), ())
+                            stack.append(path)
+
+            for filename in filenames:
+                path = join(dirpath, filename)
+                if self.check(path):
+                    changes.append(path)
+
+        for path in self.filepaths:
+            if self.check(path):
+                changes.append(path)
+        return changes
+
+    def list(self, dirpath):
+        dirnames, filenames = self.path_filter.listdir(dirpath)
+        return dirnames, [f for f in filenames if _module_file(f)]
+
+    def check(self, filepath):
+        # Return ``True`` if *filepath* is created, modified or removed
+        try:
+            stamp = utils.file_stamp(filepath)
+        except os.error:
+            return self.files.pop(filepath, None) is not None
+        if self.files.get(filepath) != stamp:
+            self.files[filepath] = stamp
+            return True
+        return False
+
+    def forget(self, dirpath, filenames):
+        removed = []
+        for filename in filenames:
+            path = join(dirpath, filename)
+            if self.files.pop(path, None) is not None:
+                removed.append(path)
+        return removed
+
+
+def _shard_worker(conn, scanner, interval):
+    # The main function of worker processes: reports changed files
+    # until the connection is closed or any message is received.
+    try:
+        scanner.scan()
+        conn.send([])
+        while not conn.poll(interval):
+            changes = scanner.scan()
+            if changes:
+                conn.send(changes)
+    except (KeyboardInterrupt, EOFError, IOError):
+        pass
+
+
+class ShardedWatcher(Watcher):
+    """
+    Sharded multi-process polling watcher. Directories under the
+    monitoring paths are partitioned across *shards* worker processes
+    (the number of CPUs if ``None``), each worker polls its shard every
+    *interval* seconds and sends changed file paths back.
+    """
+
+    name = 'sharded'
+    notifies = True
+
+    def __init__(self, shards=None, interval=1.0):
+        super(ShardedWatcher, self).__init__()
+        if shards is not None and shards < 1:
+            raise RuntimeError("shards must be greater or equal to 1")
+        if interval <= 0:
+            raise RuntimeError("interval must not be negative or 0")
+        self.shards = shards
+        self.interval = interval
+        self.ignore_list = None
+        # (process, connection, scanner) for each shard
+        self.workers = []
+
+    @staticmethod
+    def available():
+        try:
+            import multiprocessing
+        except ImportError:
+            return False
+        return True
+
+    def open(self, paths, ignore_list=None):
+        import multiprocessing
+        if self.workers:
+            self.close()
+
+        shards = self.shards
+        if shards is None:
+            try:
+                shards = multiprocessing.cpu_count()
+            except NotImplementedError:
+                shards = 1
+        self.ignore_list = ignore_list
+
+        try:
+            for scanner in self.partition(paths, shards):
+                self.spawn(scanner)
+        except:
+            self.close()
+            raise
+        LOGGER.debug("sharded: %d workers" % len(self.workers))
+
+    def partition(self, paths, shards):
+        """
+        Partition directories in *paths* into *shards* scanners
+        balanced by the number of entries.
+        """
+        import heapq
+        assignments = [[] for _ in range(shards)]
+        heap = [(0, i) for i in range(shards)]
+        for dirpath in utils.collect_directories(paths, self.ignore_list):
+            try:
+                weight = len(os.listdir(dirpath)) + 1
+            except os.error:
+                continue
+            load, i = heapq.heappop(heap)
+            assignments[i].append(dirpath)
+            heapq.heappush(heap, (load + weight, i))
+
+        files = [f for f in utils.sequence(paths) if os.path.isfile(f)]
+        scanners = []
+        for i, directories in enumerate(assignments):
+            if directories or (i == 0 and files):
+                scanners.append(ShardScanner(directories,
+                    (i == 0 and files or ()), self.ignore_list))
+        return scanners
+
+    def spawn(self, scanner):
+        import multiprocessing
+        conn, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_shard_worker,
+            args=(child, scanner, self.interval))
+        process.daemon = True
+        process.start()
+        child.close()
+        # Wait for the first scan to complete
+        conn.recv()
+        self.workers.append((process, conn, scanner))
+
+    def wait(self, timeout):
+        assert self.workers, "watcher is not opened"
+        connections = [w[1] for w in self.workers]
+        try:
+            readable = select.select(connections, [], [], timeout)[0]
+        except select.error, e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+
+        changes = []
+        lost = False
+        for worker in list(self.workers):
+            conn = worker[1]
+            if conn not in readable:
+                continue
+            try:
+                while conn.poll():
+                    changes.extend(conn.recv())
+            except (EOFError, IOError):
+                # The worker died, restart it
+                LOGGER.warn("sharded: worker %d terminated, restarting" %
+                    worker[0].pid)
+                self.workers.remove(worker)
+                conn.close()
+                self.spawn(worker[2])
+                lost = True
+
+        if lost:
+            return None
+        return changes
+
+    def close(self):
+        for process, conn, _ in self.workers:
+            try:
+                conn.send(None)
+            except (IOError, OSError):
+                pass
+            conn.close()
+        for process, _, _ in self.workers:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+        del self.workers[:]
+
+
+# ----------------------------------------------------------------
+# Backend registry
+# ----------------------------------------------------------------
+WATCHERS = {
+    PollingWatcher.name: PollingWatcher,
+    InotifyWatcher.name: InotifyWatcher,
+    ShardedWatcher.name: ShardedWatcher,
+}
+
+def available_watchers():
+    """
+    Return the names of backends available on this platform,
+    the best backend last.
+    """
+    names = []
+    # Sharded backend pays only for very large trees, so
+    # it is not preferred to others.
+    if ShardedWatcher.available():
+        names.append(ShardedWatcher.name)
+    names.append(PollingWatcher.name)
+    if InotifyWatcher.available():
+        names.append(InotifyWatcher.name)
+    return names
+
+def make_watcher(name=None, **options):
+    """
+    Return a new watcher backend specified by *name*.
+    If *name* is ``'auto'``, the best backend available on this
+    platform is used. If *name* is ``None``, polling is used.
+    Keyword arguments *options* are passed to the backend.
+    """
+    if name is None:
+        name = PollingWatcher.name
+    elif name == 'auto':
+        name = available_watchers()[-1]
+
+    try:
+        klass = WATCHERS[name]
+    except KeyError:
+        raise ValueError("Unknown watcher backend: %s" % name)
+    return klass(**options)
@@ -6,7 +6,10 @@ Regression tests for modipyd
 
 """
 
+import os
 import sys
+import shutil
+import tempfile
 import unittest
 from os.path import join, dirname
 
@@ -33,3 +36,44 @@ class TestCase(unittest.TestCase):
     # Synonyms for assertion methods
     assertNone = failUnlessNone
     assertNotNone = failIfNone
+
+
+class TemporaryDirectoryMixin(object):
+    """
+    Mixin for ``TestCase`` which creates a temporary directory
+    ``self.directory`` for each test, and removes it after the test.
+    """
+
+    def setUp(self):
+        super(TemporaryDirectoryMixin, self).setUp()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TemporaryDirectoryMixin, self).tearDown()
+
+    def touch(self, *names):
+        """
+        Create an empty file *names* (path components relative to
+        the temporary directory) and its parent directories, and
+        return the path.
+        """
+        return self.write('', *names)
+
+    def write(self, content, *names, **options):
+        """
+        Same as ``touch()``, but write *content* to the file. If
+        *mtime* keyword argument is given, it is set to the file.
+        """
+        path = join(self.directory, *names)
+        if not os.path.isdir(dirname(path)):
+            os.makedirs(dirname(path))
+        f = open(path, 'w')
+        try:
+            f.write(content)
+        finally:
+            f.close()
+        mtime = options.get('mtime')
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
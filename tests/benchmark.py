@@ -0,0 +1,215 @@
+#! /usr/bin/env python
+
+"""
+Benchmarks for modipyd
+
+Generates a synthetic package tree, and measures how modipyd scales:
+
+``collect``
+    ``collect_module_code()`` (compile and analyse all modules)
+``build``
+    ``build_module_descriptors()`` (build the dependency graph)
+``startup``
+    ``Monitor.descriptors`` (the initial refresh of ``Monitor``)
+``tick``
+    ``Monitor.monitor()`` when no module is modified
+``refresh``
+    ``Monitor.refresh()`` discovering new modules
+``walk``
+    ``walk_dependency_graph(reverse=True)`` of sampled modules
+
+Results are written as JSON, so that they can be compared
+between versions::
+
+    $ python tests/benchmark.py --modules 1000 --output before.json
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+from optparse import OptionParser
+from os.path import join, dirname
+
+# Bacause the installed Modipyd in site_packages directory is found
+# earlier than PYTHONPATH, I need to modify sys.path manually.
+sys.path.insert(0, join(dirname(__file__), '..'))
+
+import modipyd
+from modipyd.module import collect_module_code
+from modipyd.descriptor import build_module_descriptors
+from modipyd.monitor import Monitor
+from modipyd.stats import json
+
+
+# The name of the top level package of synthetic tree
+PACKAGE = 'benchpkg'
+
+
+def generate_tree(directory, modules, fanout, depth, cycles, seed=0):
+    """
+    Generate a package tree which contains *modules* modules in
+    packages nested up to *depth* levels under *directory*.
+    Each module imports *fanout* modules defined before it, and
+    each import refers a module defined after it (makes cycles)
+    with *cycles* probability. Return a list of module names.
+    """
+    rand = random.Random(seed)
+
+    # packages: each package has two subpackages
+    packages = [PACKAGE]
+    level = [PACKAGE]
+    for _ in range(depth - 1):
+        level = ['%s.p%d' % (p, i) for p in level for i in range(2)]
+        packages.extend(level)
+    for package in packages:
+        path = join(directory, *package.split('.'))
+        os.makedirs(path)
+        write(join(path, '__init__.py'), '')
+
+    names = ['%s.m%d' % (packages[i % len(packages)], i)
+             for i in range(modules)]
+    for i, name in enumerate(names):
+        imports = set()
+        for _ in range(min(fanout, modules - 1)):
+            if i + 1 < modules and (i == 0 or rand.random() < cycles):
+                j = rand.randrange(i + 1, modules)
+            else:
+                j = rand.randrange(0, max(i, 1))
+            if j != i:
+                imports.add(names[j])
+        source = ''.join('import %s\n' % m for m in sorted(imports))
+        source += 'class C%d(object):\n    pass\n' % i
+        write(join(directory, *name.split('.')) + '.py', source)
+    return names
+
+def write(path, content):
+    f = open(path, 'w')
+    try:
+        f.write(content)
+    finally:
+        f.close()
+
+def age(directory, mtime=1000000000):
+    """Age files and directories beyond the racy window"""
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for name in dirnames + filenames:
+            os.utime(join(dirpath, name), (mtime, mtime))
+
+
+def measure(func, repeat=1):
+    """Call *func* *repeat* times, and return timings"""
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'max': max(timings),
+        'mean': sum(timings) / len(timings),
+    }
+
+def run(options):
+    directory = tempfile.mkdtemp()
+    try:
+        names = generate_tree(directory, options.modules,
+            options.fanout, options.depth, options.cycles, options.seed)
+        age(directory)
+        root = join(directory, PACKAGE)
+        search_path = [directory]
+        results = {}
+
+        codes = []
+        def collect():
+            codes[:] = collect_module_code(root, search_path)
+        results['collect'] = measure(collect)
+        results['build'] = measure(
+            lambda: build_module_descriptors(codes), options.repeat)
+
+        monitor = Monitor(root, search_path)
+        results['startup'] = measure(lambda: monitor.descriptors)
+        results['tick'] = measure(
+            lambda: list(monitor.monitor()), options.repeat)
+
+        def refresh():
+            # a new module in every package
+            for i, package in enumerate(sorted(set(
+                    name.rsplit('.', 1)[0] for name in names))):
+                path = join(directory, *package.split('.'))
+                write(join(path, 'new%d.py' % i), 'import %s\n' % names[0])
+            events = list(monitor.refresh())
+            assert events
+        results['refresh'] = measure(refresh)
+
+        descriptors = monitor.descriptors.values()
+        sample = random.Random(options.seed).sample(descriptors,
+            min(100, len(descriptors)))
+        def walk():
+            for desc in sample:
+                for _ in desc.walk_dependency_graph(reverse=True):
+                    pass
+        results['walk'] = measure(walk, options.repeat)
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'version': modipyd.__version__,
+        'python': sys.version.split()[0],
+        'timestamp': time.time(),
+        'parameters': {
+            'modules': options.modules,
+            'fanout': options.fanout,
+            'depth': options.depth,
+            'cycles': options.cycles,
+            'seed': options.seed,
+            'repeat': options.repeat,
+        },
+        'results': results,
+    }
+
+
+def make_option_parser():
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-n", "--modules", default=500,
+        action="store", type="int", dest="modules", metavar='N',
+        help="the number of modules (default: 500)")
+    parser.add_option("--fanout", default=3,
+        action="store", type="int", dest="fanout", metavar='N',
+        help="the number of imports in each module (default: 3)")
+    parser.add_option("--depth", default=3,
+        action="store", type="int", dest="depth", metavar='N',
+        help="package nesting depth (default: 3)")
+    parser.add_option("--cycles", default=0.1,
+        action="store", type="float", dest="cycles", metavar='RATIO',
+        help="probability of an import which makes cycles "
+             "(default: 0.1)")
+    parser.add_option("--seed", default=0,
+        action="store", type="int", dest="seed",
+        help="random seed of the synthetic tree (default: 0)")
+    parser.add_option("-r", "--repeat", default=5,
+        action="store", type="int", dest="repeat", metavar='N',
+        help="repeat fast benchmarks N times (default: 5)")
+    parser.add_option("-o", "--output", default=None,
+        action="store", dest="output", metavar='FILE',
+        help="write results to FILE (default: stdout)")
+    return parser
+
+def main():
+    parser = make_option_parser()
+    (options, args) = parser.parse_args()
+    if json is None:
+        parser.error("json or simplejson module is required")
+
+    data = json.dumps(run(options), sort_keys=True, indent=2)
+    if options.output:
+        write(options.output, data + '\n')
+    else:
+        print data
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,16 @@
 #!/usr/bin/env python
 
 import unittest
+import os
+import shutil
+import tempfile
+from select import select
 from tests import TestCase
+from os.path import join
 from modipyd.application import Application
+from modipyd.monitor import Event, ChangeSet, Monitor
+from modipyd.scheduler import FixedScheduler
+from tests import FILES_DIR
 
 
 # pylint: disable-msg=W0613
@@ -74,6 +82,113 @@ class TestApplication(TestCase):
         self.assertEqual(123, invoked_context['var1'])
         self.assertEqual('HELLO', invoked_context['var2'])
 
+    def test_coroutine_plugin(self):
+        application = Application()
+        steps = []
+
+        def coroutine_plugin(event, monitor, context):
+            for i in range(3):
+                steps.append(i)
+                yield
+
+        application.install_plugin(coroutine_plugin)
+        application.invoke_plugins(object(), object())
+        self.assertEqual(1, len(application.tasks))
+        self.assertEqual([], steps)
+
+        self.assertEqual(1, application.step())
+        self.assertEqual([0], steps)
+        while application.step():
+            pass
+        self.assertEqual([0, 1, 2], steps)
+        self.assertEqual(0, len(application.tasks))
+
+    def test_start(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = join(directory, 'a.py')
+            open(path, 'w').close()
+            os.utime(path, (1000000000, 1000000000))
+
+            invoked = []
+            def simple_plugin(event, monitor, context):
+                invoked.append(event)
+
+            application = Application(directory)
+            application.watcher = 'polling'
+            application.scheduler = FixedScheduler(0.05)
+            application.install_plugin(simple_plugin)
+            background = application.start()
+            try:
+                fd = background.fileno()
+                monitor = background.monitor
+                monitor.lock.acquire()
+                try:
+                    self.assertEqual(1, len(monitor.descriptors))
+                finally:
+                    monitor.lock.release()
+                os.utime(path, None)
+                for _ in range(20):
+                    if select([fd], [], [], 0.5)[0]:
+                        self.assert_(application.process(background))
+                        if invoked:
+                            break
+                self.assertEqual(1, len(invoked))
+                self.assertEqual(Event.MODULE_MODIFIED, invoked[0].type)
+            finally:
+                application.stop(background)
+            self.assert_(not application.process(background))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_start_stats(self):
+        import signal
+        from modipyd.stats import Stats
+        directory = tempfile.mkdtemp()
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            application = Application(directory)
+            application.watcher = 'polling'
+            application.scheduler = FixedScheduler(0.05)
+            application.stats = Stats()
+            application.stats_file = join(directory, 'stats.json')
+            background = application.start()
+            self.assertNotEqual(previous, signal.getsignal(signal.SIGUSR1))
+            application.stop(background)
+            self.assert_(os.path.exists(application.stats_file))
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+            shutil.rmtree(directory)
+
+    def test_plugin_changeset(self):
+        application = Application()
+        monitor = Monitor(join(FILES_DIR, 'cycles'), [FILES_DIR])
+        descriptors = monitor.descriptors
+        changeset = ChangeSet([
+            Event(Event.MODULE_MODIFIED, descriptors['cycles.a']),
+            Event(Event.MODULE_MODIFIED, descriptors['cycles.b'])])
+
+        invoked = []
+
+        def simple_plugin(event, monitor, context):
+            invoked.append(event)
+
+        def changeset_plugin(event, monitor, context):
+            invoked.append(event)
+        changeset_plugin.accepts_changeset = True
+
+        application.install_plugin(simple_plugin)
+        application.invoke_plugins(changeset, monitor)
+        self.assertEqual(2, len(invoked))
+        self.assert_(isinstance(invoked[0], Event))
+        self.assert_(isinstance(invoked[1], Event))
+
+        del invoked[:]
+        application.plugins[:] = []
+        application.install_plugin(changeset_plugin)
+        application.invoke_plugins(changeset, monitor)
+        self.assertEqual([changeset], invoked)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -8,7 +8,7 @@ from modipyd import LOGGER
 from modipyd.tools import autotest
 from modipyd.application.plugins import Autotest
 
-from modipyd.monitor import Event, Monitor
+from modipyd.monitor import Event, ChangeSet, Monitor
 from modipyd.descriptor import ModuleDescriptor
 from modipyd.module import read_module_code
 
@@ -58,6 +58,22 @@ class TestAutotestTool(TestCase):
         self.assertEqual([descriptor], plugin.testables)
         self.assertEqual(['--loglevel', LOGGER.getEffectiveLevel()], plugin.extra_arguments)
 
+    def test_autotest_plugin_changeset(self):
+        monitor = Monitor(__file__)
+        descriptor = ModuleDescriptor(read_module_code(__file__))
+        changeset = ChangeSet([
+            Event(Event.MODULE_MODIFIED, descriptor),
+            Event(Event.MODULE_MODIFIED, descriptor)])
+        plugin = FakeAutotest(changeset, monitor, {})
+        plugin()
+        self.assertEqual([descriptor], plugin.testables)
+
+        changeset = ChangeSet([Event(Event.MODULE_REMOVED, descriptor)])
+        plugin = FakeAutotest(changeset, monitor, {})
+        plugin.testables = None
+        plugin()
+        self.assertNone(plugin.testables)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+import sys
+import signal
+import unittest
+import threading
+import time
+from StringIO import StringIO
+from select import select
+
+from os.path import join
+from tests import TestCase, FILES_DIR
+from modipyd.monitor import Event, ChangeSet, Monitor
+from modipyd.background import EventQueue, BackgroundMonitor
+
+
+DESCRIPTORS = Monitor(join(FILES_DIR, 'cycles'), [FILES_DIR]).descriptors
+
+def make_event(name, event_type=Event.MODULE_MODIFIED):
+    return Event(event_type, DESCRIPTORS['cycles.' + name])
+
+
+class TestEventQueue(TestCase):
+
+    def test_init(self):
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            self.assertRaises(RuntimeError, EventQueue, 0)
+            self.assertRaises(ValueError, EventQueue, 10, 'unknown')
+            # ``__del__`` of rejected queues
+            self.assertEqual('', sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+
+    def test_interrupted(self):
+        if not hasattr(signal, 'setitimer'):
+            return
+        class Alarm(Exception):
+            pass
+        def handler(signum, frame):
+            raise Alarm()
+
+        queue = EventQueue(1)
+        previous = signal.signal(signal.SIGALRM, handler)
+        try:
+            signal.setitimer(signal.ITIMER_REAL, 0.05)
+            self.assertRaises(Alarm, queue.get)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    def test_get(self):
+        queue = EventQueue(2)
+        self.assertNone(queue.get(0.01))
+        e1, e2 = make_event('a'), make_event('b')
+        queue.put(e1)
+        queue.put(e2)
+        self.assertEqual(2, len(queue))
+        self.assert_(queue.get() is e1)
+        self.assert_(queue.get() is e2)
+
+    def test_close(self):
+        queue = EventQueue(2)
+        e1 = make_event('a')
+        queue.put(e1)
+        queue.close()
+        self.assert_(not queue.put(make_event('b')))
+        self.assert_(queue.get() is e1)
+        self.assertNone(queue.get())
+
+    def test_fileno(self):
+        queue = EventQueue(2, 'drop-oldest')
+        fd = queue.fileno()
+        self.assertEqual([], select([fd], [], [], 0)[0])
+
+        for name in 'abc':
+            queue.put(make_event(name))
+        self.assertEqual([fd], select([fd], [], [], 0)[0])
+        queue.get()
+        self.assertEqual([fd], select([fd], [], [], 0)[0])
+        queue.get()
+        self.assertEqual([], select([fd], [], [], 0)[0])
+
+        queue.close()
+        self.assertEqual([fd], select([fd], [], [], 0)[0])
+        self.assertNone(queue.get(0))
+
+    def test_drop_oldest(self):
+        queue = EventQueue(2, 'drop-oldest')
+        events = [make_event(name) for name in 'abc']
+        for e in events:
+            queue.put(e)
+        self.assertEqual(1, queue.dropped)
+        self.assertEqual(events[1:], [queue.get(), queue.get()])
+
+    def test_merge(self):
+        queue = EventQueue(2, 'merge')
+        for name in 'abcd':
+            queue.put(make_event(name))
+        self.assertEqual(2, len(queue))
+
+        changeset = queue.get()
+        self.assert_(isinstance(changeset, ChangeSet))
+        self.assertEqual(['cycles.a', 'cycles.b', 'cycles.c'],
+            sorted(d.name for d in changeset.descriptors))
+        self.assertEqual('cycles.d', queue.get().descriptor.name)
+
+    def test_block(self):
+        queue = EventQueue(1, 'block')
+        e1, e2 = make_event('a'), make_event('b')
+        queue.put(e1)
+
+        thread = threading.Thread(target=queue.put, args=(e2,))
+        thread.start()
+        time.sleep(0.05)
+        self.assert_(thread.isAlive())
+        self.assert_(queue.get() is e1)
+        thread.join(1.0)
+        self.assert_(not thread.isAlive())
+        self.assert_(queue.get() is e2)
+
+
+class FakeMonitor(Monitor):
+    """Generates prepared events in ``start()``"""
+
+    def __init__(self, events):
+        super(FakeMonitor, self).__init__(FILES_DIR)
+        self.events = events
+
+    def start(self, **options):
+        self.options = options
+        self.monitoring = True
+        for event in self.events:
+            if not self.monitoring:
+                break
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+
+class TestBackgroundMonitor(TestCase):
+
+    def test_events(self):
+        events = [make_event(name) for name in 'abc']
+        monitor = FakeMonitor(events)
+        background = BackgroundMonitor(monitor, EventQueue(10),
+            coalesce=1.0)
+        self.assertEqual(events, list(background))
+        self.assertEqual({'coalesce': 1.0}, monitor.options)
+        self.assert_(not monitor.monitoring)
+
+    def test_exception(self):
+        monitor = FakeMonitor([make_event('a'), ValueError("error")])
+        events = []
+        def consume():
+            for event in BackgroundMonitor(monitor):
+                events.append(event)
+        self.assertRaises(ValueError, consume)
+        self.assertEqual(1, len(events))
+
+    def test_poll(self):
+        events = [make_event(name) for name in 'abc']
+        background = BackgroundMonitor(FakeMonitor(events), EventQueue(10))
+        fd = background.fileno()
+        background.start()
+        polled = []
+        while not background.finished:
+            select([fd], [], [], 1.0)
+            polled.extend(background.poll())
+        self.assertEqual(events, polled)
+
+        background = BackgroundMonitor(FakeMonitor([ValueError("error")]))
+        background.start()
+        background.thread.join()
+        self.assertRaises(ValueError, background.poll)
+
+    def test_stop(self):
+        monitor = FakeMonitor([make_event(name) for name in 'abc'])
+        background = BackgroundMonitor(monitor, EventQueue(1, 'block'))
+        for event in background:
+            background.stop()
+        self.assert_(not monitor.monitoring)
+        self.assertRaises(RuntimeError, background.start)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+import unittest
+import shutil
+import tempfile
+from os.path import join, exists
+
+from tests import TestCase
+from tests import benchmark
+
+
+class TestBenchmark(TestCase):
+
+    def test_generate_tree(self):
+        directory = tempfile.mkdtemp()
+        try:
+            names = benchmark.generate_tree(directory, 20, 3, 2, 0.5)
+            self.assertEqual(20, len(names))
+            for name in names:
+                path = join(directory, *name.split('.')) + '.py'
+                self.assert_(exists(path))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_run(self):
+        parser = benchmark.make_option_parser()
+        options = parser.parse_args(['-n', '20', '-r', '1'])[0]
+        data = benchmark.run(options)
+        self.assertEqual(20, data['parameters']['modules'])
+        self.assertEqual(['build', 'collect', 'refresh', 'startup',
+            'tick', 'walk'], sorted(data['results']))
+
+
+if __name__ == '__main__':
+    unittest.main()
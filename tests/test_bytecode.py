@@ -171,6 +171,131 @@ class OGRGeomTest(unittest.TestCase):
         self.assertEqual(-1, imports[0][2])
 
 
+class RecordingProcessor(bc.BytecodeProcessor):
+
+    def __init__(self, opcodes=None):
+        super(RecordingProcessor, self).__init__()
+        self.opcodes = opcodes
+        self.ops = []
+
+    def process(self, op, argc, co):
+        self.ops.append(op)
+
+
+class TestDispatchTable(DisassemblerTestCase):
+
+    def test_dispatch_table(self):
+        imports = bc.ImportProcessor()
+        classdefs = bc.ClassDefinitionProcessor()
+        table = bc.ChainedBytecodeProcessor(
+            [imports, classdefs]).dispatch_table()
+        self.assertEqual(256, len(table))
+        self.assertEqual((imports.process,), table[bc.IMPORT_NAME])
+        self.assertEqual((classdefs.process,), table[bc.BUILD_CLASS])
+        self.assertEqual((imports.process, classdefs.process),
+            table[bc.LOAD_ATTR])
+        self.assertEqual((), table[bc.dis.opmap['BINARY_ADD']])
+
+    def test_subscription(self):
+        co = self.compile("import os\nx = 1 + 2\n")
+        everything = RecordingProcessor()
+        imports = RecordingProcessor([bc.IMPORT_NAME])
+        bc.scan_code(co,
+            bc.ChainedBytecodeProcessor([everything, imports]), {})
+        self.assert_(len(everything.ops) > 1)
+        self.assertEqual([bc.IMPORT_NAME], imports.ops)
+
+    def test_chained(self):
+        co = self.compile("import os.path as p\nclass A(p.B): pass\n")
+        context = {}
+        bc.scan_code(co, bc.ChainedBytecodeProcessor(
+            [bc.ImportProcessor(), bc.ClassDefinitionProcessor()]), context)
+        self.assertEqual([('p', 'os.path', -1)], context['imports'])
+        self.assertEqual([('A', ('p.B',))], context['classdefs'])
+
+
+class TriggeredProcessor(RecordingProcessor):
+
+    triggers = (bc.IMPORT_NAME,)
+
+    def __init__(self):
+        super(TriggeredProcessor, self).__init__()
+        self.entered = []
+
+    def enter(self, co):
+        self.entered.append(co.co_name)
+
+
+class TestPrefilter(DisassemblerTestCase):
+
+    def test_triggers(self):
+        co = self.compile("""
+def f():
+    x = 1
+    def g():
+        import os
+""")
+        processor = TriggeredProcessor()
+        bc.scan_code(co, processor, {})
+        self.assertEqual(['g'], processor.entered)
+
+    def test_dispatch_table(self):
+        imports = bc.ImportProcessor()
+        chain = bc.ChainedBytecodeProcessor(
+            [imports, bc.ClassDefinitionProcessor()])
+        self.assert_(chain.dispatch_table(
+            self.compile("x = 1").co_code) is None)
+        table = chain.dispatch_table(self.compile("import os").co_code)
+        self.assertEqual((imports.process,), table[bc.LOAD_ATTR])
+        self.assert_(table is chain.dispatch_table(
+            self.compile("import sys").co_code))
+
+    def test_class_in_function(self):
+        co = self.compile("""
+def f():
+    class A(object):
+        pass
+    return A
+x = 1
+class B(object):
+    pass
+""")
+        context = {}
+        bc.scan_code(co, bc.ClassDefinitionProcessor(), context)
+        # Bases of A must not be bound to 'x'
+        self.assertEqual([('B', ('object',))], context['classdefs'])
+
+
+class TestDecode(DisassemblerTestCase):
+
+    def test_decode(self):
+        co = self.compile("import os\n")
+        instructions = bc.decode(co)
+        self.assertEqual(len(instructions), len(instructions.args))
+        self.assertEqual(
+            [(0, bc.LOAD_CONST, 0), (3, bc.LOAD_CONST, 1),
+             (6, bc.IMPORT_NAME, 0), (9, bc.STORE_NAME, 0)],
+            list(instructions)[:4])
+
+    def test_cache(self):
+        co = self.compile("import os\n")
+        self.assert_(bc.decode(co) is bc.decode(co))
+        # equal, but another code object
+        self.assert_(bc.decode(co) is not bc.decode(
+            self.compile("import os\n")))
+
+    def test_extended_arg(self):
+        names = ['v%d' % i for i in range(70000)]
+        co = self.compile("(%s)\n" % ', '.join(names))
+        instructions = bc.decode(co)
+        self.assert_(bc.EXTENDED_ARG not in instructions.opcodes)
+        i = list(instructions.opcodes).index(bc.BUILD_TUPLE)
+        offset, op, arg = list(instructions)[i]
+        self.assertEqual(70000, arg)
+        # offset of EXTENDED_ARG prefix
+        self.assertEqual(bc.EXTENDED_ARG, ord(co.co_code[offset]))
+
+
 if not HAS_RELATIVE_IMPORTS:
     del TestDisassembler25
 
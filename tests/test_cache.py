@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+import time
+import sqlite3
+import unittest
+from os.path import join
+
+import modipyd
+from modipyd import module
+from modipyd.cache import ScanCache, scan_key
+from modipyd.module import read_module_code
+from tests import TestCase, TemporaryDirectoryMixin
+
+
+class ScanCacheTestCase(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(ScanCacheTestCase, self).setUp()
+        self.filepath = join(self.directory, 'cache.db')
+        self.cache = ScanCache(self.filepath)
+
+    def tearDown(self):
+        self.cache.close()
+        super(ScanCacheTestCase, self).tearDown()
+
+
+class TestScanCache(ScanCacheTestCase):
+
+    def test_get_put(self):
+        key = scan_key("import os\n")
+        self.assertNone(self.cache.get(key))
+        context = {'imports': [('os', 'os', -1)], 'classdefs': []}
+        self.assert_(self.cache.put(key, context))
+        self.assertEqual(context, self.cache.get(key))
+        self.assertEqual(1, len(self.cache))
+        self.assertEqual(1, self.cache.counters['hits'])
+        self.assertEqual(1, self.cache.counters['misses'])
+        self.assertEqual(1, self.cache.counters['stores'])
+
+    def test_scan_key(self):
+        key = scan_key("import os\n")
+        self.assertEqual(key, scan_key("import os\n"))
+        self.assertNotEqual(key, scan_key("import sys\n"))
+
+        modipyd.SCANNER = 'lexical'
+        try:
+            self.assertNotEqual(key, scan_key("import os\n"))
+        finally:
+            modipyd.SCANNER = 'bytecode'
+
+        modipyd.BYTECODE_PROCESSORS.append('myprocessor.MyProcessor')
+        try:
+            self.assertNotEqual(key, scan_key("import os\n"))
+        finally:
+            modipyd.BYTECODE_PROCESSORS.pop()
+
+    def test_shared(self):
+        other = ScanCache(self.filepath)
+        try:
+            self.cache.put('a', {'imports': []})
+            self.assertEqual({'imports': []}, other.get('a'))
+        finally:
+            other.close()
+
+    def test_eviction(self):
+        context = {'imports': [('os', 'os', -1)] * 10}
+        self.cache.put('a', context)
+        size = self.cache.connection().execute(
+            "SELECT size FROM contexts").fetchone()[0]
+        self.cache.max_size = size * 3
+
+        for key in 'bc':
+            time.sleep(0.01)
+            self.cache.put(key, context)
+        time.sleep(0.01)
+        # 'a' is used recently
+        self.assertNotNone(self.cache.get('a'))
+        time.sleep(0.01)
+        self.cache.put('d', context)
+
+        self.assertEqual(3, len(self.cache))
+        self.assertEqual(1, self.cache.counters['evictions'])
+        self.assertNone(self.cache.get('b'))
+        for key in 'acd':
+            self.assertNotNone(self.cache.get(key))
+
+    def test_replace(self):
+        context = {'imports': [('os', 'os', -1)] * 10}
+        self.cache.put('a', context)
+        size = self.cache.connection().execute(
+            "SELECT size FROM contexts").fetchone()[0]
+        self.cache.max_size = size * 2
+
+        evicted = []
+        self.cache.evict = lambda: evicted.append(True)
+        for _ in range(5):
+            self.cache.put('a', context)
+        self.assertEqual([], evicted)
+        self.assertEqual(1, len(self.cache))
+
+    def test_evict_rollback_failure(self):
+        class Connection(object):
+            def execute(self, sql, *args):
+                if sql.startswith('SELECT'):
+                    raise sqlite3.OperationalError('database is locked')
+                elif sql == 'ROLLBACK':
+                    raise sqlite3.OperationalError('no transaction')
+        self.cache.connection = Connection
+        try:
+            self.cache.evict()
+        except sqlite3.OperationalError, e:
+            self.assertEqual('database is locked', str(e))
+        else:
+            self.fail("OperationalError not raised")
+
+    def test_broken_database(self):
+        self.cache.close()
+        self.write('x' * 1024, 'cache.db')
+
+        self.assertNone(self.cache.get('a'))
+        self.assert_(not self.cache.put('a', {}))
+        self.assertEqual(2, self.cache.counters['errors'])
+
+
+class TestModuleScanCache(ScanCacheTestCase):
+
+    def setUp(self):
+        super(TestModuleScanCache, self).setUp()
+        self.source = self.write("import os\n", 'a.py')
+        module.SCAN_CACHE = self.cache
+
+        self.compiled = []
+        self.compile_source = module.compile_source
+        def compile_source(filepath):
+            self.compiled.append(filepath)
+            return self.compile_source(filepath)
+        module.compile_source = compile_source
+
+    def tearDown(self):
+        module.compile_source = self.compile_source
+        module.SCAN_CACHE = None
+        super(TestModuleScanCache, self).tearDown()
+
+    def read_module_code(self):
+        return read_module_code(self.source,
+            search_path=[self.directory])
+
+    def test_read_module_code(self):
+        expected = self.read_module_code()
+        self.assertEqual(1, len(self.compiled))
+        module_code = self.read_module_code()
+        self.assertEqual(1, len(self.compiled))
+        self.assertEqual(expected.context, module_code.context)
+        self.assertEqual(1, self.cache.counters['hits'])
+
+    def test_reload(self):
+        module_code = self.read_module_code()
+        self.write("import sys\n", 'a.py')
+        self.assertNotNone(module_code.reload())
+        self.assertEqual([('sys', 'sys', -1)],
+            module_code.context['imports'])
+
+        # the content flips back
+        self.write("import os\n", 'a.py')
+        self.assertNone(module_code.reload())
+        self.assertEqual(2, len(self.compiled))
+        self.assertEqual([('os', 'os', -1)],
+            module_code.context['imports'])
+
+    def test_lexical(self):
+        modipyd.SCANNER = 'lexical'
+        try:
+            expected = self.read_module_code()
+            self.assertEqual(1, self.cache.counters['stores'])
+            module_code = self.read_module_code()
+            self.assertEqual(expected.context, module_code.context)
+            self.assertEqual(1, self.cache.counters['hits'])
+        finally:
+            modipyd.SCANNER = 'bytecode'
+        self.assertEqual(0, len(self.compiled))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,11 +3,12 @@
 import unittest
 from modipyd import HAS_RELATIVE_IMPORTS
 from os.path import join
-from modipyd.descriptor import ModuleDescriptor, \
-                               build_module_descriptors
+from modipyd.descriptor import ModuleDescriptor, ImportIndex, \
+                               build_module_descriptors, \
+                               file_fingerprint
 from modipyd.module import collect_module_code, \
                            read_module_code
-from tests import TestCase, FILES_DIR
+from tests import TestCase, TemporaryDirectoryMixin, FILES_DIR
 
 
 class TestModuleDescriptor(TestCase):
@@ -23,6 +24,75 @@ class TestModuleDescriptor(TestCase):
         self.assertEqual(filepath, descriptor.filename)
 
 
+class TestModuleDescriptorFingerprint(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(TestModuleDescriptorFingerprint, self).setUp()
+        self.filepath = self.write("x = 1\n", 'a.py', mtime=1000000000)
+
+    def descriptor(self, fingerprint):
+        code = read_module_code(self.filepath,
+            search_path=[self.directory])
+        return ModuleDescriptor(code, fingerprint)
+
+    def test_file_fingerprint(self):
+        fingerprint = file_fingerprint(self.filepath)
+        self.assertEqual(6, fingerprint[0])
+        self.assertEqual(fingerprint, file_fingerprint(self.filepath))
+        self.write("x = 2\n", 'a.py', mtime=1000000000)
+        self.assertNotEqual(fingerprint, file_fingerprint(self.filepath))
+
+    def test_touch(self):
+        descriptor = self.descriptor(False)
+        self.write("x = 1\n", 'a.py', mtime=1000000001)
+        self.assert_(descriptor.modified())
+
+        descriptor = self.descriptor(True)
+        self.write("x = 1\n", 'a.py', mtime=1000000002)
+        self.assert_(not descriptor.modified())
+        self.assert_(not descriptor.modified())
+
+    def test_modified(self):
+        descriptor = self.descriptor(True)
+        # same size
+        self.write("x = 2\n", 'a.py', mtime=1000000001)
+        self.assert_(descriptor.modified())
+        # different size
+        self.write("x = 10\n", 'a.py', mtime=1000000002)
+        self.assert_(descriptor.modified())
+        self.write("x = 10\n", 'a.py', mtime=1000000003)
+        self.assert_(not descriptor.modified())
+        # mtime is not changed
+        self.write("x = 20\n", 'a.py', mtime=1000000003)
+        self.assert_(not descriptor.modified())
+
+    def test_stamp(self):
+        import os
+        descriptor = self.descriptor(False)
+        self.write("x = 1\n", 'a.py', mtime=1000000000.25)
+        self.assert_(descriptor.modified())
+        # within the same second
+        self.write("x = 1\n", 'a.py', mtime=1000000000.5)
+        self.assert_(descriptor.modified())
+        self.assertEqual(1000000000.5, descriptor.mtime)
+        # size is changed, mtime is not changed
+        self.write("x = 100\n", 'a.py', mtime=1000000000.5)
+        self.assert_(descriptor.modified())
+        # mtime goes backward
+        self.write("x = 100\n", 'a.py', mtime=1000000000)
+        self.assert_(descriptor.modified())
+        self.assert_(not descriptor.modified())
+
+        # atomic save: rename a new file preserving mtime
+        tmppath = self.filepath + '.tmp'
+        f = open(tmppath, 'w')
+        f.write("x = 200\n")
+        f.close()
+        os.utime(tmppath, (1000000000, 1000000000))
+        os.rename(tmppath, self.filepath)
+        self.assert_(descriptor.modified())
+
+
 class TestModuleDescriptorCycleDependency(TestCase):
 
     def setUp(self):
@@ -138,6 +208,31 @@ class TestModuleDescriptorDependency(TestCase):
         self.assertEqual(0, len(b.reverse_dependencies))
         self.assert_(a not in b.dependencies)
 
+    def test_unresolved_names(self):
+        descriptors = self.descriptors
+        b = descriptors['package_dependency.b']
+        self.assert_('package_dependency.a' not in b.unresolved_names)
+
+        del descriptors['package_dependency.a']
+        b.update_dependencies(descriptors)
+        self.assertEqual(0, len(b.dependencies))
+        self.assert_('package_dependency.a' in b.unresolved_names)
+
+    def test_import_index(self):
+        descriptors = self.descriptors
+        b = descriptors['package_dependency.b']
+        del descriptors['package_dependency.a']
+        b.update_dependencies(descriptors)
+
+        index = ImportIndex()
+        index.update(b)
+        self.assertEqual(set([b]), index.waiting('package_dependency.a'))
+        self.assertEqual(set(), index.waiting('unknown'))
+
+        index.discard(b)
+        self.assertEqual(set(), index.waiting('package_dependency.a'))
+        self.assertEqual(0, len(index))
+
 
 class TestModuleDescriptorRelativeImports(TestCase):
 
@@ -72,6 +72,163 @@ class TestGenericToolOptions(GenericToolTestCase):
         self.assertEqual('plugin1', options.plugins[0])
         self.assertEqual('plugin2', options.plugins[1])
 
+    def test_watcher(self):
+        options = self.parse_options([])[0]
+        self.assertEqual('auto', options.watcher)
+        options = self.parse_options(['--watcher', 'polling'])[0]
+        self.assertEqual('polling', options.watcher)
+
+        application = self.make_application(['--watcher', 'polling'])
+        self.assertEqual('polling', application.watcher)
+
+    def test_coalesce(self):
+        options = self.parse_options([])[0]
+        self.assertNone(options.coalesce)
+        application = self.make_application(['--coalesce', '0.5'])
+        self.assertEqual(0.5, application.coalesce)
+
+    def test_interval(self):
+        from modipyd.scheduler import FixedScheduler, AdaptiveScheduler
+        application = self.make_application([])
+        self.assert_(isinstance(application.scheduler, FixedScheduler))
+        self.assertEqual(1.0, application.scheduler.interval)
+
+        application = self.make_application([
+            '--interval', '0.1', '--max-interval', '3'])
+        self.assert_(isinstance(application.scheduler, AdaptiveScheduler))
+        self.assertEqual(0.1, application.scheduler.minimum)
+        self.assertEqual(3.0, application.scheduler.maximum)
+
+    def test_invalid_interval(self):
+        import sys
+        from StringIO import StringIO
+        parser = generic.make_option_parser()
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            for args in (['--interval', '0'],
+                         ['--interval', '2', '--max-interval', '2'],
+                         ['--max-interval', '0.5']):
+                options = parser.parse_args(args)[0]
+                self.assertRaises(SystemExit,
+                    generic.check_options, parser, options)
+                self.assertRaises(RuntimeError,
+                    generic.make_scheduler, options)
+        finally:
+            sys.stderr = stderr
+
+    def test_cold_rotation(self):
+        application = self.make_application([])
+        self.assertNone(application.tiers)
+        application = self.make_application(['--cold-rotation', '20'])
+        self.assertEqual(20, application.tiers.rotation)
+
+    def test_shards(self):
+        application = self.make_application(['--shards', '4'])
+        self.assertEqual('sharded', application.watcher)
+        self.assertEqual(4, application.shards)
+
+    def test_shards_interval(self):
+        application = self.make_application(
+            ['--shards', '2', '--interval', '0.3', FILES_DIR])
+        self.assertEqual(0.3, application.interval)
+        monitor, options = application.make_monitor()
+        self.assertEqual(2, options['watcher'].shards)
+        self.assertEqual(0.3, options['watcher'].interval)
+
+    def test_jobs(self):
+        application = self.make_application([])
+        self.assertEqual(0, application.jobs)
+        application = self.make_application(['-j', '4'])
+        self.assertEqual(4, application.jobs)
+
+    def test_threaded(self):
+        application = self.make_application([])
+        self.assert_(not application.threaded)
+        self.assertEqual('merge', application.overflow)
+        application = self.make_application(['--threaded',
+            '--queue-size', '10', '--overflow', 'drop-oldest'])
+        self.assert_(application.threaded)
+        self.assertEqual(10, application.queue_size)
+        self.assertEqual('drop-oldest', application.overflow)
+
+    def test_exclude(self):
+        application = self.make_application([])
+        self.assertEqual([], application.excludes)
+        self.assertEqual([], application.ignore_files)
+        application = self.make_application(['--exclude', 'build/',
+            '--exclude', '*.txt', '--include', '*.py', '--gitignore'])
+        self.assertEqual(['build/', '*.txt'], application.excludes)
+        self.assertEqual(['*.py'], application.includes)
+        self.assertEqual(['.gitignore'], application.ignore_files)
+
+    def test_git_index(self):
+        self.assert_(not self.make_application([]).git)
+        self.assert_(self.make_application(['--git-index']).git)
+
+    def test_record(self):
+        import os, tempfile
+        from modipyd.application.recorder import EventRecorder
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            application = self.make_application(['--record', path])
+            self.assert_(isinstance(application.plugins[-1], EventRecorder))
+            application.plugins[-1].close()
+        finally:
+            os.remove(path)
+
+        options = self.parse_options(['--replay', 'events.log',
+            '--speed', '10'])[0]
+        self.assertEqual('events.log', options.replay)
+        self.assertEqual(10.0, options.speed)
+
+    def test_roots(self):
+        import os
+        options, args = self.parse_options(['--root',
+            'projA=projA/src%sprojB/lib' % os.pathsep, '--root', 'projB'])
+        self.assertEqual([], generic.default_paths(options, args))
+        application = generic.make_application(options, [])
+        self.assertEqual(['projA', 'projB'], sorted(application.paths))
+        self.assertEqual(['projA/src', 'projB/lib'],
+            application.search_paths['projA'])
+        self.assertEqual(['projB'], application.search_paths['projB'])
+        self.assertEqual('.', generic.default_paths(
+            self.parse_options([])[0], []))
+
+    def test_scanner(self):
+        import modipyd
+        self.assertEqual('bytecode', modipyd.SCANNER)
+        try:
+            self.make_application(['--scanner', 'lexical'])
+            self.assertEqual('lexical', modipyd.SCANNER)
+        finally:
+            modipyd.SCANNER = 'bytecode'
+
+    def test_scan_cache(self):
+        import os, shutil, tempfile
+        application = self.make_application([])
+        self.assertNone(application.scan_cache)
+
+        directory = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(directory, 'cache.db')
+            application = self.make_application([
+                '--scan-cache', filepath, '--scan-cache-size', '2'])
+            self.assertEqual(filepath, application.scan_cache.filepath)
+            self.assertEqual(2 * 1024 * 1024,
+                application.scan_cache.max_size)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_stats(self):
+        application = self.make_application([])
+        self.assertNone(application.stats)
+        application = self.make_application(['--stats', '-'])
+        self.assertNotNone(application.stats)
+        self.assertNone(application.stats_file)
+        application = self.make_application(['--stats', 'stats.json'])
+        self.assertEqual('stats.json', application.stats_file)
+
 
 class TestGenericToolDefineOption(GenericToolTestCase):
 
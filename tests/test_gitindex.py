@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import shutil
+from os.path import join
+
+from tests import TestCase, TemporaryDirectoryMixin
+from modipyd import utils
+from modipyd.utils import gitindex
+from modipyd.utils.matcher import PathFilter
+
+
+def git(*args):
+    import subprocess
+    try:
+        return subprocess.call(('git',) + args,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE) == 0
+    except OSError:
+        return False
+
+
+class TestGitIndex(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(TestGitIndex, self).setUp()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory)
+        for names in [('a.py',), ('pkg', '__init__.py'),
+                      ('pkg', 'sub', 'b.py')]:
+            self.touch(*names)
+        self.git = git('init', '-q') and git('add', '.')
+        # directories are not modified since the index was written
+        for d in ['.', 'pkg', join('pkg', 'sub')]:
+            os.utime(d, (1000000000, 1000000000))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        super(TestGitIndex, self).tearDown()
+
+    def walk(self, pf):
+        listed = []
+        listdir = pf.listdir
+        def record(dirpath):
+            listed.append(dirpath)
+            return listdir(dirpath)
+        pf.listdir = record
+        files = sorted(utils.collect_files(self.directory, pf, True))
+        prefix = len(self.directory) + 1
+        return [f[prefix:] for f in files], listed
+
+    def test_read_index(self):
+        if not self.git:
+            return
+        entries = gitindex.read_index(join('.git', 'index'))
+        self.assertEqual(['a.py', 'pkg/__init__.py', 'pkg/sub/b.py'],
+            [e.path for e in entries])
+        self.assertEqual(0100644, entries[0].mode)
+
+        self.assert_(git('update-index', '--index-version', '4'))
+        self.assertEqual(entries, gitindex.read_index(join('.git', 'index')))
+
+    def test_broken(self):
+        path = self.touch('index')
+        self.assertRaises(ValueError, gitindex.read_index, path)
+        f = open(path, 'wb')
+        f.write('DIRC\0\0\0\2\0\0\0\1' + '\0' * 30)
+        f.close()
+        self.assertRaises(ValueError, gitindex.read_index, path)
+
+    def test_find_index(self):
+        if not self.git:
+            return
+        worktree, index = gitindex.find_index(join(self.directory, 'pkg'))
+        self.assertEqual(os.path.realpath(self.directory),
+            os.path.realpath(worktree))
+        self.assertEqual('index', os.path.basename(index))
+
+    def test_walk(self):
+        if not self.git:
+            return
+        self.touch('pkg', 'sub', 'untracked.py')
+        os.utime(join('pkg', 'sub'), (1000000000, 1000000000))
+
+        files, listed = self.walk(PathFilter(self.directory, ['.?*']))
+        self.assertEqual(['a.py', join('pkg', '__init__.py'),
+            join('pkg', 'sub', 'b.py')], files)
+        self.assertEqual([], listed)
+
+    def test_walk_modified_directory(self):
+        if not self.git:
+            return
+        self.touch('pkg', 'c.py')
+        files, listed = self.walk(PathFilter(self.directory, ['.?*', 'b.py']))
+        self.assertEqual(['a.py', join('pkg', '__init__.py'),
+            join('pkg', 'c.py')], files)
+        self.assertEqual([join(self.directory, 'pkg')], listed)
+
+    def test_fallback(self):
+        shutil.rmtree('.git')
+        files, listed = self.walk(PathFilter(self.directory, ['.?*']))
+        self.assertEqual(3, len(files))
+        self.assertEqual(3, len(listed))
+
+    def test_directory_index(self):
+        if not self.git:
+            return
+        index = utils.DirectoryIndex(self.directory, ['.?*'], True)
+        self.assertEqual(3, len(list(index.scan())))
+        self.assertEqual(3, len(index))
+
+        path = self.touch('pkg', 'sub', 'c.py')
+        os.utime(join('pkg', 'sub'), (1000000001, 1000000001))
+        # modified directory is listed again
+        self.assert_(path in list(index.scan()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+import os
+import unittest
+from os.path import join
+
+import modipyd
+from modipyd import bytecode as bc
+from modipyd import lexical
+from modipyd import HAS_RELATIVE_IMPORTS
+from modipyd.module import read_module_code, compile_source
+from tests import TestCase, FILES_DIR
+
+
+def bytecode_context(source, filename='<string>'):
+    context = {}
+    processor = bc.ChainedBytecodeProcessor(
+        [bc.ImportProcessor(), bc.ClassDefinitionProcessor()])
+    bc.scan_code(compile(source, filename, 'exec'), processor, context)
+    return context
+
+def lexical_context(source):
+    context = {}
+    lexical.scan_source(source, context)
+    return context
+
+
+class LexicalTestCase(TestCase):
+
+    def assertConform(self, source):
+        expected = bytecode_context(source)
+        context = lexical_context(source)
+        self.assertEqual(expected.get('imports', []), context['imports'])
+        self.assertEqual(expected.get('classdefs', []),
+            context['classdefs'])
+        return context
+
+
+class TestLexicalScanner(LexicalTestCase):
+
+    def test_imports(self):
+        context = self.assertConform(
+            "import os, os.path, os.path as os_path; import sys as s\n")
+        self.assertEqual([
+            ('os', 'os', -1),
+            ('os.path', 'os.path', -1),
+            ('os_path', 'os.path', -1),
+            ('s', 'sys', -1)], context['imports'])
+
+    def test_from_imports(self):
+        context = self.assertConform(
+            "from os.path import (dirname as d,\n"
+            "    join,)\n"
+            "from os.path import *\n")
+        self.assertEqual([
+            ('d', 'os.path.dirname', -1),
+            ('join', 'os.path.join', -1),
+            ('*', 'os.path.*', -1)], context['imports'])
+
+    def test_conditional_imports(self):
+        self.assertConform("""
+try:
+    import json
+except ImportError: import simplejson as json
+if json: from os import path
+else:
+    import posixpath as path
+def f():
+    global os
+    import os
+    def g(): import sys
+    return g
+class A:
+    import re
+""")
+
+    def test_absolute_import(self):
+        context = self.assertConform(
+            "from __future__ import with_statement\n"
+            "from __future__ import absolute_import\n"
+            "import os\n")
+        self.assertEqual(0, context['imports'][-1][2])
+
+    def test_classdefs(self):
+        context = self.assertConform("""
+class A: pass
+class B(A, os.path.C):
+    class C(object):
+        def f(self):
+            class D(B):
+                pass
+            return D
+@decorator
+class E(A,
+        B): x = lambda: 1; y = {1: 2}
+""")
+        self.assertEqual([
+            ('A', ()),
+            ('B', ('A', 'os.path.C')),
+            ('E', ('A', 'B')),
+            ('C', ('object',))], context['classdefs'])
+
+    def test_mangling(self):
+        self.assertConform("""
+class _A:
+    import __a, __b.c
+    from __d import __e as __f
+    class __C(__B, x.__y):
+        pass
+""")
+
+    def test_syntax_error(self):
+        self.assertRaises(SyntaxError, lexical_context, "import (os\n")
+
+
+class TestLexicalScanner25(LexicalTestCase):
+
+    def test_relative_imports(self):
+        context = self.assertConform(
+            "from . import A\n"
+            "from .. B import C as D\n"
+            "from ...E import *\n")
+        self.assertEqual([
+            ('A', 'A', 1),
+            ('D', 'B.C', 2),
+            ('*', 'E.*', 3)], context['imports'])
+
+
+class TestLexicalConformance(TestCase):
+    """The lexical scanner conforms to the bytecode processors"""
+
+    def test_files(self):
+        count = 0
+        for dirpath, dirnames, filenames in os.walk(FILES_DIR):
+            for filename in filenames:
+                if not filename.endswith('.py'):
+                    continue
+                filepath = join(dirpath, filename)
+                try:
+                    code = compile_source(filepath)
+                except SyntaxError:
+                    continue
+
+                expected, context = {}, {}
+                bc.scan_code(code, bc.ChainedBytecodeProcessor(
+                    [bc.ImportProcessor(), bc.ClassDefinitionProcessor()]),
+                    expected)
+                lexical.scan_file(filepath, context)
+                for key in ('imports', 'classdefs'):
+                    self.assertEqual(expected.get(key, []), context[key],
+                        "%s of %s" % (key, filepath))
+                count += 1
+        self.assert_(count > 0)
+
+    def test_read_module_code(self):
+        filepath = join(FILES_DIR, 'cycles', 'a.py')
+        expected = read_module_code(filepath, search_path=[FILES_DIR])
+
+        modipyd.SCANNER = 'lexical'
+        try:
+            module = read_module_code(filepath, search_path=[FILES_DIR])
+            self.assertEqual(expected.name, module.name)
+            self.assertEqual(expected.context, module.context)
+            self.assertNone(module.reload())
+            self.assertEqual(expected.context, module.context)
+        finally:
+            modipyd.SCANNER = 'bytecode'
+
+
+if not HAS_RELATIVE_IMPORTS:
+    del TestLexicalScanner25
+
+if __name__ == '__main__':
+    unittest.main()
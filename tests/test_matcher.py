@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+from os.path import join
+
+from tests import TestCase, TemporaryDirectoryMixin
+from modipyd import utils
+from modipyd.utils.matcher import PathMatcher, PathFilter
+
+
+class TestPathMatcher(TestCase):
+
+    def test_empty(self):
+        matcher = PathMatcher(['', '# comment'])
+        self.assertEqual(0, len(matcher))
+        self.assertNone(matcher.match('a.py'))
+
+    def test_name(self):
+        matcher = PathMatcher(['*.pyc', 'CVS'])
+        self.assert_(matcher.match('a.pyc'))
+        self.assert_(matcher.match('a/b/c.pyc'))
+        self.assert_(matcher.match('a/CVS', isdir=True))
+        self.assertNone(matcher.match('a.py'))
+        self.assertNone(matcher.match('a.pyc/b.py'))
+
+    def test_path(self):
+        matcher = PathMatcher(['docs/_build', '/setup.py'])
+        self.assert_(matcher.match('docs/_build', isdir=True))
+        self.assert_(matcher.match('setup.py'))
+        self.assertNone(matcher.match('a/docs/_build', isdir=True))
+        self.assertNone(matcher.match('a/setup.py'))
+
+    def test_directory_only(self):
+        matcher = PathMatcher(['build/'])
+        self.assert_(matcher.match('build', isdir=True))
+        self.assert_(matcher.match('a/build', isdir=True))
+        self.assertNone(matcher.match('build'))
+
+    def test_wildcards(self):
+        matcher = PathMatcher(['a/*.py', 'b/**/c.py', 'd/**', 'e?[0-9]'])
+        self.assert_(matcher.match('a/x.py'))
+        self.assertNone(matcher.match('a/x/y.py'))
+        self.assert_(matcher.match('b/c.py'))
+        self.assert_(matcher.match('b/x/y/c.py'))
+        self.assert_(matcher.match('d/x/y.py'))
+        self.assert_(matcher.match('ex1'))
+        self.assertNone(matcher.match('exy'))
+
+    def test_negation(self):
+        matcher = PathMatcher(['*.py', '!keep.py', 'keep.py/'])
+        self.assert_(matcher.match('a.py'))
+        self.assertEqual(False, matcher.match('keep.py'))
+        self.assert_(matcher.match('keep.py', isdir=True))
+
+        matcher = PathMatcher(['!keep.py', '*.py'])
+        self.assert_(matcher.match('keep.py'))
+
+    def test_many_patterns(self):
+        # more patterns than groups in one regular expression,
+        # negated patterns at both sides of each chunk boundary
+        # (patterns are chunked from the last)
+        negations = (51, 52, 150, 151, 249)
+        patterns = ['a%d.py' % i for i in xrange(250)]
+        patterns[0] = 'x*.py'
+        patterns[1] = '!a2.py'
+        for i in negations:
+            patterns[i] = '!x%d.py' % i
+
+        matcher = PathMatcher(patterns)
+        self.assertEqual(250, len(matcher))
+        for i in negations:
+            self.assertEqual(False, matcher.match('x%d.py' % i))
+        self.assert_(matcher.match('x1.py'))
+        self.assert_(matcher.match('a2.py'))
+        self.assert_(matcher.match('a200.py'))
+        self.assertNone(matcher.match('b.py'))
+
+    def test_escape(self):
+        matcher = PathMatcher(['\\#a', '\\!b', 'c.d'])
+        self.assert_(matcher.match('#a'))
+        self.assert_(matcher.match('!b'))
+        self.assertNone(matcher.match('cxd'))
+
+
+class TestPathFilter(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(TestPathFilter, self).setUp()
+        for names in [('a.py',), ('setup.py',), ('build', 'b.py'),
+                      ('pkg', 'c.py'), ('pkg', 'c.txt'),
+                      ('pkg', 'gen', 'd.py'), ('pkg', 'gen', 'keep.py'),
+                      ('.hidden', 'e.py')]:
+            self.touch(*names)
+
+    def collect(self, pf):
+        prefix = len(self.directory) + 1
+        return sorted(path[prefix:].replace(os.sep, '/')
+            for path in utils.collect_files(self.directory, pf))
+
+    def test_excludes(self):
+        pf = PathFilter(self.directory, ['.?*', 'build/', '/setup.py'])
+        self.assertEqual(['a.py', 'pkg/c.py', 'pkg/c.txt',
+            'pkg/gen/d.py', 'pkg/gen/keep.py'], self.collect(pf))
+        self.assert_(pf.excluded(join(self.directory, 'build'), True))
+        self.assert_(not pf.excluded(join(self.directory, 'pkg', 'a.py')))
+
+    def test_includes(self):
+        pf = PathFilter(self.directory, ['.?*', 'gen/'], ['*.py'])
+        self.assertEqual(['a.py', 'build/b.py', 'pkg/c.py', 'setup.py'],
+            self.collect(pf))
+
+    def test_prune(self):
+        listed = []
+        pf = PathFilter(self.directory, ['.?*', 'pkg'])
+        listdir = pf.listdir
+        def record(dirpath):
+            listed.append(dirpath)
+            return listdir(dirpath)
+        pf.listdir = record
+        self.assertEqual(['a.py', 'build/b.py', 'setup.py'],
+            self.collect(pf))
+        self.assertEqual(2, len(listed))
+
+    def test_ignore_files(self):
+        self.write("build/\n*.txt\n", '.gitignore')
+        self.write("*.py\n!keep.py\n", 'pkg', 'gen', '.gitignore')
+        pf = PathFilter(self.directory, ['.?*'],
+            ignore_files=['.gitignore'])
+        self.assertEqual(['a.py', 'pkg/c.py', 'pkg/gen/keep.py',
+            'setup.py'], self.collect(pf))
+        self.assert_(pf.excluded(join(self.directory, 'pkg', 'c.txt')))
+        self.assert_(pf.excluded(join(self.directory, 'pkg', 'gen', 'd.py')))
+
+    def test_outside(self):
+        pf = PathFilter(join(self.directory, 'pkg'), ['.?*'])
+        self.assert_(pf.excluded(join(self.directory, '.hidden')))
+        self.assert_(not pf.excluded(self.directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
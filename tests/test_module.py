@@ -5,7 +5,9 @@ from os.path import abspath, join, exists
 from modipyd.utils import compile_python_source
 from modipyd.module import ModuleCode, compile_source, \
                            collect_module_code, \
-                           read_module_code
+                           read_module_code, \
+                           collect_python_module_file, \
+                           scan_module_files
 from tests import TestCase, FILES_DIR
 
 
@@ -140,5 +142,34 @@ class TestModipydModuleCode(TestCase):
             self.assertEqual(old_classdefs, m.context['classdefs'])
 
 
+class TestParallelScan(TestCase):
+
+    def test_scan_module_files(self):
+        module_files = list(collect_python_module_file(FILES_DIR))
+        self.assert_(len(module_files) > 16)
+
+        contexts = scan_module_files(module_files, 2)
+        self.assert_(len(contexts) > 0)
+        for filename, typebits in module_files:
+            if filename not in contexts:
+                continue
+            mc = read_module_code(filename, typebits=typebits,
+                search_path=[FILES_DIR], allow_standalone=True)
+            self.assertEqual(mc.context, contexts[filename])
+
+    def test_serial(self):
+        module_files = list(collect_python_module_file(FILES_DIR))
+        self.assertEqual({}, scan_module_files(module_files, 1))
+        self.assertEqual({}, scan_module_files(module_files[:2], 2))
+
+    def test_collect_module_code(self):
+        serial = list(collect_module_code(FILES_DIR, [FILES_DIR]))
+        parallel = list(collect_module_code(FILES_DIR, [FILES_DIR], 2))
+        self.assertEqual(len(serial), len(parallel))
+        for s, p in zip(serial, parallel):
+            self.assertEqual(s.name, p.name)
+            self.assertEqual(s.context, p.context)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -5,7 +5,11 @@ import os
 from os.path import join, exists
 
 from tests import TestCase, FILES_DIR
-from modipyd.monitor import Event, Monitor
+from modipyd.monitor import Event, ChangeSet, Monitor
+from modipyd.watcher import Watcher
+from modipyd.scheduler import TieredPolling
+from modipyd.resolve import normalize_path
+from modipyd.stats import Stats
 
 
 class TestSimpleMonitor(TestCase):
@@ -27,6 +31,177 @@ class TestSimpleMonitor(TestCase):
         modified = list(self.monitor.monitor())
         self.assertEqual(0, len(modified))
 
+    def test_search_paths(self):
+        import shutil, tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            for path, content in [
+                    (('projA', 'src', 'a', '__init__.py'), ''),
+                    (('projA', 'src', 'a', 'x.py'), 'import b.y\n'),
+                    (('projB', 'lib', 'b', '__init__.py'), ''),
+                    (('projB', 'lib', 'b', 'y.py'), '')]:
+                path = join(directory, *path)
+                if not exists(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                f = open(path, 'w')
+                f.write(content)
+                f.close()
+
+            roots = [join(directory, 'projA'), join(directory, 'projB')]
+            search_paths = {
+                roots[0]: [join(directory, 'projA', 'src'),
+                           join(directory, 'projB', 'lib')],
+                roots[1]: [join(directory, 'projB', 'lib')],
+            }
+            monitor = Monitor(roots, search_paths=search_paths)
+            descriptors = monitor.descriptors
+            self.assertEqual(['a', 'a.x', 'b', 'b.y'], sorted(descriptors))
+            self.assert_(descriptors['b.y'] in
+                descriptors['a.x'].dependencies)
+            self.assertEqual(search_paths[roots[1]],
+                monitor.module_search_path(join(roots[1], 'lib', 'b', 'y')))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_name_collision(self):
+        import shutil, tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            roots = [join(directory, 'projA'), join(directory, 'projB')]
+            for root in roots:
+                os.makedirs(join(root, 'tests'))
+                for name in ('__init__.py', 'test_x.py'):
+                    open(join(root, 'tests', name), 'w').close()
+
+            import logging
+            from modipyd import LOGGER
+            warnings = []
+            handler = logging.Handler(logging.WARN)
+            handler.emit = warnings.append
+            LOGGER.addHandler(handler)
+            try:
+                monitor = Monitor(roots,
+                    search_paths=dict((root, [root]) for root in roots))
+                descriptors = monitor.descriptors
+            finally:
+                LOGGER.removeHandler(handler)
+            # 'tests' and 'tests.test_x'
+            self.assertEqual(2, len(warnings))
+            for record in warnings:
+                self.assert_('conflicts' in record.getMessage())
+
+            # only one of them is monitored, and is not overwritten
+            self.assertEqual(['tests', 'tests.test_x'], sorted(descriptors))
+            desc = descriptors['tests.test_x']
+            self.assertEqual([], list(monitor.refresh()))
+            self.assert_(monitor.descriptors['tests.test_x'] is desc)
+
+            os.utime(desc.filename, (1000000001, 1000000001))
+            events = list(monitor.monitor())
+            self.assertEqual(1, len(events))
+            self.assert_(events[0].descriptor is desc)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_package_created(self):
+        import shutil, tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            os.mkdir(join(directory, 'pkg'))
+            open(join(directory, 'pkg', 'a.py'), 'w').close()
+            monitor = Monitor(directory,
+                [directory, join(directory, 'pkg')])
+            self.assertEqual(['a'], sorted(monitor.descriptors))
+
+            # resolvers are shared across refreshes, but a directory
+            # becomes a package
+            open(join(directory, 'pkg', '__init__.py'), 'w').close()
+            open(join(directory, 'pkg', 'b.py'), 'w').close()
+            os.utime(join(directory, 'pkg'), (1000000001, 1000000001))
+            names = [e.descriptor.name for e in monitor.refresh()]
+            self.assertEqual(['pkg', 'pkg.b'], sorted(names))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_excludes(self):
+        monitor = Monitor(join(FILES_DIR, 'cycles'), [FILES_DIR],
+            excludes=['[ab].py'], includes=['*.py', '!f.py'])
+        self.assertEqual(['cycles', 'cycles.c', 'cycles.d', 'cycles.e'],
+            sorted(monitor.descriptors))
+        self.assertEqual([], list(monitor.update(
+            [join(FILES_DIR, 'cycles', 'a.py')])))
+
+
+class TestChangeSet(TestCase):
+
+    def setUp(self):
+        monitor = Monitor(join(FILES_DIR, 'cycles'), [FILES_DIR])
+        self.a = monitor.descriptors['cycles.a']
+        self.b = monitor.descriptors['cycles.b']
+
+    def test_empty(self):
+        changeset = ChangeSet()
+        self.assertEqual(0, len(changeset))
+        self.assertEqual((), changeset.descriptors)
+
+    def test_descriptors(self):
+        changeset = ChangeSet([
+            Event(Event.MODULE_MODIFIED, self.a),
+            Event(Event.MODULE_CREATED, self.b),
+            Event(Event.MODULE_MODIFIED, self.a)])
+        self.assertEqual(2, len(changeset))
+        self.assertEqual((self.a, self.b), changeset.descriptors)
+        types = [e.type for e in changeset]
+        self.assertEqual([Event.MODULE_MODIFIED, Event.MODULE_CREATED], types)
+
+    def test_created_modified(self):
+        changeset = ChangeSet([
+            Event(Event.MODULE_CREATED, self.a),
+            Event(Event.MODULE_MODIFIED, self.a)])
+        self.assertEqual(1, len(changeset))
+        self.assertEqual(Event.MODULE_CREATED, list(changeset)[0].type)
+
+    def test_created_removed(self):
+        changeset = ChangeSet([
+            Event(Event.MODULE_CREATED, self.a),
+            Event(Event.MODULE_MODIFIED, self.b),
+            Event(Event.MODULE_REMOVED, self.a)])
+        self.assertEqual(1, len(changeset))
+        self.assertEqual((self.b,), changeset.descriptors)
+
+    def test_removed_created(self):
+        changeset = ChangeSet([
+            Event(Event.MODULE_MODIFIED, self.a),
+            Event(Event.MODULE_REMOVED, self.a),
+            Event(Event.MODULE_CREATED, self.a)])
+        self.assertEqual(1, len(changeset))
+        self.assertEqual(Event.MODULE_MODIFIED, list(changeset)[0].type)
+
+    def test_modified_moved(self):
+        changeset = ChangeSet([
+            Event(Event.MODULE_MODIFIED, self.a),
+            Event(Event.MODULE_MOVED, self.a, 'cycles.x', 'x.py'),
+            Event(Event.MODULE_MODIFIED, self.a)])
+        self.assertEqual(1, len(changeset))
+        event = list(changeset)[0]
+        self.assertEqual(Event.MODULE_MOVED, event.type)
+        self.assertEqual('cycles.x', event.old_name)
+
+
+class FakeWatcher(Watcher):
+    """Reports prepared changes"""
+
+    notifies = True
+
+    def __init__(self, changes):
+        super(FakeWatcher, self).__init__()
+        self.changes = list(changes)
+
+    def wait(self, timeout):
+        if self.changes:
+            return self.changes.pop(0)
+        return []
+
 
 PRISONERS_DIR = join(FILES_DIR, 'prisoners')
 
@@ -129,6 +304,29 @@ import prisoners.b
         self.assertEqual(0, len(m.dependencies))
         self.assertEqual(2, len(m.reverse_dependencies))
 
+    def test_stats(self):
+        stats = Stats()
+        monitor = Monitor(PRISONERS_DIR, [FILES_DIR], stats=stats)
+        self.assertEqual(4, len(monitor.descriptors))
+        self.assertEqual(4, stats.histograms['compile'].count)
+        self.assertEqual(1, stats.histograms['discover'].count)
+        stated = stats.counters['stats']
+        time.sleep(1)
+
+        f = open(join(PRISONERS_DIR, 'b.py'), 'w')
+        f.write("")
+        f.close()
+        time.sleep(0.1)
+
+        events = monitor.locked_tick(Watcher(), None)
+        self.assertEqual(1, len(events))
+        self.assertEqual(1, stats.counters['ticks'])
+        self.assertEqual(1, stats.counters['events.modified'])
+        self.assert_('events.created' not in stats.counters)
+        self.assertEqual(stated + 4, stats.counters['stats'])
+        self.assertEqual(1, stats.histograms['reload'].count)
+        self.assertEqual(1, stats.histograms['tick'].count)
+
     def test_deleted(self):
         descriptors = self.monitor.descriptors
         b = descriptors['prisoners.b']
@@ -203,6 +401,192 @@ import prisoners.b
             self.assertEqual(0, len(a.reverse_dependencies))
             self.assert_('prisoners.d' not in descriptors)
 
+    def test_relink(self):
+        descriptors = self.monitor.descriptors
+        a = descriptors['prisoners.a']
+        c = descriptors['prisoners.c']
+
+        # c imports d which is not exist
+        f = open(join(PRISONERS_DIR, 'c.py'), 'w')
+        f.write("import prisoners.b\nimport prisoners.d\n")
+        f.close()
+        c.reload(descriptors)
+        self.monitor.link(c)
+        self.assert_('prisoners.d' in c.unresolved_names)
+
+        # Only modules waiting on the new module are relinked
+        updated = []
+        def update_dependencies(desc):
+            original = desc.update_dependencies
+            def _update_dependencies(descriptors):
+                updated.append(desc.name)
+                return original(descriptors)
+            desc.update_dependencies = _update_dependencies
+        for desc in descriptors.values():
+            update_dependencies(desc)
+
+        path = join(PRISONERS_DIR, 'd.py')
+        f = open(path, 'w')
+        f.write("import prisoners.a")
+        f.close()
+        events = list(self.monitor.update([path]))
+        self.assertEqual(1, len(events))
+        d = descriptors['prisoners.d']
+        self.assertEqual(['prisoners.c'], updated)
+        self.assert_(d in c.dependencies)
+        self.assertEqual([d], list(a.reverse_dependencies))
+
+        # Removal relinks modules imported the removed module
+        del updated[:]
+        os.remove(path)
+        events = list(self.monitor.update([path]))
+        self.assertEqual(Event.MODULE_REMOVED, events[0].type)
+        self.assertEqual(['prisoners.c'], updated)
+        self.assert_(d not in c.dependencies)
+        self.assert_('prisoners.d' in c.unresolved_names)
+        self.assertEqual(0, len(a.reverse_dependencies))
+        # removed descriptor keeps modules imported it
+        self.assertEqual([c], list(d.reverse_dependencies))
+
+    def test_moved(self):
+        descriptors = self.monitor.descriptors
+        a = descriptors['prisoners.a']
+        b = descriptors['prisoners.b']
+        c = descriptors['prisoners.c']
+        context, filename = c.context, c.filename
+
+        f = open(join(PRISONERS_DIR, 'a.py'), 'w')
+        f.write("import prisoners.c")
+        f.close()
+        self.assertEqual(1, len(list(self.monitor.monitor())))
+        self.assertEqual([c], list(a.dependencies))
+
+        old = join(PRISONERS_DIR, 'c.py')
+        path = join(PRISONERS_DIR, 'e.py')
+        os.rename(old, path)
+        try:
+            events = list(self.monitor.monitor())
+            self.assertEqual(1, len(events))
+            event = events[0]
+            self.assertEqual(Event.MODULE_MOVED, event.type)
+            self.assert_(event.descriptor is c)
+            self.assertEqual('prisoners.c', event.old_name)
+            self.assertEqual(filename, event.old_filename)
+            self.assertEqual((a,), event.dependents)
+
+            # not reloaded
+            self.assert_(c.context is context)
+            self.assertEqual('prisoners.e', c.name)
+            self.assertEqual(normalize_path(path), c.filename)
+            self.assert_(descriptors['prisoners.e'] is c)
+            self.assert_('prisoners.c' not in descriptors)
+            self.assertEqual([b], list(c.dependencies))
+            self.assert_(c in b.reverse_dependencies)
+            self.assert_(c not in a.dependencies)
+
+            # moved back (reported by watcher)
+            os.rename(path, old)
+            events = list(self.monitor.update([path, old]))
+            self.assertEqual(1, len(events))
+            self.assertEqual(Event.MODULE_MOVED, events[0].type)
+            self.assertEqual('prisoners.c', c.name)
+            self.assertEqual([c], list(a.dependencies))
+            self.assertEqual(4, len(descriptors))
+        finally:
+            if exists(path):
+                os.remove(path)
+
+    def test_update(self):
+        descriptors = self.monitor.descriptors
+        self.assertEqual(4, len(descriptors))
+        self.assertEqual(0, len(list(self.monitor.update([]))))
+        time.sleep(1)
+
+        # modify b.py, create d.py and ignored file
+        f = open(join(PRISONERS_DIR, 'b.py'), 'w')
+        f.write("")
+        f.close()
+        path = join(PRISONERS_DIR, 'd.py')
+        f = open(path, 'w')
+        f.write("import prisoners.a")
+        f.close()
+        time.sleep(0.1)
+
+        events = list(self.monitor.update([
+            join(PRISONERS_DIR, 'b.py'), path,
+            join(PRISONERS_DIR, '.#b.py'),
+            join(PRISONERS_DIR, 'README')]))
+        self.assertEqual(2, len(events))
+        self.assertEqual(Event.MODULE_MODIFIED, events[0].type)
+        self.assertEqual('prisoners.b', events[0].descriptor.name)
+        self.assertEqual(Event.MODULE_CREATED, events[1].type)
+        self.assertEqual('prisoners.d', events[1].descriptor.name)
+        self.assertEqual(5, len(descriptors))
+
+        # remove d.py
+        os.remove(path)
+        events = list(self.monitor.update([path]))
+        self.assertEqual(1, len(events))
+        self.assertEqual(Event.MODULE_REMOVED, events[0].type)
+        self.assertEqual(4, len(descriptors))
+
+    def test_coalesce(self):
+        descriptors = self.monitor.descriptors
+        time.sleep(1)
+
+        paths = []
+        for name in ('a', 'b', 'c'):
+            path = join(PRISONERS_DIR, '%s.py' % name)
+            f = open(path, 'w')
+            f.write("x = 1")
+            f.close()
+            paths.append(path)
+
+        # changes are reported in separated ticks
+        watcher = FakeWatcher([paths[:1], paths[1:2], paths[1:]])
+        events = iter(self.monitor.coalesce(
+            self.monitor.update(watcher.wait(0)), watcher, 0.01))
+        self.monitor.monitoring = True
+        changeset = events.next()
+        self.assert_(isinstance(changeset, ChangeSet))
+        self.assertEqual(3, len(changeset))
+        self.assertEqual(
+            set(['prisoners.a', 'prisoners.b', 'prisoners.c']),
+            set([d.name for d in changeset.descriptors]))
+        self.assertRaises(StopIteration, events.next)
+        self.assertEqual(4, len(descriptors))
+
+    def test_tiered(self):
+        self.monitor = Monitor(PRISONERS_DIR, [FILES_DIR],
+            tiers=TieredPolling(rotation=4))
+        descriptors = self.monitor.descriptors
+        self.assertEqual(4, len(descriptors))
+        time.sleep(1)
+
+        f = open(join(PRISONERS_DIR, 'b.py'), 'w')
+        f.write("")
+        f.close()
+
+        # b.py is detected in a rotation, and promoted
+        events = []
+        for _ in range(4):
+            events.extend(self.monitor.monitor())
+        self.assertEqual(1, len(events))
+        self.assertEqual('prisoners.b', events[0].descriptor.name)
+        self.assertEqual(['prisoners.b'], list(self.monitor.tiers.hot))
+
+        # removed module is demoted
+        os.remove(join(PRISONERS_DIR, 'b.py'))
+        events = list(self.monitor.monitor())
+        self.assertEqual(1, len(events))
+        self.assertEqual(Event.MODULE_REMOVED, events[0].type)
+        self.assertEqual(0, len(self.monitor.tiers.hot))
+
+    def test_coalesce_nothing(self):
+        watcher = FakeWatcher([])
+        events = self.monitor.coalesce(iter([]), watcher, 0.01)
+        self.assertEqual(0, len(list(events)))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import tempfile
+from os.path import join
+
+from tests import TestCase, FILES_DIR
+from modipyd.application import Application
+from modipyd.application.recorder import EventRecorder, read_log, replay
+from modipyd.monitor import Event, ChangeSet, Monitor
+
+
+class TestRecorder(TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.monitor = Monitor(join(FILES_DIR, 'cycles'), [FILES_DIR])
+        self.descriptors = self.monitor.descriptors
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def event(self, name, event_type=Event.MODULE_MODIFIED, **kwargs):
+        return Event(event_type, self.descriptors['cycles.' + name],
+            **kwargs)
+
+    def record(self):
+        recorder = EventRecorder(self.path)
+        recorder.record(self.event('a'), 100.0)
+        recorder.record(ChangeSet([self.event('b'),
+            self.event('c', Event.MODULE_CREATED)]), 102.0)
+        recorder.record(self.event('d', Event.MODULE_MOVED,
+            old_name='cycles.x', old_filename='/x.py'), 106.0)
+        recorder.close()
+
+    def test_read_log(self):
+        self.record()
+        batches = list(read_log(self.path))
+        self.assertEqual([100.0, 102.0, 106.0], [t for t, _ in batches])
+        self.assertEqual([1, 2, 1], [len(r) for _, r in batches])
+
+        event_type, name, filename, old_name, old_filename = batches[1][1][1]
+        self.assertEqual(Event.MODULE_CREATED, event_type)
+        self.assertEqual('cycles.c', name)
+        self.assertEqual(self.descriptors['cycles.c'].filename, filename)
+        self.assertNone(old_name)
+        self.assertEqual(('cycles.x', '/x.py'), batches[2][1][0][3:])
+
+    def test_replay(self):
+        self.record()
+        f = open(self.path, 'a')
+        f.write("broken line\n107.0\t9\tM\tcycles.unknown\t/unknown.py\n")
+        f.close()
+
+        events = []
+        def plugin(event, monitor, context):
+            events.append(event)
+        application = Application()
+        application.install_plugin(plugin)
+
+        delays = []
+        count = replay(application, self.monitor, self.path, 2.0,
+            delays.append)
+        self.assertEqual(4, count)
+        self.assertEqual([1.0, 2.0, 0.5], delays)
+        self.assertEqual(['cycles.a', 'cycles.b', 'cycles.c', 'cycles.d'],
+            [e.descriptor.name for e in events])
+        self.assertEqual(Event.MODULE_MOVED, events[3].type)
+        self.assertEqual('cycles.x', events[3].old_name)
+
+        del delays[:]
+        replay(application, self.monitor, self.path, 0, delays.append)
+        self.assertEqual([], delays)
+
+    def test_plugin(self):
+        application = Application()
+        recorder = EventRecorder(self.path)
+        application.install_plugin(recorder)
+        application.invoke_plugins(self.event('a'), self.monitor)
+        recorder.close()
+        records = list(read_log(self.path))
+        self.assertEqual('cycles.a', records[0][1][0][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
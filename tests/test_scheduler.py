@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+import unittest
+from tests import TestCase
+from modipyd.scheduler import FixedScheduler, AdaptiveScheduler, \
+                              TieredPolling
+
+
+class TestFixedScheduler(TestCase):
+
+    def test_init(self):
+        self.assertRaises(RuntimeError, FixedScheduler, 0)
+        self.assertRaises(RuntimeError, FixedScheduler, 1.0, 0)
+        self.assertRaises(TypeError, FixedScheduler, '1.0')
+
+    def test_schedule(self):
+        scheduler = FixedScheduler(0.5, 3)
+        self.assertEqual(0.5, scheduler.next_interval())
+        dues = [scheduler.refresh_due() for _ in range(6)]
+        self.assertEqual([False, False, True, False, False, True], dues)
+        scheduler.notify(10)
+        self.assertEqual(0.5, scheduler.next_interval())
+
+
+class FakeAdaptiveScheduler(AdaptiveScheduler):
+
+    now = 0
+
+    def time(self):
+        return self.now
+
+
+class TestAdaptiveScheduler(TestCase):
+
+    def test_init(self):
+        self.assertRaises(RuntimeError, AdaptiveScheduler, 0)
+        self.assertRaises(RuntimeError, AdaptiveScheduler, 1.0, 0.5)
+        self.assertRaises(RuntimeError, AdaptiveScheduler, 1.0, 2.0, 0.5)
+
+    def test_backoff(self):
+        scheduler = FakeAdaptiveScheduler(0.1, 1.0, 2.0, burst=2)
+        intervals = []
+        for _ in range(8):
+            intervals.append(scheduler.next_interval())
+            scheduler.notify(0)
+        self.assertEqual([0.1, 0.1, 0.1, 0.2, 0.4, 0.8, 1.0, 1.0], intervals)
+
+        # activity resets interval
+        scheduler.notify(1)
+        self.assertEqual(0.1, scheduler.next_interval())
+        scheduler.notify(0)
+        self.assertEqual(0.1, scheduler.next_interval())
+
+    def test_refresh_due(self):
+        scheduler = FakeAdaptiveScheduler(refresh_interval=5.0)
+        self.assert_(not scheduler.refresh_due())
+        scheduler.now = 4.9
+        self.assert_(not scheduler.refresh_due())
+        scheduler.now = 5.0
+        self.assert_(scheduler.refresh_due())
+        self.assert_(not scheduler.refresh_due())
+        scheduler.now = 10.0
+        self.assert_(scheduler.refresh_due())
+
+
+class FakeDescriptor(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class TestTieredPolling(TestCase):
+
+    def setUp(self):
+        self.descriptors = dict(
+            (str(i), FakeDescriptor(str(i))) for i in range(10))
+
+    def names(self, descriptors):
+        return sorted(d.name for d in descriptors)
+
+    def test_init(self):
+        self.assertRaises(RuntimeError, TieredPolling, -1)
+        self.assertRaises(RuntimeError, TieredPolling, 10, 0)
+
+    def test_rotation(self):
+        tiers = TieredPolling(rotation=3)
+        checked = []
+        for _ in range(3):
+            selected = tiers.select(self.descriptors)
+            self.assert_(len(selected) <= 4)
+            checked.extend(self.names(selected))
+        self.assertEqual(sorted(self.descriptors.keys()), sorted(checked))
+
+    def test_hot(self):
+        tiers = TieredPolling(hot_size=2, rotation=10)
+        tiers.promote(self.descriptors['5'])
+        tiers.promote(self.descriptors['7'])
+        for _ in range(10):
+            selected = self.names(tiers.select(self.descriptors))
+            self.assert_('5' in selected)
+            self.assert_('7' in selected)
+            self.assert_(len(selected) <= 3)
+
+        # least recently modified module is demoted
+        tiers.promote(self.descriptors['5'])
+        tiers.promote(self.descriptors['1'])
+        self.assertEqual(['5', '1'], list(tiers.hot))
+
+        tiers.discard(self.descriptors['5'])
+        self.assertEqual(['1'], list(tiers.hot))
+
+    def test_removed(self):
+        tiers = TieredPolling(rotation=2)
+        tiers.promote(self.descriptors['0'])
+        tiers.select(self.descriptors)
+        del self.descriptors['0']
+        del self.descriptors['9']
+        selected = self.names(tiers.select(self.descriptors))
+        self.assert_('0' not in selected)
+        self.assert_('9' not in selected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+from os.path import join, exists
+
+from tests import TestCase, TemporaryDirectoryMixin
+from modipyd import module, snapshot
+from modipyd.monitor import Monitor
+
+
+class TestSnapshot(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(TestSnapshot, self).setUp()
+        self.package = join(self.directory, 'pkg')
+        self.write("", 'pkg', '__init__.py', mtime=1000000000)
+        self.write("import pkg.b\n", 'pkg', 'a.py', mtime=1000000000)
+        self.write("class B(object): pass\n", 'pkg', 'b.py',
+            mtime=1000000000)
+        self.snapshot = join(self.directory, 'snapshot')
+
+        self.compiled = []
+        self.compile_source = module.compile_source
+        def compile_source(filepath):
+            self.compiled.append(filepath)
+            return self.compile_source(filepath)
+        module.compile_source = compile_source
+
+    def tearDown(self):
+        module.compile_source = self.compile_source
+        super(TestSnapshot, self).tearDown()
+
+    def monitor(self):
+        monitor = Monitor(self.package, [self.directory],
+            snapshot=self.snapshot)
+        return monitor, monitor.descriptors
+
+    def test_warm_start(self):
+        descriptors = self.monitor()[1]
+        self.assertEqual(3, len(self.compiled))
+        self.assert_(exists(self.snapshot))
+        del self.compiled[:]
+
+        monitor, descriptors = self.monitor()
+        self.assertEqual(0, len(self.compiled))
+        self.assertEqual(3, len(descriptors))
+
+        a, b = descriptors['pkg.a'], descriptors['pkg.b']
+        self.assertEqual([b], list(a.dependencies))
+        self.assertEqual([a], list(b.reverse_dependencies))
+        self.assertEqual([('B', ('object',))], b.context['classdefs'])
+        self.assertEqual(0, len(list(monitor.monitor())))
+
+    def test_modified(self):
+        self.monitor()
+        del self.compiled[:]
+        path = self.write("import pkg.a\n", 'pkg', 'b.py',
+            mtime=1000000001)
+
+        descriptors = self.monitor()[1]
+        self.assertEqual([path], self.compiled)
+        a, b = descriptors['pkg.a'], descriptors['pkg.b']
+        self.assertEqual([b], list(a.dependencies))
+        self.assertEqual([a], list(b.dependencies))
+
+    def test_removed(self):
+        self.monitor()
+        os.remove(join(self.package, 'b.py'))
+
+        descriptors = self.monitor()[1]
+        self.assertEqual(2, len(descriptors))
+        # 'import pkg.b' falls back to the package
+        self.assertEqual([descriptors['pkg']],
+            list(descriptors['pkg.a'].dependencies))
+
+    def test_obsolete(self):
+        self.monitor()
+        data = snapshot.read(self.snapshot)
+        data['magic'] = 'XXXX'
+        f = open(self.snapshot, 'wb')
+        snapshot.pickle.dump(data, f)
+        f.close()
+
+        del self.compiled[:]
+        self.monitor()
+        self.assertEqual(3, len(self.compiled))
+
+    def test_scanner_changed(self):
+        import modipyd
+        self.monitor()
+        modipyd.SCANNER = 'lexical'
+        try:
+            monitor = Monitor(self.package, [self.directory])
+            self.assertEqual([], snapshot.load(monitor, self.snapshot))
+        finally:
+            modipyd.SCANNER = 'bytecode'
+
+    def test_package_changed(self):
+        self.monitor()
+        os.remove(join(self.package, '__init__.py'))
+        monitor = Monitor(self.package, [self.directory])
+        self.assertEqual([], snapshot.load(monitor, self.snapshot))
+
+    def test_not_monitored(self):
+        self.write("", 'pkg', 'sub', '__init__.py', mtime=1000000000)
+        self.write("import pkg.a\n", 'pkg', 'sub', 'c.py',
+            mtime=1000000000)
+        self.assertEqual(5, len(self.monitor()[1]))
+
+        monitor = Monitor(self.package, [self.directory],
+            excludes=['b.py', 'sub'])
+        restored = snapshot.load(monitor, self.snapshot)
+        self.assertEqual(['pkg', 'pkg.a'],
+            sorted(desc.name for desc in restored))
+
+        monitor = Monitor(join(self.package, 'sub'), [self.directory])
+        restored = snapshot.load(monitor, self.snapshot)
+        self.assertEqual(['pkg.sub', 'pkg.sub.c'],
+            sorted(desc.name for desc in restored))
+
+    def test_broken(self):
+        f = open(self.snapshot, 'wb')
+        f.write("broken")
+        f.close()
+        self.assertNone(snapshot.read(self.snapshot))
+        self.assertEqual(3, len(self.monitor()[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
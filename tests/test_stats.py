@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import tempfile
+
+from tests import TestCase
+from modipyd import stats
+from modipyd.stats import Histogram, Stats
+
+
+class TestHistogram(TestCase):
+
+    def test_empty(self):
+        histogram = Histogram()
+        self.assertEqual(0, histogram.count)
+        self.assertNone(histogram.mean)
+        self.assertNone(histogram.min)
+
+    def test_add(self):
+        histogram = Histogram()
+        for value in (0.0005, 0.001, 0.003, 10.0):
+            histogram.add(value)
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(0.0005, histogram.min)
+        self.assertEqual(10.0, histogram.max)
+        self.assertEqual(2, histogram.buckets[0])
+        self.assertEqual(1, histogram.buckets[2])
+        self.assertEqual(1, histogram.buckets[-1])
+
+        buckets = histogram.as_dict()['buckets']
+        self.assertEqual(2, buckets['0.001'])
+        self.assertEqual(1, buckets['inf'])
+
+
+class TestStats(TestCase):
+
+    def test_counters(self):
+        s = Stats()
+        s.incr('ticks')
+        s.incr('ticks')
+        s.incr('stats', 10)
+        self.assertEqual({'ticks': 2, 'stats': 10}, s.counters)
+
+    def test_observe(self):
+        s = Stats()
+        s.observe('tick', 0.5)
+        s.observe('tick', 1.5)
+        self.assertEqual(2, s.histograms['tick'].count)
+        self.assertEqual(1.0, s.histograms['tick'].mean)
+
+    def test_dump(self):
+        if stats.json is None:
+            return
+        s = Stats()
+        s.incr('ticks')
+        s.observe('tick', 0.01)
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            s.dump(path)
+            data = stats.json.load(open(path))
+        finally:
+            os.remove(path)
+        self.assertEqual(1, data['counters']['ticks'])
+        self.assertEqual(1, data['histograms']['tick']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
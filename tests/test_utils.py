@@ -8,7 +8,7 @@ from os.path import basename, join, normpath, \
 from errno import ENOENT
 
 from modipyd import utils
-from tests import TestCase, FILES_DIR
+from tests import TestCase, TemporaryDirectoryMixin, FILES_DIR
 
 
 class TestModipydUtils(TestCase):
@@ -95,6 +95,73 @@ class TestModipydCollectFiles(TestCase):
         self.assertEqual('b.py', scripts[3])
 
 
+class TestDirectoryIndex(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(TestDirectoryIndex, self).setUp()
+        os.mkdir(join(self.directory, 'A'))
+        os.mkdir(join(self.directory, 'B'))
+        os.mkdir(join(self.directory, '.svn'))
+        for names in [('a',), ('A', 'b'), ('B', 'c'), ('.svn', 'd')]:
+            self.touch(*names)
+        self.index = utils.DirectoryIndex(self.directory, ['.?*'])
+
+    def touch(self, *names):
+        path = super(TestDirectoryIndex, self).touch(*names)
+        # age the parent directory beyond racy window
+        parent = dirname(path)
+        os.utime(parent, (1000000000, 1000000000))
+        return path
+
+    def test_scan(self):
+        files = sorted(self.index.scan())
+        self.assertEqual(3, len(files))
+        self.assertEqual(join(self.directory, 'A', 'b'), files[0])
+        self.assertEqual(join(self.directory, 'B', 'c'), files[1])
+        self.assertEqual(join(self.directory, 'a'), files[2])
+        self.assertEqual(3, len(self.index))
+        self.assert_(join(self.directory, '.svn') not in self.index)
+
+        # Nothing changed
+        self.assertEqual(0, len(list(self.index.scan())))
+
+    def test_scan_modified_directory(self):
+        list(self.index.scan())
+        path = self.touch('B', 'e')
+        os.utime(join(self.directory, 'B'), (1000000001, 1000000001))
+
+        files = sorted(self.index.scan())
+        self.assertEqual(2, len(files))
+        self.assertEqual(join(self.directory, 'B', 'c'), files[0])
+        self.assertEqual(path, files[1])
+
+    def test_scan_new_directory(self):
+        list(self.index.scan())
+        os.mkdir(join(self.directory, 'A', 'C'))
+        path = self.touch('A', 'C', 'f')
+        os.utime(join(self.directory, 'A'), (1000000001, 1000000001))
+
+        files = sorted(self.index.scan())
+        self.assertEqual(2, len(files))
+        self.assertEqual(path, files[0])
+        self.assertEqual(join(self.directory, 'A', 'b'), files[1])
+        self.assertEqual(4, len(self.index))
+
+    def test_scan_removed_directory(self):
+        import shutil
+        list(self.index.scan())
+        shutil.rmtree(join(self.directory, 'A'))
+        os.utime(self.directory, (1000000001, 1000000001))
+        self.assertEqual([join(self.directory, 'a')], list(self.index.scan()))
+        self.assertEqual(2, len(self.index))
+
+    def test_racy_directory(self):
+        os.utime(join(self.directory, 'B'), None)
+        self.assertEqual(3, len(list(self.index.scan())))
+        files = list(self.index.scan())
+        self.assertEqual([join(self.directory, 'B', 'c')], files)
+
+
 class TestModipyPathUtils(TestCase):
 
     def setUp(self):
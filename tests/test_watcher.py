@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+import unittest
+import os
+import shutil
+from os.path import join
+
+from tests import TestCase, TemporaryDirectoryMixin
+from modipyd import watcher as w
+
+
+class TestWatcherRegistry(TestCase):
+
+    def test_make_watcher(self):
+        self.assert_(isinstance(w.make_watcher(), w.PollingWatcher))
+        self.assert_(isinstance(w.make_watcher('polling'), w.PollingWatcher))
+        self.assertRaises(ValueError, w.make_watcher, 'unknown')
+
+    def test_auto(self):
+        watcher = w.make_watcher('auto')
+        self.assertEqual(w.available_watchers()[-1], watcher.name)
+
+    def test_available_watchers(self):
+        names = w.available_watchers()
+        self.assert_('polling' in names)
+        for name in names:
+            self.assert_(name in w.WATCHERS)
+
+    def test_options(self):
+        watcher = w.make_watcher('sharded', shards=3)
+        self.assertEqual(3, watcher.shards)
+        self.assertRaises(TypeError, w.make_watcher, 'polling', shards=3)
+
+
+class TestPollingWatcher(TestCase):
+
+    def test_wait(self):
+        watcher = w.PollingWatcher()
+        watcher.open(['.'])
+        self.assertNone(watcher.wait(0.01))
+        watcher.close()
+
+
+class TestInotifyWatcher(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(TestInotifyWatcher, self).setUp()
+        os.mkdir(join(self.directory, '.hidden'))
+        self.watcher = w.InotifyWatcher()
+        self.watcher.open(self.directory, ['.?*'])
+
+    def tearDown(self):
+        self.watcher.close()
+        super(TestInotifyWatcher, self).tearDown()
+
+    def test_timeout(self):
+        self.assertEqual([], self.watcher.wait(0.01))
+
+    def test_created(self):
+        path = self.write("x = 1\n", 'a.py')
+        changes = self.watcher.wait(1.0)
+        self.assert_(path in changes)
+
+    def test_removed(self):
+        path = self.write("x = 1\n", 'a.py')
+        self.watcher.wait(1.0)
+        os.remove(path)
+        changes = self.watcher.wait(1.0)
+        self.assert_(path in changes)
+
+    def test_ignored_directory(self):
+        self.write("x = 1\n", '.hidden', 'a.py')
+        self.assertEqual([], self.watcher.wait(0.01))
+
+    def test_new_directory(self):
+        os.mkdir(join(self.directory, 'package'))
+        self.assertEqual([], self.watcher.wait(1.0))
+
+        path = self.write("x = 1\n", 'package', 'b.py')
+        changes = self.watcher.wait(1.0)
+        self.assert_(path in changes)
+
+    def test_moved_directory(self):
+        os.mkdir(join(self.directory, 'package'))
+        self.watcher.wait(1.0)
+        os.rename(join(self.directory, 'package'),
+                  join(self.directory, 'moved'))
+        self.assertNone(self.watcher.wait(1.0))
+
+
+class ShardTestCase(TemporaryDirectoryMixin, TestCase):
+
+    def setUp(self):
+        super(ShardTestCase, self).setUp()
+        for name in ('a', 'b', join('b', 'c'), '.hidden'):
+            os.mkdir(join(self.directory, name))
+        self.write("x = 1\n", 'a', 'x.py')
+        self.write("x = 1\n", 'b', 'c', 'y.py')
+
+
+class TestShardScanner(ShardTestCase):
+
+    def test_partition(self):
+        watcher = w.ShardedWatcher(2)
+        watcher.ignore_list = ['.?*']
+        scanners = watcher.partition([self.directory], 2)
+        self.assertEqual(2, len(scanners))
+        directories = []
+        for scanner in scanners:
+            directories.extend(scanner.directories.keys())
+        self.assertEqual(4, len(directories))
+        self.assertEqual(4, len(set(directories)))
+
+    def test_scan(self):
+        d = self.directory
+        scanners = [w.ShardScanner([d, join(d, 'b')], (), ['.?*']),
+                    w.ShardScanner([join(d, 'a'), join(d, 'b', 'c')])]
+        self.assertEqual([join(d, 'a', 'x.py'), join(d, 'b', 'c', 'y.py')],
+            sorted(scanners[1].scan()))
+        self.assertEqual([], scanners[0].scan())
+        self.assertEqual([], scanners[1].scan())
+
+        # modified
+        path = join(d, 'b', 'c', 'y.py')
+        os.utime(path, (1000000000, 1000000000))
+        self.assertEqual([], scanners[0].scan())
+        self.assertEqual([path], scanners[1].scan())
+
+        # created in a new directory, and ignored
+        os.mkdir(join(d, 'b', 'e'))
+        path = self.write("x = 1\n", 'b', 'e', 'z.py')
+        self.write("x = 1\n", '.hidden', 'z.py')
+        self.write("x = 1\n", 'b', 'README')
+        os.utime(join(d, 'b'), (1000000000, 1000000000))
+        self.assertEqual([path], scanners[0].scan())
+        self.assert_(join(d, 'b', 'e') in scanners[0].directories)
+        self.assertEqual([], scanners[1].scan())
+
+        # removed
+        os.remove(path)
+        self.assertEqual([path], scanners[0].scan())
+        shutil.rmtree(join(d, 'a'))
+        self.assertEqual([join(d, 'a', 'x.py')], scanners[1].scan())
+
+    def test_scan_replaced(self):
+        scanner = w.ShardScanner([join(self.directory, 'a')])
+        path = self.write("x = 1\n", 'a', 'x.py', mtime=1000000000)
+        self.assertEqual([path], scanner.scan())
+        # atomic save: rename a new file preserving mtime and size
+        tmppath = self.write("x = 2\n", 'a', 'x.tmp', mtime=1000000000)
+        os.rename(tmppath, path)
+        self.assertEqual([path], scanner.scan())
+        self.assertEqual([], scanner.scan())
+
+
+class TestShardedWatcher(ShardTestCase):
+
+    def setUp(self):
+        super(TestShardedWatcher, self).setUp()
+        self.watcher = w.ShardedWatcher(2, 0.02)
+        self.watcher.open(self.directory, ['.?*'])
+
+    def tearDown(self):
+        self.watcher.close()
+        super(TestShardedWatcher, self).tearDown()
+
+    def wait(self):
+        changes = []
+        for _ in range(50):
+            changes.extend(self.watcher.wait(0.1))
+            if changes:
+                break
+        return changes
+
+    def test_timeout(self):
+        self.assertEqual(2, len(self.watcher.workers))
+        self.assertEqual([], self.watcher.wait(0.05))
+
+    def test_created(self):
+        path = self.write("x = 1\n", 'b', 'c', 'z.py')
+        self.assertEqual([path], self.wait())
+
+    def test_worker_terminated(self):
+        process = self.watcher.workers[0][0]
+        process.terminate()
+        process.join()
+        self.assertNone(self.watcher.wait(1.0))
+        self.assertEqual(2, len(self.watcher.workers))
+
+        path = self.write("x = 1\n", 'a', 'z.py')
+        self.assertEqual([path], self.wait())
+
+
+if not w.InotifyWatcher.available():
+    del TestInotifyWatcher
+if not w.ShardedWatcher.available():
+    del TestShardedWatcher
+
+if __name__ == '__main__':
+    unittest.main()